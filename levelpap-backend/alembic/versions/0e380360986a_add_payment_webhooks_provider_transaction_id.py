@@ -0,0 +1,54 @@
+"""Add payment_webhooks.provider_transaction_id to drop provider retries
+
+Backfills the id from stored payloads (M-Pesa CheckoutRequestID, Flutterwave
+data.id), keeping it only on the first of any retries already stored so the
+unique index can be built; later copies stay NULL.
+
+Revision ID: 0e380360986a
+Revises: 24cdafd4a682
+Create Date: 2026-10-17 03:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0e380360986a'
+down_revision: Union[str, None] = '24cdafd4a682'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('payment_webhooks', sa.Column('provider_transaction_id', sa.String(), nullable=True))
+    op.execute(
+        """
+        UPDATE payment_webhooks SET provider_transaction_id = firsts.transaction_id
+        FROM (
+            SELECT DISTINCT ON (provider, transaction_id) id, transaction_id
+            FROM (
+                SELECT id, provider, created_at,
+                    CASE provider
+                        WHEN 'MPESA' THEN payload -> 'Body' -> 'stkCallback' ->> 'CheckoutRequestID'
+                        ELSE payload -> 'data' ->> 'id'
+                    END AS transaction_id
+                FROM payment_webhooks
+            ) AS callbacks
+            WHERE transaction_id IS NOT NULL
+            ORDER BY provider, transaction_id, created_at, id
+        ) AS firsts
+        WHERE payment_webhooks.id = firsts.id
+        """
+    )
+    op.create_index(
+        'uq_payment_webhooks_provider_transaction_id', 'payment_webhooks',
+        ['provider', 'provider_transaction_id'], unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_payment_webhooks_provider_transaction_id', table_name='payment_webhooks')
+    op.drop_column('payment_webhooks', 'provider_transaction_id')
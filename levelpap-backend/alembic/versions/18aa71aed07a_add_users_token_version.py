@@ -0,0 +1,31 @@
+"""Add users.token_version
+
+Tokens carry the user's token_version; bumping it revokes every token issued
+before. Existing users start at 0, which is what their tokens are issued with
+from now on.
+
+Revision ID: 18aa71aed07a
+Revises: 3bb48bc2b331
+Create Date: 2026-10-17 01:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '18aa71aed07a'
+down_revision: Union[str, None] = '3bb48bc2b331'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The server default backfills existing rows with 0
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
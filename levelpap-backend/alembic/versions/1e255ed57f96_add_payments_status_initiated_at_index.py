@@ -0,0 +1,39 @@
+"""Replace ix_payments_status with ix_payments_status_initiated_at
+
+Reconciliation scans open payments oldest first; the composite index serves
+that scan and every status-only filter the old index served. Built
+concurrently so payments stay writable on a live database.
+
+Revision ID: 1e255ed57f96
+Revises: 0e380360986a
+Create Date: 2026-10-17 04:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e255ed57f96'
+down_revision: Union[str, None] = '0e380360986a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_payments_status_initiated_at', 'payments', ['status', 'initiated_at'],
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.drop_index('ix_payments_status', table_name='payments', postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_payments_status', 'payments', ['status'], postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index(
+            'ix_payments_status_initiated_at', table_name='payments', postgresql_concurrently=True, if_exists=True
+        )
@@ -0,0 +1,41 @@
+"""Add courses.search_vector for full-text search
+
+Backfills the weighted document app.services.search keeps up to date
+(title A, syllabus B, description C); scripts/reindex_search.py rebuilds it
+after the weights change.
+
+Revision ID: 24cdafd4a682
+Revises: 3d107d136cec
+Create Date: 2026-10-17 02:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '24cdafd4a682'
+down_revision: Union[str, None] = '3d107d136cec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('courses', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(
+        """
+        UPDATE courses SET search_vector =
+            setweight(to_tsvector('english', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(array_to_string(syllabus, ' '), '')), 'B')
+            || setweight(to_tsvector('english', coalesce(description, '')), 'C')
+        """
+    )
+    op.create_index('ix_courses_search_vector', 'courses', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('ix_courses_search_vector', table_name='courses', postgresql_using='gin')
+    op.drop_column('courses', 'search_vector')
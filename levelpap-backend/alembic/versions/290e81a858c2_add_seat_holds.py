@@ -0,0 +1,35 @@
+"""Add seat holds: sessions.seats_held and bookings.hold_expires_at
+
+Existing sessions start with no seats held. Bookings made before holds
+existed keep a null hold_expires_at and are never swept;
+scripts/recompute_seats.py rebuilds the counters from bookings if needed.
+
+Revision ID: 290e81a858c2
+Revises: 18aa71aed07a
+Create Date: 2026-10-17 01:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '290e81a858c2'
+down_revision: Union[str, None] = '18aa71aed07a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The server default backfills existing rows with 0
+    op.add_column('sessions', sa.Column('seats_held', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('bookings', sa.Column('hold_expires_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f('ix_bookings_hold_expires_at'), 'bookings', ['hold_expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_bookings_hold_expires_at'), table_name='bookings')
+    op.drop_column('bookings', 'hold_expires_at')
+    op.drop_column('sessions', 'seats_held')
@@ -0,0 +1,38 @@
+"""Add keyset pagination indexes
+
+Revision ID: 3d107d136cec
+Revises: 290e81a858c2
+Create Date: 2026-10-17 01:50:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d107d136cec'
+down_revision: Union[str, None] = '290e81a858c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_users_created_at_id', 'users', ['created_at', 'id']),
+    ('ix_trainers_created_at_id', 'trainers', ['created_at', 'id']),
+    ('ix_courses_created_at_id', 'courses', ['created_at', 'id']),
+    ('ix_sessions_date_start_time_id', 'sessions', ['date', 'start_time', 'id']),
+    ('ix_corporate_requests_created_at_id', 'corporate_requests', ['created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 import secrets
-from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.database import get_db, save
+from app.core.security import password_hasher, create_access_token, token_claims
 from app.core.config import settings
-from app.core.dependencies import get_current_active_user
+from app.core.dependencies import get_current_active_user, invalidate_principal
+from app.core.revocation import revoke_user_tokens
+from app.core.serialization import respond
 from app.models.user import User
 from app.schemas.auth import Token, UserWithToken
 from app.schemas.user import UserCreate, UserResponse, UserLogin
@@ -15,10 +18,11 @@ router = APIRouter()
 
 
 @router.post("/register", response_model=UserWithToken, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    result = await db.execute(select(User).filter(User.email == user_data.email))
+    existing_user = result.scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -26,7 +30,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     verification_token = secrets.token_urlsafe(32)
     
     user = User(
@@ -38,14 +42,12 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         email_verification_token=verification_token,
     )
     
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    await save(db, user)
     
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id), "email": user.email},
+        data=token_claims(user),
         expires_delta=access_token_expires
     )
     
@@ -58,12 +60,13 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Login user and return access token"""
-    user = db.query(User).filter(User.email == form_data.username).first()
+    result = await db.execute(select(User).filter(User.email == form_data.username))
+    user = result.scalars().first()
     
-    if not user or not verify_password(form_data.password, user.password_hash):
+    if not user or not await password_hasher.verify(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -79,11 +82,14 @@ async def login(
     # Update last login
     from datetime import datetime
     user.last_login = datetime.utcnow()
-    db.commit()
+    user_id = user.id
+    token_data = token_claims(user)
+    await db.commit()
+    invalidate_principal(user_id)
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id), "email": user.email},
+        data=token_data,
         expires_delta=access_token_expires
     )
     
@@ -93,19 +99,25 @@ async def login(
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
     """Get current user information"""
-    return UserResponse.model_validate(current_user)
+    return respond(UserResponse, current_user)
 
 
 @router.post("/logout")
-async def logout(current_user: User = Depends(get_current_active_user)):
-    """Logout user (client should discard token)"""
+async def logout(
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Logout user (revokes every token issued to the user so far)"""
+    await revoke_user_tokens(db, current_user.id)
+    invalidate_principal(current_user.id)
     return {"message": "Successfully logged out"}
 
 
 @router.post("/forgot-password")
-async def forgot_password(email: str, db: Session = Depends(get_db)):
+async def forgot_password(email: str, db: AsyncSession = Depends(get_db)):
     """Request password reset"""
-    user = db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).filter(User.email == email))
+    user = result.scalars().first()
     if not user:
         # Don't reveal if email exists
         return {"message": "If email exists, password reset link has been sent"}
@@ -116,7 +128,7 @@ async def forgot_password(email: str, db: Session = Depends(get_db)):
     reset_token = secrets.token_urlsafe(32)
     user.password_reset_token = reset_token
     user.password_reset_expires = datetime.utcnow() + timedelta(hours=1)
-    db.commit()
+    await db.commit()
     
     # TODO: Send email with reset token
     return {"message": "If email exists, password reset link has been sent"}
@@ -126,15 +138,16 @@ async def forgot_password(email: str, db: Session = Depends(get_db)):
 async def reset_password(
     token: str,
     new_password: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Reset password with token"""
     from datetime import datetime
     
-    user = db.query(User).filter(
+    result = await db.execute(select(User).filter(
         User.password_reset_token == token,
         User.password_reset_expires > datetime.utcnow()
-    ).first()
+    ))
+    user = result.scalars().first()
     
     if not user:
         raise HTTPException(
@@ -142,18 +155,24 @@ async def reset_password(
             detail="Invalid or expired reset token"
         )
     
-    user.password_hash = get_password_hash(new_password)
+    user.password_hash = await password_hasher.hash(new_password)
     user.password_reset_token = None
     user.password_reset_expires = None
-    db.commit()
+    user_id = user.id
+    await db.commit()
+    
+    # Sign out sessions that used the old password
+    await revoke_user_tokens(db, user_id)
+    invalidate_principal(user_id)
     
     return {"message": "Password reset successfully"}
 
 
 @router.post("/verify-email")
-async def verify_email(token: str, db: Session = Depends(get_db)):
+async def verify_email(token: str, db: AsyncSession = Depends(get_db)):
     """Verify email with token"""
-    user = db.query(User).filter(User.email_verification_token == token).first()
+    result = await db.execute(select(User).filter(User.email_verification_token == token))
+    user = result.scalars().first()
     
     if not user:
         raise HTTPException(
@@ -166,7 +185,9 @@ async def verify_email(token: str, db: Session = Depends(get_db)):
     
     user.email_verified = True
     user.email_verification_token = None
-    db.commit()
+    user_id = user.id
+    await db.commit()
+    invalidate_principal(user_id)
     
     return {"message": "Email verified successfully"}
 
@@ -1,24 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from uuid import UUID
-from datetime import datetime
-from app.core.database import get_db
+from app.core.cache import catalog_cache
+from app.core.database import get_db, get_read_db, save
+from app.core.fieldsets import FIELDS_DESCRIPTION, parse_fields, select_fields, sparse_schema
+from app.core.rows import row_dicts, select_rows
+from app.core.serialization import render_json
 from app.core.dependencies import get_current_active_user
 from app.models.user import User
 from app.models.booking import Booking
 from app.models.session import Session as SessionModel
 from app.schemas.booking import BookingCreate, BookingUpdate, BookingResponse
 from app.core.enums import PaymentStatus
+from app.core.query_stats import query_budget
+from app.services.seats import (
+    cancel_booking_seats, expire_seat_holds, get_seats_left, hold_expiry, hold_seats, is_renewable, renew_booking,
+)
 
 router = APIRouter()
 
 
-@router.get("/users/{user_id}/bookings", response_model=List[BookingResponse])
+@router.get("/users/{user_id}/bookings", response_model=List[BookingResponse], dependencies=[Depends(query_budget(2))])
 async def get_user_bookings(
     user_id: UUID,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get bookings for a user (user can only see their own)"""
     if current_user.id != user_id and current_user.role.value != "admin":
@@ -27,18 +36,25 @@ async def get_user_bookings(
             detail="Not authorized to view these bookings"
         )
     
-    bookings = db.query(Booking).filter(Booking.user_id == user_id).all()
-    return bookings
+    selected = parse_fields(fields, BookingResponse)
+    result = await db.execute(select_rows(Booking, BookingResponse, selected).filter(Booking.user_id == user_id))
+    bookings = row_dicts(result.all())
+    return Response(render_json(List[sparse_schema(BookingResponse, selected)], bookings), media_type="application/json")
 
 
-@router.get("/{booking_id}", response_model=BookingResponse)
+@router.get("/{booking_id}", response_model=BookingResponse, dependencies=[Depends(query_budget(2))])
 async def get_booking(
     booking_id: UUID,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get booking details"""
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    selected = parse_fields(fields, BookingResponse)
+    result = await db.execute(
+        select_fields(select(Booking), Booking, selected, extra=["user_id"]).filter(Booking.id == booking_id)
+    )
+    booking = result.scalars().first()
     
     if not booking:
         raise HTTPException(
@@ -53,20 +69,21 @@ async def get_booking(
             detail="Not authorized to view this booking"
         )
     
-    return booking
+    return Response(render_json(sparse_schema(BookingResponse, selected), booking), media_type="application/json")
 
 
-@router.post("", response_model=BookingResponse, status_code=status.HTTP_201_CREATED)
+@router.post("", response_model=BookingResponse, status_code=status.HTTP_201_CREATED, dependencies=[Depends(query_budget(6))])
 async def create_booking(
     booking_data: BookingCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new booking"""
     # Check if session exists and is active
-    session = db.query(SessionModel).filter(
+    result = await db.execute(select(SessionModel).filter(
         SessionModel.id == booking_data.session_id
-    ).first()
+    ))
+    session = result.scalars().first()
     
     if not session:
         raise HTTPException(
@@ -74,27 +91,28 @@ async def create_booking(
             detail="Session not found"
         )
     
-    # Check for duplicate booking
-    existing_booking = db.query(Booking).filter(
+    # Check for duplicate booking; one whose payment failed or whose hold lapsed is renewed in place
+    result = await db.execute(select(Booking).filter(
         Booking.user_id == current_user.id,
         Booking.session_id == booking_data.session_id
-    ).first()
+    ))
+    existing_booking = result.scalars().first()
     
-    if existing_booking:
+    if existing_booking and not is_renewable(existing_booking):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You have already booked this session"
         )
     
-    # Calculate seats left (only count paid bookings)
-    paid_bookings = db.query(Booking).filter(
-        Booking.session_id == booking_data.session_id,
-        Booking.payment_status == PaymentStatus.PAID
-    ).all()
-    seats_booked = sum(b.seats for b in paid_bookings)
-    seats_left = session.capacity - seats_booked
+    if existing_booking and existing_booking.payment_status == PaymentStatus.PENDING:
+        # The sweeper has not failed the lapsed hold yet; do it now so its seats are released
+        await expire_seat_holds(db, [existing_booking.id])
+    
+    # Hold the seats atomically until payment; the hold is rolled back with the transaction if the booking fails
+    seats_left = await hold_seats(db, booking_data.session_id, booking_data.seats)
     
-    if booking_data.seats > seats_left:
+    if seats_left is None:
+        seats_left = await get_seats_left(db, booking_data.session_id)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Not enough seats available. Only {seats_left} seats left"
@@ -102,34 +120,46 @@ async def create_booking(
     
     # Get course price
     from app.models.course import Course
-    course = db.query(Course).filter(Course.id == session.course_id).first()
+    result = await db.execute(select(Course).filter(Course.id == session.course_id))
+    course = result.scalars().first()
     price = course.price or 0
     total_amount = price * booking_data.seats
     
-    booking = Booking(
-        user_id=current_user.id,
-        session_id=booking_data.session_id,
+    values = dict(
         seats=booking_data.seats,
         total_amount=total_amount,
         contact_phone=booking_data.contact_phone,
         special_requirements=booking_data.special_requirements,
+        hold_expires_at=hold_expiry(),
     )
     
-    db.add(booking)
-    db.commit()
-    db.refresh(booking)
+    if existing_booking:
+        booking = await renew_booking(db, existing_booking.id, values)
+        if booking is None:
+            # A late payment settled it meanwhile
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="You have already booked this session"
+            )
+        await db.commit()
+    else:
+        booking = Booking(user_id=current_user.id, session_id=booking_data.session_id, **values)
+        await save(db, booking)
+    # Seat counts are part of the cached session responses
+    catalog_cache.invalidate("sessions")
     return booking
 
 
-@router.put("/{booking_id}/cancel", response_model=BookingResponse)
+@router.put("/{booking_id}/cancel", response_model=BookingResponse, dependencies=[Depends(query_budget(4))])
 async def cancel_booking(
     booking_id: UUID,
     cancellation_reason: str = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Cancel a booking"""
-    booking = db.query(Booking).filter(Booking.id == booking_id).first()
+    result = await db.execute(select(Booking).filter(Booking.id == booking_id))
+    booking = result.scalars().first()
     
     if not booking:
         raise HTTPException(
@@ -150,20 +180,25 @@ async def cancel_booking(
             detail="Booking is already cancelled"
         )
     
-    booking.cancelled_at = datetime.utcnow()
-    booking.cancellation_reason = cancellation_reason
-    booking.payment_status = PaymentStatus.REFUNDED
+    # Cancel only from the state just read, so a concurrent payment or hold sweep cannot move the seats twice
+    booking = await cancel_booking_seats(db, booking.id, booking.payment_status, cancellation_reason)
+    if booking is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Booking changed while cancelling, please retry"
+        )
     
-    db.commit()
-    db.refresh(booking)
+    await db.commit()
+    catalog_cache.invalidate("sessions")
     return booking
 
 
-@router.get("/sessions/{session_id}/bookings", response_model=List[BookingResponse])
+@router.get("/sessions/{session_id}/bookings", response_model=List[BookingResponse], dependencies=[Depends(query_budget(2))])
 async def get_session_bookings(
     session_id: UUID,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all bookings for a session (admin only)"""
     if current_user.role.value != "admin":
@@ -172,6 +207,8 @@ async def get_session_bookings(
             detail="Admin access required"
         )
     
-    bookings = db.query(Booking).filter(Booking.session_id == session_id).all()
-    return bookings
+    selected = parse_fields(fields, BookingResponse)
+    result = await db.execute(select_rows(Booking, BookingResponse, selected).filter(Booking.session_id == session_id))
+    bookings = row_dicts(result.all())
+    return Response(render_json(List[sparse_schema(BookingResponse, selected)], bookings), media_type="application/json")
 
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from uuid import UUID
 from datetime import datetime
-from app.core.database import get_db
-from app.core.dependencies import get_current_active_user, require_admin
-from app.models.user import User
+from app.core.database import get_db, get_read_db, save, update_returning
+from app.core.pagination import paginate_query, page_with_links
+from app.core.rows import row_dicts, select_rows
+from app.core.serialization import respond
+from app.core.dependencies import get_current_active_user, require_admin, Principal
 from app.models.corporate_request import CorporateRequest
 from app.schemas.corporate_request import CorporateRequestCreate, CorporateRequestUpdate, CorporateRequestResponse
 
@@ -15,26 +18,26 @@ router = APIRouter()
 @router.post("/requests", response_model=CorporateRequestResponse, status_code=status.HTTP_201_CREATED)
 async def create_corporate_request(
     request_data: CorporateRequestCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Submit a corporate training request (public endpoint)"""
     request = CorporateRequest(**request_data.dict())
-    db.add(request)
-    db.commit()
-    db.refresh(request)
+    await save(db, request)
     return request
 
 
 @router.get("/requests", response_model=List[CorporateRequestResponse])
 async def list_corporate_requests(
+    request: Request,
     status_filter: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List all corporate requests (admin only)"""
-    query = db.query(CorporateRequest)
+    """List all corporate requests, newest first (admin only; pass `cursor` from X-Next-Cursor for the next page)"""
+    query = select_rows(CorporateRequest, CorporateRequestResponse)
     
     if status_filter:
         from app.core.enums import CorporateRequestStatus
@@ -44,18 +47,23 @@ async def list_corporate_requests(
         except ValueError:
             pass
     
-    requests = query.order_by(CorporateRequest.created_at.desc()).offset(skip).limit(limit).all()
-    return requests
+    sort_keys = (CorporateRequest.created_at, CorporateRequest.id)
+    result = await db.execute(
+        paginate_query(query, sort_keys, limit, cursor=cursor, skip=skip, descending=True)
+    )
+    requests, headers = page_with_links(request, result.all(), sort_keys, limit)
+    return respond(List[CorporateRequestResponse], row_dicts(requests), headers=headers)
 
 
 @router.get("/requests/{request_id}", response_model=CorporateRequestResponse)
 async def get_corporate_request(
     request_id: UUID,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get corporate request details (admin only)"""
-    request = db.query(CorporateRequest).filter(CorporateRequest.id == request_id).first()
+    result = await db.execute(select(CorporateRequest).filter(CorporateRequest.id == request_id))
+    request = result.scalars().first()
     
     if not request:
         raise HTTPException(
@@ -63,18 +71,25 @@ async def get_corporate_request(
             detail="Corporate request not found"
         )
     
-    return request
+    return respond(CorporateRequestResponse, request)
 
 
 @router.put("/requests/{request_id}", response_model=CorporateRequestResponse)
 async def update_corporate_request(
     request_id: UUID,
     request_data: CorporateRequestUpdate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update corporate request status (admin only)"""
-    request = db.query(CorporateRequest).filter(CorporateRequest.id == request_id).first()
+    update_data = request_data.dict(exclude_unset=True)
+    
+    # Set responded_at and responded_by if status is being updated
+    if "status" in update_data:
+        update_data["responded_at"] = datetime.utcnow()
+        update_data["responded_by"] = current_user.id
+    
+    request = await update_returning(db, CorporateRequest, request_id, update_data)
     
     if not request:
         raise HTTPException(
@@ -82,29 +97,19 @@ async def update_corporate_request(
             detail="Corporate request not found"
         )
     
-    update_data = request_data.dict(exclude_unset=True)
-    
-    # Set responded_at and responded_by if status is being updated
-    if "status" in update_data:
-        request.responded_at = datetime.utcnow()
-        request.responded_by = current_user.id
-    
-    for field, value in update_data.items():
-        setattr(request, field, value)
-    
-    db.commit()
-    db.refresh(request)
+    await db.commit()
     return request
 
 
 @router.delete("/requests/{request_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_corporate_request(
     request_id: UUID,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a corporate request (admin only)"""
-    request = db.query(CorporateRequest).filter(CorporateRequest.id == request_id).first()
+    result = await db.execute(select(CorporateRequest).filter(CorporateRequest.id == request_id))
+    request = result.scalars().first()
     
     if not request:
         raise HTTPException(
@@ -112,7 +117,7 @@ async def delete_corporate_request(
             detail="Corporate request not found"
         )
     
-    db.delete(request)
-    db.commit()
+    await db.delete(request)
+    await db.commit()
     return None
 
@@ -1,28 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from datetime import date
 from uuid import UUID
-from app.core.database import get_db
-from app.core.dependencies import get_current_active_user, require_admin
-from app.models.user import User
+from app.core.cache import catalog_cache
+from app.core.database import get_db, get_read_db, save, update_returning
+from app.core.pagination import paginate_query, page_with_links
+from app.core.rows import row_dicts, select_rows
+from app.core.fieldsets import FIELDS_DESCRIPTION, parse_fields, select_fields, sparse_schema
+from app.core.dependencies import get_current_active_user, require_admin, Principal
 from app.models.course import Course
-from app.schemas.course import CourseCreate, CourseUpdate, CourseResponse
-from app.core.enums import CourseCategory, Audience
+from app.models.session import Session
+from app.models.trainer import Trainer
+from app.schemas.course import CourseCreate, CourseUpdate, CourseResponse, CourseDetailResponse, CourseSearchResult
+from app.core.enums import CourseCategory, Audience, SessionStatus
+from app.core.serialization import render_json
+from app.core.query_stats import query_budget
+from app.services.search import search_courses, refresh_search_vector
 
 router = APIRouter()
 
 
-@router.get("", response_model=List[CourseResponse])
+@router.get("", response_model=List[CourseResponse], dependencies=[Depends(query_budget(1))])
 async def list_courses(
+    request: Request,
     category: Optional[CourseCategory] = None,
     audience: Optional[Audience] = None,
     is_published: Optional[bool] = True,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List all courses with optional filters"""
-    query = db.query(Course).filter(Course.is_active == True)
+    """List all courses with optional filters (pass `cursor` from X-Next-Cursor for the next page)"""
+    cache_key = catalog_cache.key(request, ["courses"])
+    cached = catalog_cache.get_response(request, cache_key, db)
+    if cached is not None:
+        return cached
+    
+    selected = parse_fields(fields, CourseResponse)
+    sort_keys = (Course.created_at, Course.id)
+    query = select_rows(Course, CourseResponse, selected, extra=[c.key for c in sort_keys])
+    query = query.filter(Course.is_active == True)
     
     if is_published is not None:
         query = query.filter(Course.is_published == is_published)
@@ -33,17 +55,53 @@ async def list_courses(
     if audience:
         query = query.filter(Course.audience == audience)
     
-    courses = query.offset(skip).limit(limit).all()
-    return courses
+    result = await db.execute(paginate_query(query, sort_keys, limit, cursor=cursor, skip=skip))
+    courses, headers = page_with_links(request, result.all(), sort_keys, limit)
+    body = render_json(List[sparse_schema(CourseResponse, selected)], row_dicts(courses))
+    return catalog_cache.store_response(request, cache_key, body, headers)
+
+
+@router.get("/search", response_model=List[CourseSearchResult], dependencies=[Depends(query_budget(2))])
+async def search_course_catalog(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Full-text search over published courses (title, description, syllabus), best match first"""
+    cache_key = catalog_cache.key(request, ["courses"])
+    cached = catalog_cache.get_response(request, cache_key, db)
+    if cached is not None:
+        return cached
+    
+    matches = await search_courses(db, q, skip, limit)
+    results = [
+        {"course": course, "rank": rank, "highlight": highlight}
+        for course, rank, highlight in matches
+    ]
+    return catalog_cache.store_response(request, cache_key, render_json(List[CourseSearchResult], results))
 
 
-@router.get("/{course_id}", response_model=CourseResponse)
-async def get_course(course_id: UUID, db: Session = Depends(get_db)):
+@router.get("/{course_id}", response_model=CourseResponse, dependencies=[Depends(query_budget(1))])
+async def get_course(
+    course_id: UUID,
+    request: Request,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_read_db)
+):
     """Get course details"""
-    course = db.query(Course).filter(
+    cache_key = catalog_cache.key(request, ["courses"])
+    cached = catalog_cache.get_response(request, cache_key, db)
+    if cached is not None:
+        return cached
+    
+    selected = parse_fields(fields, CourseResponse)
+    result = await db.execute(select_fields(select(Course), Course, selected).filter(
         Course.id == course_id,
         Course.is_active == True
-    ).first()
+    ))
+    course = result.scalars().first()
     
     if not course:
         raise HTTPException(
@@ -51,20 +109,53 @@ async def get_course(course_id: UUID, db: Session = Depends(get_db)):
             detail="Course not found"
         )
     
-    return course
+    return catalog_cache.store_response(request, cache_key, render_json(sparse_schema(CourseResponse, selected), course))
+
+
+@router.get("/{course_id}/detail", response_model=CourseDetailResponse, dependencies=[Depends(query_budget(2))])
+async def get_course_detail(course_id: UUID, request: Request, db: AsyncSession = Depends(get_read_db)):
+    """Get a course with its trainer and upcoming sessions (with seats left) in one call"""
+    cache_key = catalog_cache.key(request, ["courses", "trainers", "sessions"])
+    cached = catalog_cache.get_response(request, cache_key, db)
+    if cached is not None:
+        return cached
+    
+    # Two queries regardless of the number of sessions: course + trainer joined, then sessions
+    result = await db.execute(
+        select(Course)
+        .options(
+            joinedload(Course.trainer.and_(Trainer.is_active == True)),
+            selectinload(Course.sessions.and_(
+                Session.date >= date.today(),
+                Session.status.in_([SessionStatus.SCHEDULED, SessionStatus.ONGOING])
+            )),
+        )
+        .filter(Course.id == course_id, Course.is_active == True)
+    )
+    course = result.scalars().first()
+    
+    if not course:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found"
+        )
+    
+    return catalog_cache.store_response(request, cache_key, render_json(CourseDetailResponse, course))
 
 
 @router.post("", response_model=CourseResponse, status_code=status.HTTP_201_CREATED)
 async def create_course(
     course_data: CourseCreate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new course (admin only)"""
     course = Course(**course_data.dict())
     db.add(course)
-    db.commit()
-    db.refresh(course)
+    await db.flush()
+    await refresh_search_vector(db, [course.id])
+    await save(db, course)
+    catalog_cache.invalidate("courses")
     return course
 
 
@@ -72,11 +163,11 @@ async def create_course(
 async def update_course(
     course_id: UUID,
     course_data: CourseUpdate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a course (admin only)"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = await update_returning(db, Course, course_id, course_data.dict(exclude_unset=True))
     
     if not course:
         raise HTTPException(
@@ -84,23 +175,21 @@ async def update_course(
             detail="Course not found"
         )
     
-    update_data = course_data.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(course, field, value)
-    
-    db.commit()
-    db.refresh(course)
+    await refresh_search_vector(db, [course_id])
+    await db.commit()
+    catalog_cache.invalidate("courses")
     return course
 
 
 @router.delete("/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_course(
     course_id: UUID,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a course (admin only) - soft delete"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    result = await db.execute(select(Course).filter(Course.id == course_id))
+    course = result.scalars().first()
     
     if not course:
         raise HTTPException(
@@ -109,6 +198,7 @@ async def delete_course(
         )
     
     course.is_active = False
-    db.commit()
+    await db.commit()
+    catalog_cache.invalidate("courses")
     return None
 
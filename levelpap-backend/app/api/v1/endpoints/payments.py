@@ -1,23 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import Callable, Tuple
 from uuid import UUID
+import json
 import secrets
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, get_read_db, save
 from app.core.dependencies import get_current_active_user
 from app.models.user import User
 from app.models.booking import Booking
 from app.models.payment import Payment
 from app.schemas.payment import PaymentInitiate, PaymentResponse
 from app.core.enums import PaymentProvider, PaymentTransactionStatus, PaymentStatus
+from app.core.query_stats import query_budget
+from app.core.serialization import respond
+from app.services.payment_events import payment_events
+from app.services.payments import ProviderError, flutterwave_client, mpesa_client
+from app.services.seats import hold_is_expired
+from app.services.webhooks import (
+    FINAL_STATUSES, WebhookEvent, flutterwave_event, hmac_matches, mpesa_event, token_matches, webhook_worker,
+)
 
 router = APIRouter()
 
 
-@router.post("/mpesa/initiate", response_model=PaymentResponse)
+def reset_payment(payment: Payment, provider: PaymentProvider, reference: str, amount) -> Payment:
+    """Set up a new payment, or reuse a failed attempt's row (one payment per booking) with a fresh reference"""
+    payment.provider = provider
+    payment.payment_reference = reference
+    payment.amount = amount
+    payment.currency = "KES"
+    payment.status = PaymentTransactionStatus.PENDING
+    payment.provider_transaction_id = None
+    payment.provider_response = None
+    payment.payment_metadata = None
+    payment.failure_reason = None
+    return payment
+
+
+async def fail_payment(db: AsyncSession, payment: Payment, exc: ProviderError):
+    """Record a failed provider call; the customer can retry initiation"""
+    payment.status = PaymentTransactionStatus.FAILED
+    payment.failure_reason = exc.message
+    payment.provider_response = exc.response
+    await save(db, payment)
+
+
+@router.post("/mpesa/initiate", response_model=PaymentResponse, dependencies=[Depends(query_budget(4))])
 async def initiate_mpesa_payment(
     payment_data: PaymentInitiate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Initiate M-Pesa payment"""
     if payment_data.provider != PaymentProvider.MPESA:
@@ -32,8 +67,15 @@ async def initiate_mpesa_payment(
             detail="Phone number required for M-Pesa"
         )
     
+    if not mpesa_client.configured:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="M-Pesa payments are not configured"
+        )
+    
     # Get booking
-    booking = db.query(Booking).filter(Booking.id == payment_data.booking_id).first()
+    result = await db.execute(select(Booking).filter(Booking.id == payment_data.booking_id))
+    booking = result.scalars().first()
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -52,9 +94,16 @@ async def initiate_mpesa_payment(
             detail="Booking payment status is not pending"
         )
     
-    # Check if payment already exists
-    existing_payment = db.query(Payment).filter(Payment.booking_id == payment_data.booking_id).first()
-    if existing_payment:
+    if hold_is_expired(booking):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Seat hold has expired"
+        )
+    
+    # Check if payment already exists; only a failed attempt may be retried
+    result = await db.execute(select(Payment).filter(Payment.booking_id == payment_data.booking_id))
+    payment = result.scalars().first()
+    if payment and payment.status != PaymentTransactionStatus.FAILED:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Payment already initiated for this booking"
@@ -63,40 +112,38 @@ async def initiate_mpesa_payment(
     # Generate payment reference
     payment_reference = f"MPESA_{secrets.token_hex(8).upper()}"
     
-    # Create payment record
-    payment = Payment(
-        booking_id=payment_data.booking_id,
-        provider=PaymentProvider.MPESA,
-        payment_reference=payment_reference,
-        amount=booking.total_amount,
-        currency="KES",
-        status=PaymentTransactionStatus.PENDING,
+    # Create the payment record (or reset the failed one) before calling M-Pesa so the
+    # callback always finds it; no connection is held during the provider call
+    payment = reset_payment(
+        payment or Payment(booking_id=payment_data.booking_id),
+        PaymentProvider.MPESA,
+        payment_reference,
+        booking.total_amount,
     )
+    await save(db, payment)
     
-    db.add(payment)
-    db.commit()
-    db.refresh(payment)
-    
-    # TODO: Integrate with M-Pesa API
-    # This is a placeholder - implement actual M-Pesa integration
-    # from app.services.payments.mpesa import initiate_mpesa_stk_push
-    # mpesa_response = initiate_mpesa_stk_push(
-    #     phone=payment_data.phone,
-    #     amount=float(booking.total_amount),
-    #     reference=payment_reference
-    # )
-    # payment.provider_transaction_id = mpesa_response.get("CheckoutRequestID")
-    # payment.provider_response = mpesa_response
-    # db.commit()
+    try:
+        mpesa_response = await mpesa_client.stk_push(payment_data.phone, payment.amount, payment_reference)
+    except ProviderError as exc:
+        await fail_payment(db, payment, exc)
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="M-Pesa request failed, please try again"
+        )
+    
+    payment.provider_transaction_id = mpesa_response["CheckoutRequestID"]
+    payment.provider_response = mpesa_response
+    payment.status = PaymentTransactionStatus.PROCESSING
+    await save(db, payment)
     
     return payment
 
 
-@router.post("/flutterwave/initiate", response_model=PaymentResponse)
+@router.post("/flutterwave/initiate", response_model=PaymentResponse, dependencies=[Depends(query_budget(4))])
 async def initiate_flutterwave_payment(
     payment_data: PaymentInitiate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Initiate Flutterwave payment"""
     if payment_data.provider != PaymentProvider.FLUTTERWAVE:
@@ -111,8 +158,15 @@ async def initiate_flutterwave_payment(
             detail="Email required for Flutterwave"
         )
     
+    if not flutterwave_client.configured:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Flutterwave payments are not configured"
+        )
+    
     # Get booking
-    booking = db.query(Booking).filter(Booking.id == payment_data.booking_id).first()
+    result = await db.execute(select(Booking).filter(Booking.id == payment_data.booking_id))
+    booking = result.scalars().first()
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -131,9 +185,16 @@ async def initiate_flutterwave_payment(
             detail="Booking payment status is not pending"
         )
     
-    # Check if payment already exists
-    existing_payment = db.query(Payment).filter(Payment.booking_id == payment_data.booking_id).first()
-    if existing_payment:
+    if hold_is_expired(booking):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Seat hold has expired"
+        )
+    
+    # Check if payment already exists; only a failed attempt may be retried
+    result = await db.execute(select(Payment).filter(Payment.booking_id == payment_data.booking_id))
+    payment = result.scalars().first()
+    if payment and payment.status != PaymentTransactionStatus.FAILED:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Payment already initiated for this booking"
@@ -142,75 +203,134 @@ async def initiate_flutterwave_payment(
     # Generate payment reference
     payment_reference = f"FLW_{secrets.token_hex(8).upper()}"
     
-    # Create payment record
-    payment = Payment(
-        booking_id=payment_data.booking_id,
-        provider=PaymentProvider.FLUTTERWAVE,
-        payment_reference=payment_reference,
-        amount=booking.total_amount,
-        currency="KES",
-        status=PaymentTransactionStatus.PENDING,
+    payment = reset_payment(
+        payment or Payment(booking_id=payment_data.booking_id),
+        PaymentProvider.FLUTTERWAVE,
+        payment_reference,
+        booking.total_amount,
     )
+    await save(db, payment)
     
-    db.add(payment)
-    db.commit()
-    db.refresh(payment)
+    try:
+        flutterwave_response = await flutterwave_client.create_payment(
+            payment_reference, payment.amount, payment.currency, payment_data.email
+        )
+    except ProviderError as exc:
+        await fail_payment(db, payment, exc)
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Flutterwave request failed, please try again"
+        )
     
-    # TODO: Integrate with Flutterwave API
-    # This is a placeholder - implement actual Flutterwave integration
+    # The customer completes payment on Flutterwave's hosted page; the webhook reports the result
+    payment.provider_response = flutterwave_response
+    payment.payment_metadata = {"checkout_url": flutterwave_response["data"]["link"]}
+    payment.status = PaymentTransactionStatus.PROCESSING
+    await save(db, payment)
     
     return payment
 
 
-@router.get("/status", response_model=PaymentResponse)
+async def find_payment(db: AsyncSession, reference: str):
+    """Load a payment and its booking by reference, refreshing them if already in the session"""
+    result = await db.execute(
+        select(Payment)
+        .options(joinedload(Payment.booking))
+        .filter(Payment.payment_reference == reference)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+
+@router.get("/status", response_model=PaymentResponse, dependencies=[Depends(query_budget(3))])
 async def get_payment_status(
     ref: str,
+    wait: float = Query(0, ge=0, description="Seconds to wait for an open payment to settle before responding"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get payment status by reference"""
-    payment = db.query(Payment).filter(Payment.payment_reference == ref).first()
+    """Get payment status by reference; with `wait`, long-poll until the payment settles"""
+    wait = min(wait, settings.PAYMENT_STATUS_MAX_WAIT_SECONDS)
+    if wait:
+        # Settlements are committed on the primary; a lagging replica would hide them
+        db.info["replica"] = None
     
-    if not payment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Payment not found"
-        )
+    with payment_events.watch(ref) as watch:
+        payment = await find_payment(db, ref)
+        
+        if not payment:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Payment not found"
+            )
+        
+        # Users can only view their own payments
+        if payment.booking.user_id != current_user.id and current_user.role.value != "admin":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to view this payment"
+            )
+        
+        if wait and payment.status not in FINAL_STATUSES:
+            # End the transaction so no connection is held while parked, then re-read once
+            # woken (or at the timeout, in case the notification was missed)
+            await db.commit()
+            await watch.wait(wait)
+            payment = await find_payment(db, ref)
     
-    # Users can only view their own payments
-    if payment.booking.user_id != current_user.id and current_user.role.value != "admin":
+    return respond(PaymentResponse, payment)
+
+
+async def read_webhook(request: Request, parse_event: Callable[[dict], WebhookEvent]) -> Tuple[dict, WebhookEvent]:
+    """Parse a verified webhook body and identify its event; 400 when either is malformed"""
+    try:
+        payload = json.loads(await request.body())
+        event = parse_event(payload) if isinstance(payload, dict) else None
+    except ValueError:
+        event = None
+    if event is None:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to view this payment"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid webhook payload"
         )
-    
-    return payment
+    return payload, event
 
 
-@router.post("/webhooks/mpesa")
+@router.post("/webhooks/mpesa", dependencies=[Depends(query_budget(1))])
 async def mpesa_webhook(
-    payload: dict,
-    db: Session = Depends(get_db)
+    request: Request,
+    token: str = "",
+    db: AsyncSession = Depends(get_db)
 ):
-    """Handle M-Pesa webhook"""
-    # TODO: Implement webhook signature verification
-    # TODO: Process webhook payload and update payment status
-    # TODO: Update booking payment_status when payment is completed
+    """Handle M-Pesa webhook: store the callback and acknowledge; the webhook worker applies it"""
+    # Daraja does not sign callbacks; the registered callback URL carries a secret token instead
+    if not token_matches(settings.MPESA_CALLBACK_TOKEN, token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook token"
+        )
     
-    # Placeholder implementation
-    return {"message": "Webhook received"}
+    payload, event = await read_webhook(request, mpesa_event)
+    await webhook_worker.store(db, PaymentProvider.MPESA, event, payload)
+    
+    return {"ResultCode": 0, "ResultDesc": "Accepted"}
 
 
-@router.post("/webhooks/flutterwave")
+@router.post("/webhooks/flutterwave", dependencies=[Depends(query_budget(1))])
 async def flutterwave_webhook(
-    payload: dict,
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncSession = Depends(get_db)
 ):
-    """Handle Flutterwave webhook"""
-    # TODO: Implement webhook signature verification
-    # TODO: Process webhook payload and update payment status
-    # TODO: Update booking payment_status when payment is completed
+    """Handle Flutterwave webhook: verify, store and acknowledge; the webhook worker applies it"""
+    body = await request.body()
+    signature = request.headers.get("flutterwave-signature", "")
+    if not hmac_matches(settings.FLUTTERWAVE_WEBHOOK_SECRET, body, signature, encoding="base64"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook signature"
+        )
+    
+    payload, event = await read_webhook(request, flutterwave_event)
+    await webhook_worker.store(db, PaymentProvider.FLUTTERWAVE, event, payload)
     
-    # Placeholder implementation
     return {"message": "Webhook received"}
-
@@ -1,29 +1,45 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from uuid import UUID
 from datetime import date
-from app.core.database import get_db
-from app.core.dependencies import get_current_active_user, require_admin
-from app.models.user import User
+from app.core.cache import catalog_cache
+from app.core.database import get_db, get_read_db, save, update_returning
+from app.core.pagination import paginate_query, page_with_links
+from app.core.rows import row_dicts, select_rows
+from app.core.fieldsets import FIELDS_DESCRIPTION, parse_fields, select_fields, sparse_schema
+from app.core.dependencies import get_current_active_user, require_admin, Principal
 from app.models.session import Session
 from app.models.course import Course
 from app.schemas.session import SessionCreate, SessionUpdate, SessionResponse
+from app.core.serialization import render_json
+from app.core.query_stats import query_budget
 
 router = APIRouter()
 
 
-@router.get("", response_model=List[SessionResponse])
+@router.get("", response_model=List[SessionResponse], dependencies=[Depends(query_budget(1))])
 async def list_sessions(
+    request: Request,
     course_id: Optional[UUID] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List sessions with optional filters"""
-    query = db.query(Session)
+    """List sessions with optional filters (pass `cursor` from X-Next-Cursor for the next page)"""
+    cache_key = catalog_cache.key(request, ["sessions"])
+    cached = catalog_cache.get_response(request, cache_key, db)
+    if cached is not None:
+        return cached
+    
+    selected = parse_fields(fields, SessionResponse)
+    sort_keys = (Session.date, Session.start_time, Session.id)
+    query = select_rows(Session, SessionResponse, selected, extra=[c.key for c in sort_keys])
     
     if course_id:
         query = query.filter(Session.course_id == course_id)
@@ -34,14 +50,28 @@ async def list_sessions(
     if date_to:
         query = query.filter(Session.date <= date_to)
     
-    sessions = query.offset(skip).limit(limit).all()
-    return sessions
+    result = await db.execute(paginate_query(query, sort_keys, limit, cursor=cursor, skip=skip))
+    sessions, headers = page_with_links(request, result.all(), sort_keys, limit)
+    body = render_json(List[sparse_schema(SessionResponse, selected)], row_dicts(sessions))
+    return catalog_cache.store_response(request, cache_key, body, headers)
 
 
-@router.get("/{session_id}", response_model=SessionResponse)
-async def get_session(session_id: UUID, db: Session = Depends(get_db)):
+@router.get("/{session_id}", response_model=SessionResponse, dependencies=[Depends(query_budget(1))])
+async def get_session(
+    session_id: UUID,
+    request: Request,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_read_db)
+):
     """Get session details"""
-    session = db.query(Session).filter(Session.id == session_id).first()
+    cache_key = catalog_cache.key(request, ["sessions"])
+    cached = catalog_cache.get_response(request, cache_key, db)
+    if cached is not None:
+        return cached
+    
+    selected = parse_fields(fields, SessionResponse)
+    result = await db.execute(select_fields(select(Session), Session, selected).filter(Session.id == session_id))
+    session = result.scalars().first()
     
     if not session:
         raise HTTPException(
@@ -49,35 +79,45 @@ async def get_session(session_id: UUID, db: Session = Depends(get_db)):
             detail="Session not found"
         )
     
-    return session
+    return catalog_cache.store_response(request, cache_key, render_json(sparse_schema(SessionResponse, selected), session))
 
 
-@router.get("/courses/{course_id}/sessions", response_model=List[SessionResponse])
+@router.get("/courses/{course_id}/sessions", response_model=List[SessionResponse], dependencies=[Depends(query_budget(2))])
 async def get_course_sessions(
     course_id: UUID,
-    db: Session = Depends(get_db)
+    request: Request,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all sessions for a specific course"""
-    course = db.query(Course).filter(Course.id == course_id).first()
-    if not course:
+    cache_key = catalog_cache.key(request, ["courses", "sessions"])
+    cached = catalog_cache.get_response(request, cache_key, db)
+    if cached is not None:
+        return cached
+    
+    selected = parse_fields(fields, SessionResponse)
+    result = await db.execute(select(Course.id).filter(Course.id == course_id))
+    if result.first() is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
     
-    sessions = db.query(Session).filter(Session.course_id == course_id).all()
-    return sessions
+    result = await db.execute(select_rows(Session, SessionResponse, selected).filter(Session.course_id == course_id))
+    body = render_json(List[sparse_schema(SessionResponse, selected)], row_dicts(result.all()))
+    return catalog_cache.store_response(request, cache_key, body)
 
 
 @router.post("", response_model=SessionResponse, status_code=status.HTTP_201_CREATED)
 async def create_session(
     session_data: SessionCreate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new session (admin only)"""
     # Verify course exists
-    course = db.query(Course).filter(Course.id == session_data.course_id).first()
+    result = await db.execute(select(Course).filter(Course.id == session_data.course_id))
+    course = result.scalars().first()
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -92,9 +132,8 @@ async def create_session(
         trainer_id=trainer_id
     )
     
-    db.add(session)
-    db.commit()
-    db.refresh(session)
+    await save(db, session)
+    catalog_cache.invalidate("sessions")
     return session
 
 
@@ -102,11 +141,11 @@ async def create_session(
 async def update_session(
     session_id: UUID,
     session_data: SessionUpdate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a session (admin only)"""
-    session = db.query(Session).filter(Session.id == session_id).first()
+    session = await update_returning(db, Session, session_id, session_data.dict(exclude_unset=True))
     
     if not session:
         raise HTTPException(
@@ -114,25 +153,22 @@ async def update_session(
             detail="Session not found"
         )
     
-    update_data = session_data.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(session, field, value)
-    
-    db.commit()
-    db.refresh(session)
+    await db.commit()
+    catalog_cache.invalidate("sessions")
     return session
 
 
 @router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def cancel_session(
     session_id: UUID,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Cancel a session (admin only)"""
     from app.core.enums import SessionStatus
     
-    session = db.query(Session).filter(Session.id == session_id).first()
+    result = await db.execute(select(Session).filter(Session.id == session_id))
+    session = result.scalars().first()
     
     if not session:
         raise HTTPException(
@@ -141,6 +177,7 @@ async def cancel_session(
         )
     
     session.status = SessionStatus.CANCELLED
-    db.commit()
+    await db.commit()
+    catalog_cache.invalidate("sessions")
     return None
 
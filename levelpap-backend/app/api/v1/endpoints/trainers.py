@@ -1,40 +1,70 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from uuid import UUID
-from app.core.database import get_db
-from app.core.dependencies import get_current_active_user, require_admin
-from app.models.user import User
+from app.core.cache import catalog_cache
+from app.core.database import get_db, get_read_db, save, update_returning
+from app.core.pagination import paginate_query, page_with_links
+from app.core.rows import row_dicts, select_rows
+from app.core.fieldsets import FIELDS_DESCRIPTION, parse_fields, select_fields, sparse_schema
+from app.core.dependencies import get_current_active_user, require_admin, Principal
 from app.models.trainer import Trainer
 from app.schemas.trainer import TrainerCreate, TrainerUpdate, TrainerResponse
+from app.core.serialization import render_json
+from app.core.query_stats import query_budget
 
 router = APIRouter()
 
 
-@router.get("", response_model=List[TrainerResponse])
+@router.get("", response_model=List[TrainerResponse], dependencies=[Depends(query_budget(1))])
 async def list_trainers(
+    request: Request,
     is_active: Optional[bool] = True,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List all trainers"""
-    query = db.query(Trainer)
+    """List all trainers (pass `cursor` from X-Next-Cursor for the next page)"""
+    cache_key = catalog_cache.key(request, ["trainers"])
+    cached = catalog_cache.get_response(request, cache_key, db)
+    if cached is not None:
+        return cached
+    
+    selected = parse_fields(fields, TrainerResponse)
+    sort_keys = (Trainer.created_at, Trainer.id)
+    query = select_rows(Trainer, TrainerResponse, selected, extra=[c.key for c in sort_keys])
     
     if is_active is not None:
         query = query.filter(Trainer.is_active == is_active)
     
-    trainers = query.offset(skip).limit(limit).all()
-    return trainers
+    result = await db.execute(paginate_query(query, sort_keys, limit, cursor=cursor, skip=skip))
+    trainers, headers = page_with_links(request, result.all(), sort_keys, limit)
+    body = render_json(List[sparse_schema(TrainerResponse, selected)], row_dicts(trainers))
+    return catalog_cache.store_response(request, cache_key, body, headers)
 
 
-@router.get("/{trainer_id}", response_model=TrainerResponse)
-async def get_trainer(trainer_id: UUID, db: Session = Depends(get_db)):
+@router.get("/{trainer_id}", response_model=TrainerResponse, dependencies=[Depends(query_budget(1))])
+async def get_trainer(
+    trainer_id: UUID,
+    request: Request,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_read_db)
+):
     """Get trainer details"""
-    trainer = db.query(Trainer).filter(
+    cache_key = catalog_cache.key(request, ["trainers"])
+    cached = catalog_cache.get_response(request, cache_key, db)
+    if cached is not None:
+        return cached
+    
+    selected = parse_fields(fields, TrainerResponse)
+    result = await db.execute(select_fields(select(Trainer), Trainer, selected).filter(
         Trainer.id == trainer_id,
         Trainer.is_active == True
-    ).first()
+    ))
+    trainer = result.scalars().first()
     
     if not trainer:
         raise HTTPException(
@@ -42,20 +72,19 @@ async def get_trainer(trainer_id: UUID, db: Session = Depends(get_db)):
             detail="Trainer not found"
         )
     
-    return trainer
+    return catalog_cache.store_response(request, cache_key, render_json(sparse_schema(TrainerResponse, selected), trainer))
 
 
 @router.post("", response_model=TrainerResponse, status_code=status.HTTP_201_CREATED)
 async def create_trainer(
     trainer_data: TrainerCreate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new trainer (admin only)"""
     trainer = Trainer(**trainer_data.dict())
-    db.add(trainer)
-    db.commit()
-    db.refresh(trainer)
+    await save(db, trainer)
+    catalog_cache.invalidate("trainers")
     return trainer
 
 
@@ -63,11 +92,11 @@ async def create_trainer(
 async def update_trainer(
     trainer_id: UUID,
     trainer_data: TrainerUpdate,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a trainer (admin only)"""
-    trainer = db.query(Trainer).filter(Trainer.id == trainer_id).first()
+    trainer = await update_returning(db, Trainer, trainer_id, trainer_data.dict(exclude_unset=True))
     
     if not trainer:
         raise HTTPException(
@@ -75,11 +104,7 @@ async def update_trainer(
             detail="Trainer not found"
         )
     
-    update_data = trainer_data.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(trainer, field, value)
-    
-    db.commit()
-    db.refresh(trainer)
+    await db.commit()
+    catalog_cache.invalidate("trainers")
     return trainer
 
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from uuid import UUID
-from app.core.database import get_db
-from app.core.dependencies import get_current_active_user, require_admin
+from app.core.database import get_db, get_read_db, update_returning
+from app.core.pagination import paginate_query, page_with_links
+from app.core.rows import row_dicts, select_rows
+from app.core.dependencies import get_current_active_user, require_admin, invalidate_principal, Principal
+from app.core.revocation import revoke_user_tokens
+from app.core.serialization import respond
 from app.models.user import User
 from app.schemas.user import UserUpdate, UserResponse
 
@@ -12,21 +17,26 @@ router = APIRouter()
 
 @router.get("", response_model=List[UserResponse])
 async def list_users(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List all users (admin only)"""
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    """List all users (admin only; pass `cursor` from X-Next-Cursor for the next page)"""
+    sort_keys = (User.created_at, User.id)
+    query = select_rows(User, UserResponse)
+    result = await db.execute(paginate_query(query, sort_keys, limit, cursor=cursor, skip=skip))
+    users, headers = page_with_links(request, result.all(), sort_keys, limit)
+    return respond(List[UserResponse], row_dicts(users), headers=headers)
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: UUID,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get user details (admin or self)"""
     if current_user.id != user_id and current_user.role.value != "admin":
@@ -35,7 +45,8 @@ async def get_user(
             detail="Not authorized to view this user"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    result = await db.execute(select(User).filter(User.id == user_id))
+    user = result.scalars().first()
     
     if not user:
         raise HTTPException(
@@ -43,7 +54,7 @@ async def get_user(
             detail="User not found"
         )
     
-    return user
+    return respond(UserResponse, user)
 
 
 @router.put("/{user_id}", response_model=UserResponse)
@@ -51,7 +62,7 @@ async def update_user(
     user_id: UUID,
     user_data: UserUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update user (admin or self)"""
     if current_user.id != user_id and current_user.role.value != "admin":
@@ -60,7 +71,14 @@ async def update_user(
             detail="Not authorized to update this user"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    update_data = user_data.dict(exclude_unset=True)
+    if "is_active" in update_data:
+        # Bump token_version too, so tokens issued before a deactivation stay dead after reactivation
+        revoked = await revoke_user_tokens(db, user_id, **update_data)
+        user = await db.get(User, user_id, populate_existing=True) if revoked else None
+    else:
+        user = await update_returning(db, User, user_id, update_data)
+        await db.commit()
     
     if not user:
         raise HTTPException(
@@ -68,23 +86,19 @@ async def update_user(
             detail="User not found"
         )
     
-    update_data = user_data.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(user, field, value)
-    
-    db.commit()
-    db.refresh(user)
+    invalidate_principal(user_id)
     return user
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def deactivate_user(
     user_id: UUID,
-    current_user: User = Depends(require_admin),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(require_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """Deactivate a user (admin only)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    result = await db.execute(select(User).filter(User.id == user_id))
+    user = result.scalars().first()
     
     if not user:
         raise HTTPException(
@@ -92,7 +106,7 @@ async def deactivate_user(
             detail="User not found"
         )
     
-    user.is_active = False
-    db.commit()
+    await revoke_user_tokens(db, user_id, is_active=False)
+    invalidate_principal(user_id)
     return None
 
@@ -0,0 +1,180 @@
+"""
+In-process caches (per worker)
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Sequence
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import async_engine
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = metrics.counter(f"{name}_cache_hits_total", f"{name} cache hits")
+        self.misses = metrics.counter(f"{name}_cache_misses_total", f"{name} cache misses")
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses.inc()
+                return None
+            self._data.move_to_end(key)
+            self.hits.inc()
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: dict
+
+
+class ResponseCache:
+    """
+    Serialized JSON responses keyed by path and normalized query parameters.
+
+    Entries belong to one or more namespaces ("courses", "sessions", ...).
+    Invalidating a namespace bumps its generation, which is part of every key,
+    so stale entries are never served again and simply age out of the LRU.
+
+    Other workers hear about an invalidation through a NOTIFY on `channel`:
+    run() sends it right after the write, and each worker's listener (see
+    PaymentEvents.subscribe) passes it to apply_notification().
+
+    A read replica may not have the write yet, and a stale body cached under
+    the new generation would be served to everyone for the whole TTL. So for
+    `replica_lag` seconds after a namespace changes, misses on it read from
+    the primary.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, channel: str, replica_lag: float):
+        self._cache = TTLCache(name, maxsize=maxsize, ttl=ttl)
+        self._generations = defaultdict(int)
+        self.replica_lag = replica_lag
+        # namespace -> monotonic time of its last invalidation
+        self._changed_at: Dict[str, float] = {}
+        self.channel = channel
+        # Namespaces invalidated in this worker and not yet announced to the others
+        self._unannounced = set()
+        self._announce = asyncio.Event()
+
+    def key(self, request: Request, namespaces: Sequence[str]) -> tuple:
+        """Build the cache key; take it before querying so a concurrent write is never cached as fresh"""
+        params = tuple(sorted((k, v) for k, v in request.query_params.multi_items() if v != ""))
+        generations = tuple((ns, self._generations[ns]) for ns in namespaces)
+        return (request.url.path, params, generations)
+
+    def get_response(self, request: Request, key: tuple, db: AsyncSession) -> Optional[Response]:
+        """The cached response, or None after pointing `db` at the primary if a replica may be stale"""
+        entry = self._cache.get(key)
+        if entry is None:
+            if self._recently_changed(key):
+                db.info["replica"] = None
+            return None
+        return self._respond(request, entry)
+
+    def _recently_changed(self, key: tuple) -> bool:
+        since = time.monotonic() - self.replica_lag
+        return any(self._changed_at.get(ns, since) > since for ns, _ in key[2])
+
+    def _bump(self, namespaces: Sequence[str]):
+        now = time.monotonic()
+        for ns in namespaces:
+            self._generations[ns] += 1
+            self._changed_at[ns] = now
+
+    def store_response(self, request: Request, key: tuple, body: bytes, headers: Optional[dict] = None) -> Response:
+        etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        entry = CachedResponse(body, etag, headers or {})
+        self._cache.set(key, entry)
+        return self._respond(request, entry)
+
+    def invalidate(self, *namespaces: str):
+        """Call after the write commits; other workers follow once run() has announced it"""
+        self._bump(namespaces)
+        self._unannounced.update(namespaces)
+        self._announce.set()
+
+    def apply_notification(self, namespace: Optional[str]):
+        """Invalidation announced on `channel`; None (notifications may have been missed) invalidates everything"""
+        self._bump([namespace] if namespace is not None else list(self._generations))
+
+    async def run(self):
+        """Background loop: announce this worker's invalidations to the others"""
+        while True:
+            await self._announce.wait()
+            self._announce.clear()
+            namespaces, self._unannounced = sorted(self._unannounced), set()
+            try:
+                async with async_engine.connect() as conn:
+                    await conn.execute(
+                        text("SELECT pg_notify(:channel, ns) FROM unnest(CAST(:namespaces AS text[])) AS ns"),
+                        {"channel": self.channel, "namespaces": namespaces},
+                    )
+                    await conn.commit()
+            except Exception:
+                # Other workers keep serving their entries until they expire
+                logger.exception("Failed to announce %s cache invalidation", self.channel)
+
+    def clear(self):
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @staticmethod
+    def _respond(request: Request, entry: CachedResponse) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache", **entry.headers}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or entry.etag in [t.strip() for t in if_none_match.split(",")]):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+# Public catalog reads (courses, trainers, sessions)
+catalog_cache = ResponseCache(
+    "catalog",
+    maxsize=settings.CATALOG_CACHE_MAX_ENTRIES,
+    ttl=settings.CATALOG_CACHE_TTL_SECONDS,
+    channel="catalog_invalidated",
+    # A replica is dropped from rotation at the first health check that finds it lagging past the limit
+    replica_lag=settings.DATABASE_REPLICA_MAX_LAG_SECONDS + settings.DATABASE_REPLICA_CHECK_SECONDS,
+)
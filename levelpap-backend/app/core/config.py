@@ -6,11 +6,51 @@ from pydantic import field_validator
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    # Fail fast instead of queueing on a saturated pool: checkouts wait at most DB_POOL_TIMEOUT_SECONDS,
+    # and while the pool is exhausted after a checkout waited DB_SHED_WAIT_SECONDS (within the window) new ones get a 503
+    DB_POOL_TIMEOUT_SECONDS: float = 5
+    DB_SHED_WAIT_SECONDS: float = 0.5
+    DB_SHED_WINDOW_SECONDS: float = 5
+    DB_RETRY_AFTER_SECONDS: int = 2
+    # Per-request query accounting: strict mode raises on lazy loads and fails requests over their query budget
+    DB_STRICT_LOADING: bool = False
+    DB_DEFAULT_QUERY_BUDGET: int = 20
+    DB_REPEATED_QUERY_THRESHOLD: int = 5
+    # Optional read replicas (comma-separated URLs) for read-only routes
+    DATABASE_REPLICA_URLS: str = ""
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = 10
+    DATABASE_REPLICA_CHECK_SECONDS: int = 5
+    READ_YOUR_WRITES_SECONDS: int = 5
+    # Startup warm-up: connections each worker opens before serving, how long startup waits for it,
+    # and the primary round-trip above which /ready reports the worker as degraded
+    WARMUP_CONNECTIONS: int = 2
+    WARMUP_TIMEOUT_SECONDS: float = 15
+    READY_MAX_DB_LATENCY_MS: float = 100
     
     # JWT
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    TOKEN_REVOCATION_REFRESH_SECONDS: int = 5
+    
+    # Password hashing (bcrypt runs in a process pool)
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    PASSWORD_HASH_RETRY_AFTER_SECONDS: int = 1
+    
+    # Authenticated user cache (per worker)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_SIZE: int = 10000
+    
+    # Public catalog response cache (per worker; writes are announced to the other workers over NOTIFY)
+    CATALOG_CACHE_TTL_SECONDS: int = 60
+    CATALOG_CACHE_MAX_ENTRIES: int = 1000
+    
+    # Bookings
+    SEAT_HOLD_TTL_MINUTES: int = 15
+    SEAT_HOLD_SWEEP_SECONDS: int = 30
     
     # Email
     SMTP_HOST: str = "smtp.gmail.com"
@@ -25,16 +65,61 @@ class Settings(BaseSettings):
     MPESA_SHORTCODE: str = ""
     MPESA_PASSKEY: str = ""
     MPESA_ENVIRONMENT: str = "sandbox"
+    MPESA_BASE_URL: str = ""  # overrides the sandbox/production URL, e.g. for scripts/stub_providers.py
+    MPESA_CALLBACK_URL: str = ""  # public URL of /api/payments/webhooks/mpesa
+    MPESA_TIMEOUT_SECONDS: float = 10
+    MPESA_TOKEN_REFRESH_MARGIN_SECONDS: float = 300
     
     FLUTTERWAVE_PUBLIC_KEY: str = ""
     FLUTTERWAVE_SECRET_KEY: str = ""
     FLUTTERWAVE_ENCRYPTION_KEY: str = ""
+    FLUTTERWAVE_BASE_URL: str = "https://api.flutterwave.com"
+    FLUTTERWAVE_REDIRECT_URL: str = ""
+    FLUTTERWAVE_TIMEOUT_SECONDS: float = 10
+    
+    # Provider HTTP connection pools (per worker, per provider)
+    PROVIDER_CONNECT_TIMEOUT_SECONDS: float = 3
+    PROVIDER_MAX_CONNECTIONS: int = 20
+    PROVIDER_KEEPALIVE_SECONDS: float = 60
+    
+    # Webhooks: callbacks are rejected until these are set. M-Pesa callbacks are unsigned, so the
+    # callback URL registered with Daraja carries ?token=MPESA_CALLBACK_TOKEN
+    MPESA_CALLBACK_TOKEN: str = ""
+    FLUTTERWAVE_WEBHOOK_SECRET: str = ""
+    WEBHOOK_BATCH_SIZE: int = 200
+    WEBHOOK_POLL_SECONDS: float = 2
+    
+    # Reconciliation (scripts/reconcile_payments.py): payments still open this long after initiation are
+    # checked with the provider; ones the provider still has no result for are failed once they expire
+    PAYMENT_RECONCILE_AFTER_MINUTES: int = 15
+    PAYMENT_EXPIRE_AFTER_MINUTES: int = 1440
+    PAYMENT_RECONCILE_BATCH_SIZE: int = 500
+    PAYMENT_RECONCILE_CONCURRENCY: int = 10
+    
+    # Long-polling GET /payments/status?wait=: the longest a request may wait for a status change (keep it
+    # below the proxy's idle timeout), and the delay before reconnecting a dropped LISTEN connection
+    PAYMENT_STATUS_MAX_WAIT_SECONDS: float = 25
+    PAYMENT_EVENTS_RECONNECT_SECONDS: float = 5
+    
+    # Idempotency-Key on booking and payment POSTs: how long a key is kept, how long a duplicate waits
+    # (polling every IDEMPOTENCY_POLL_SECONDS when the first runs in another worker) for the first request
+    # to finish, and after how long a claim whose request never finished is given up
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+    IDEMPOTENCY_WAIT_SECONDS: float = 15
+    IDEMPOTENCY_POLL_SECONDS: float = 0.2
+    IDEMPOTENCY_LOCK_SECONDS: float = 120
+    IDEMPOTENCY_SWEEP_SECONDS: int = 3600
     
     # App Settings
     ENVIRONMENT: str = "development"
     DEBUG: bool = True
     CORS_ORIGINS: str = "http://localhost:3000,http://localhost:5173"
     
+    @property
+    def replica_urls_list(self) -> List[str]:
+        """Parse DATABASE_REPLICA_URLS into a list"""
+        return [url.strip() for url in self.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+    
     @property
     def cors_origins_list(self) -> List[str]:
         """Parse CORS_ORIGINS string into a list"""
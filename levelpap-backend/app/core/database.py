@@ -1,25 +1,126 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, update
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.pool import InstrumentedPool, instrument_pool
+from app.core.query_stats import enable_strict_loading, instrument_engine
+from app.core.replicas import ReplicaRouter, RoutingSession
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+
+def _psycopg_url(url: str) -> str:
+    """Point plain postgres URLs at the psycopg (v3) driver, which serves both sync and async engines"""
+    for prefix in ("postgres://", "postgresql://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix):]
+    return url
+
+
+DATABASE_URL = _psycopg_url(settings.DATABASE_URL)
+
+
+def _create_api_engine(url: str, name: str):
+    """Async engine with an instrumented pool that sheds load when saturated (see app.core.pool)"""
+    api_engine = create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    )
+    instrument_pool(
+        api_engine, name, settings.DB_SHED_WAIT_SECONDS, settings.DB_SHED_WINDOW_SECONDS, settings.DB_MAX_OVERFLOW
+    )
+    return api_engine
+
+
+# Async engine used by the API; requests share the event loop instead of blocking it
+async_engine = _create_api_engine(DATABASE_URL, "primary")
+
+# Read replicas for read-only routes (see get_read_db)
+replica_engines = [
+    _create_api_engine(_psycopg_url(url), f"replica{i}")
+    for i, url in enumerate(settings.replica_urls_list)
+]
+replica_router = ReplicaRouter(
+    replica_engines,
+    sticky_seconds=settings.READ_YOUR_WRITES_SECONDS,
+    check_interval=settings.DATABASE_REPLICA_CHECK_SECONDS,
+    max_lag=settings.DATABASE_REPLICA_MAX_LAG_SECONDS,
+)
+
+# Request sessions are short-lived, so committed instances can keep their state
+# instead of being expired and re-selected; see save()
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False,
 )
 
+# Count and time statements per request (see app.core.query_stats)
+for _engine in [async_engine, *replica_engines]:
+    instrument_engine(_engine.sync_engine)
+if settings.DB_STRICT_LOADING:
+    enable_strict_loading()
+
+# Sync engine for scripts and migrations
+engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+
+class _ModelBase:
+    # Fetch server-generated columns (created_at, updated_at, ...) with INSERT/UPDATE ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
+
+
+Base = declarative_base(cls=_ModelBase)
 
 
-def get_db():
-    """Dependency for getting database session"""
-    db = SessionLocal()
-    try:
+async def save(db: AsyncSession, *instances):
+    """
+    Unit of work for write endpoints: add the instances and commit. Server
+    generated columns come back in the INSERT/UPDATE ... RETURNING and nothing
+    is expired on commit, so the instances can be serialized without a refresh.
+    """
+    db.add_all(instances)
+    await db.commit()
+
+
+async def update_returning(db: AsyncSession, model, pk, values: dict):
+    """
+    Apply `values` to one row with a single UPDATE ... RETURNING and return the
+    updated instance, or None when no row has that primary key. The caller commits.
+    """
+    result = await db.execute(
+        update(model)
+        .where(model.id == pk)
+        .values(**values)
+        .returning(model)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+
+async def get_db():
+    """Dependency for getting an async database session"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
+
+async def get_read_db(request: Request):
+    """Session for read-only routes: SELECTs go to a replica unless none is healthy or the client just wrote"""
+    async with AsyncSessionLocal() as db:
+        replica = replica_router.choose(request)
+        db.info["replica"] = replica
+        try:
+            yield db
+        except DBAPIError as exc:
+            if replica is not None and (exc.connection_invalidated or isinstance(exc, OperationalError)):
+                replica_router.mark_down(replica)
+            raise
@@ -1,43 +1,110 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from jose import JWTError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from dataclasses import dataclass
 from uuid import UUID
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.revocation import revocation_list
 from app.core.security import decode_access_token
 from app.core.enums import UserRole
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Per-worker cache of authenticated users, keyed by user id
+principal_cache = TTLCache(
+    "principal",
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+)
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
-    credentials_exception = HTTPException(
+# Secrets never leave the database row
+_UNCACHED_USER_COLUMNS = {"password_hash", "email_verification_token", "password_reset_token", "password_reset_expires"}
+
+
+def _snapshot_user(user: User) -> dict:
+    return {
+        column.key: getattr(user, column.key)
+        for column in User.__table__.columns
+        if column.key not in _UNCACHED_USER_COLUMNS
+    }
+
+
+def invalidate_principal(user_id: UUID):
+    """Drop a user from the principal cache after their row changes"""
+    principal_cache.invalidate(user_id)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated caller as described by the access token claims"""
+    id: UUID
+    email: str
+    role: UserRole
+    is_active: bool
+    token_version: int
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+
+async def get_current_principal(token: str = Depends(oauth2_scheme)) -> Principal:
+    """Authenticate from the token alone (no database query)"""
     payload = decode_access_token(token)
     if payload is None:
-        raise credentials_exception
-    
-    user_id_str: str = payload.get("sub")
-    if user_id_str is None:
-        raise credentials_exception
+        raise _credentials_exception()
     
     try:
-        user_id = UUID(user_id_str)
-    except ValueError:
-        raise credentials_exception
+        principal = Principal(
+            id=UUID(payload["sub"]),
+            email=payload.get("email"),
+            role=UserRole(payload["role"]),
+            is_active=bool(payload.get("active", True)),
+            token_version=int(payload.get("ver", 0)),
+        )
+    except (KeyError, ValueError, TypeError):
+        raise _credentials_exception()
+    
+    if not principal.is_active or revocation_list.is_deactivated(principal.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is inactive"
+        )
+    
+    if revocation_list.is_revoked(principal.id, principal.token_version):
+        raise _credentials_exception()
+    
+    return principal
+
+
+async def get_current_user(
+    principal: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+) -> User:
+    """Get current authenticated user"""
+    user_id = principal.id
+    snapshot = principal_cache.get(user_id)
+    if snapshot is None:
+        result = await db.execute(select(User).filter(User.id == user_id))
+        db_user = result.scalars().first()
+        if db_user is None:
+            raise _credentials_exception()
+        snapshot = _snapshot_user(db_user)
+        principal_cache.set(user_id, snapshot)
+    
+    # Detached copy, safe to use after the request session commits
+    user = User(**snapshot)
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise credentials_exception
+    if principal.token_version < user.token_version:
+        raise _credentials_exception()
     
     if not user.is_active:
         raise HTTPException(
@@ -61,14 +128,14 @@ async def get_current_active_user(
 
 
 def require_role(allowed_roles: list[UserRole]):
-    """Dependency factory for role-based access control"""
-    async def role_checker(current_user: User = Depends(get_current_active_user)) -> User:
-        if current_user.role not in allowed_roles:
+    """Dependency factory for role-based access control (authorizes from token claims)"""
+    async def role_checker(principal: Principal = Depends(get_current_principal)) -> Principal:
+        if principal.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Insufficient permissions"
             )
-        return current_user
+        return principal
     return role_checker
 
 
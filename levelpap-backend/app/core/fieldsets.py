@@ -0,0 +1,65 @@
+"""
+Sparse fieldsets (`?fields=id,title`)
+
+Requested fields are checked against the response schema, pushed down into
+SQL with load_only (or, on list endpoints, by selecting just those columns
+with app.core.rows.select_rows), and the response is validated and serialized
+with a schema narrowed to the same fields, so unrequested columns are never
+fetched, hydrated or encoded.
+"""
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple, Type
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+from sqlalchemy.sql import Select
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return (default: all)"
+
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """Validate a `fields` parameter; returns the fields in schema order, or None for all"""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}"
+        )
+    return tuple(name for name in schema.model_fields if name in requested) or None
+
+
+def select_fields(query: Select, model, fields: Optional[Sequence[str]], extra: Sequence[str] = ()) -> Select:
+    """
+    Load only the columns behind `fields` plus `extra` (columns the endpoint
+    itself reads, e.g. sort keys); the query is unchanged when fields is None.
+    Fields computed from other columns are resolved through the model's
+    `field_dependencies` mapping. The primary key is always loaded.
+    """
+    if fields is None:
+        return query
+    dependencies = getattr(model, "field_dependencies", {})
+    names = set(extra)
+    for field in fields:
+        names.update(dependencies.get(field, (field,)))
+    columns = [getattr(model, attr.key) for attr in inspect(model).column_attrs if attr.key in names]
+    return query.options(load_only(*columns)) if columns else query
+
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema: Type[BaseModel], fields: Optional[Tuple[str, ...]]) -> Type[BaseModel]:
+    """Response schema restricted to `fields` (the schema itself when None)"""
+    if fields is None:
+        return schema
+    definitions = {
+        name: (schema.model_fields[name].annotation, schema.model_fields[name])
+        for name in fields
+    }
+    return create_model(
+        f"{schema.__name__}Fields",
+        __config__=ConfigDict(from_attributes=True),
+        **definitions,
+    )
@@ -0,0 +1,259 @@
+"""
+Idempotency-Key support for retried POSTs
+
+Mobile clients on flaky networks retry requests whose response never reached
+them. The routes in IDEMPOTENT_ROUTES accept an `Idempotency-Key` header,
+scoped to the authenticated user. The first request with a key claims it
+with one INSERT ... ON CONFLICT, runs, and stores its status, headers (as a
+list, so repeated ones such as Set-Cookie survive) and body against the key.
+A retry of the same request then costs a single key lookup and gets the
+stored response back with `Idempotent-Replayed: true`. A key reused for a
+different request (method, path or body) gets a 422.
+
+A duplicate that arrives while the first request is still running waits for
+it instead of running again: on an in-process event when the first runs in
+the same worker, otherwise by re-reading the key every
+IDEMPOTENCY_POLL_SECONDS. After IDEMPOTENCY_WAIT_SECONDS it gets a 409. Server
+errors (5xx) and exceptions release the key so a retry runs again, and a
+claim left by a worker that died is taken over after IDEMPOTENCY_LOCK_SECONDS.
+Keys expire after IDEMPOTENCY_KEY_TTL_HOURS and are purged in the background.
+
+The key's statements are counted in the request's X-DB-Queries but not
+against the route's query budget.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.dependencies import get_current_principal, oauth2_scheme
+from app.core.metrics import metrics
+from app.core.query_stats import exempt_from_budget
+from app.models.idempotency_key import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+IDEMPOTENT_ROUTES = {
+    "POST /api/bookings",
+    "POST /api/payments/mpesa/initiate",
+    "POST /api/payments/flutterwave/initiate",
+}
+
+keys_claimed = metrics.counter("idempotency_keys_claimed_total", "Requests that claimed a new Idempotency-Key")
+keys_replayed = metrics.counter("idempotency_keys_replayed_total", "Retries answered from a stored response")
+keys_waited = metrics.counter("idempotency_keys_waited_total", "Duplicates that waited for the request in flight")
+keys_conflicted = metrics.counter("idempotency_keys_conflict_total", "Duplicates answered 409 or 422")
+
+
+def _error(status_code: int, detail: str) -> JSONResponse:
+    return JSONResponse(status_code=status_code, content={"detail": detail})
+
+
+def _response(status_code: int, body: bytes, headers: List[Tuple[bytes, bytes]]) -> Response:
+    """A response with exactly these headers, repeated ones (Set-Cookie) included"""
+    response = Response(content=body, status_code=status_code)
+    response.raw_headers = headers
+    return response
+
+
+class IdempotencyStore:
+    def __init__(self, ttl: timedelta, wait: float, poll_interval: float, lock: timedelta, sweep_interval: float):
+        self.ttl = ttl
+        self.wait = wait
+        self.poll_interval = poll_interval
+        self.lock = lock
+        self.sweep_interval = sweep_interval
+        # Requests this worker is running, so local duplicates wait without polling
+        self._running: Dict[Tuple[UUID, str], asyncio.Event] = {}
+
+    async def _lookup(self, user_id: UUID, key: str):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(
+                    IdempotencyKey.fingerprint,
+                    IdempotencyKey.status_code,
+                    IdempotencyKey.response_headers,
+                    IdempotencyKey.response_body,
+                    IdempotencyKey.created_at,
+                    IdempotencyKey.expires_at,
+                ).filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            )
+            return result.first()
+
+    def _abandoned(self, record) -> bool:
+        """Expired, or claimed by a request that never finished"""
+        now = datetime.now(timezone.utc)
+        return record.expires_at <= now or (record.status_code is None and record.created_at <= now - self.lock)
+
+    async def _claim(self, user_id: UUID, key: str, fingerprint: str) -> bool:
+        """Claim a new key, or take over an abandoned one; False when another request holds it"""
+        now = datetime.now(timezone.utc)
+        statement = insert(IdempotencyKey).values(
+            user_id=user_id, key=key, fingerprint=fingerprint, expires_at=now + self.ttl,
+        )
+        statement = statement.on_conflict_do_update(
+            constraint="uq_idempotency_keys_user_key",
+            set_={
+                "fingerprint": statement.excluded.fingerprint,
+                "status_code": None,
+                "response_headers": None,
+                "response_body": None,
+                "created_at": func.now(),
+                "expires_at": statement.excluded.expires_at,
+            },
+            where=or_(
+                IdempotencyKey.expires_at <= now,
+                and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.created_at <= now - self.lock),
+            ),
+        ).returning(IdempotencyKey.id)
+        async with AsyncSessionLocal() as db:
+            claimed = (await db.execute(statement)).first() is not None
+            await db.commit()
+        return claimed
+
+    async def _finish(self, user_id: UUID, key: str, fingerprint: str, response: Optional[Response], body: bytes):
+        """Store the response against the key, or release the key when there is none worth replaying"""
+        mine = and_(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.fingerprint == fingerprint,
+            IdempotencyKey.status_code.is_(None),
+        )
+        async with AsyncSessionLocal() as db:
+            if response is None or response.status_code >= 500:
+                await db.execute(delete(IdempotencyKey).where(mine))
+            else:
+                headers = [[name.decode("latin-1"), value.decode("latin-1")] for name, value in response.raw_headers]
+                await db.execute(
+                    update(IdempotencyKey)
+                    .where(mine)
+                    .values(
+                        status_code=response.status_code,
+                        response_headers=headers,
+                        response_body=body,
+                    )
+                )
+            await db.commit()
+
+    async def _execute(self, request: Request, call_next, user_id: UUID, key: str, fingerprint: str) -> Response:
+        keys_claimed.inc()
+        done = self._running[(user_id, key)] = asyncio.Event()
+        response, body = None, b""
+        try:
+            response = await call_next(request)
+            body = b"".join([chunk async for chunk in response.body_iterator])
+        finally:
+            try:
+                with exempt_from_budget():
+                    await self._finish(user_id, key, fingerprint, response, body)
+            finally:
+                del self._running[(user_id, key)]
+                done.set()
+        return _response(response.status_code, body, list(response.raw_headers))
+
+    async def _wait_for(self, user_id: UUID, key: str):
+        """Wait for the request holding a key to finish; returns its record, or None once released"""
+        keys_waited.inc()
+        deadline = time.monotonic() + self.wait
+        done = self._running.get((user_id, key))
+        if done is not None:
+            try:
+                await asyncio.wait_for(done.wait(), self.wait)
+            except asyncio.TimeoutError:
+                pass
+            return await self._lookup(user_id, key)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            record = await self._lookup(user_id, key)
+            if record is None or record.status_code is not None or time.monotonic() >= deadline:
+                return record
+
+    async def _replay_or_claim(self, user_id: UUID, key: str, fingerprint: str) -> Optional[Response]:
+        """The response for a key already used, or None once this request has claimed the key"""
+        # A lost claim race, or a key released by a failed first request, sends the request round again
+        for _ in range(3):
+            record = await self._lookup(user_id, key)
+            if record is None or self._abandoned(record):
+                if await self._claim(user_id, key, fingerprint):
+                    return None
+                continue
+            if record.fingerprint != fingerprint:
+                keys_conflicted.inc()
+                return _error(
+                    status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    f"{HEADER} was already used for a different request"
+                )
+            if record.status_code is None:
+                record = await self._wait_for(user_id, key)
+                if record is None:
+                    continue
+                if record.status_code is None:
+                    break
+            keys_replayed.inc()
+            headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record.response_headers or []]
+            headers.append((b"idempotent-replayed", b"true"))
+            return _response(record.status_code, record.response_body or b"", headers)
+        keys_conflicted.inc()
+        return _error(status.HTTP_409_CONFLICT, f"A request with this {HEADER} is still in progress")
+
+    async def handle(self, request: Request, call_next, user_id: UUID, key: str) -> Response:
+        body = await request.body()
+        fingerprint = hashlib.sha256(b"\n".join([request.method.encode(), request.url.path.encode(), body])).hexdigest()
+        with exempt_from_budget():
+            response = await self._replay_or_claim(user_id, key, fingerprint)
+        if response is not None:
+            return response
+        return await self._execute(request, call_next, user_id, key, fingerprint)
+
+    async def purge(self) -> int:
+        """Delete expired keys"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= func.now()))
+            await db.commit()
+        return result.rowcount
+
+    async def run(self):
+        """Background loop: purge expired keys every sweep_interval"""
+        while True:
+            try:
+                purged = await self.purge()
+                if purged:
+                    logger.info("Purged %s expired idempotency keys", purged)
+            except Exception:
+                logger.exception("Failed to purge idempotency keys")
+            await asyncio.sleep(self.sweep_interval)
+
+
+idempotency_store = IdempotencyStore(
+    ttl=timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+    wait=settings.IDEMPOTENCY_WAIT_SECONDS,
+    poll_interval=settings.IDEMPOTENCY_POLL_SECONDS,
+    lock=timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+    sweep_interval=settings.IDEMPOTENCY_SWEEP_SECONDS,
+)
+
+
+async def idempotent_requests(request: Request, call_next):
+    """HTTP middleware: apply Idempotency-Key to the routes in IDEMPOTENT_ROUTES"""
+    key = request.headers.get(HEADER)
+    if key is None or f"{request.method} {request.url.path}" not in IDEMPOTENT_ROUTES:
+        return await call_next(request)
+    try:
+        principal = await get_current_principal(await oauth2_scheme(request))
+    except HTTPException:
+        # Let the route reject the request as it normally would
+        return await call_next(request)
+    if not 0 < len(key) <= MAX_KEY_LENGTH:
+        return _error(status.HTTP_400_BAD_REQUEST, f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters")
+    return await idempotency_store.handle(request, call_next, principal.id, key)
@@ -0,0 +1,118 @@
+"""
+Lightweight in-process metrics (per worker)
+
+Counters, gauges and histograms are registered on the module-level `metrics`
+registry and exposed as JSON by the /metrics endpoint.
+"""
+import bisect
+import threading
+from typing import Dict, Optional, Sequence
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    def __init__(self, description: str = ""):
+        self.description = description
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> dict:
+        return {"type": "counter", "value": self.value}
+
+
+class Gauge:
+    def __init__(self, description: str = ""):
+        self.description = description
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def snapshot(self) -> dict:
+        return {"type": "gauge", "value": self.value}
+
+
+class Histogram:
+    def __init__(self, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate quantile (upper bound of the bucket holding it)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> dict:
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {
+            "type": "histogram",
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": buckets,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, name: str, factory):
+        if name not in self._metrics:
+            self._metrics[name] = factory()
+        return self._metrics[name]
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._register(name, lambda: Counter(description))
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        return self._register(name, lambda: Gauge(description))
+
+    def histogram(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(name, lambda: Histogram(description, buckets))
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in sorted(self._metrics.items())}
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,90 @@
+"""
+Keyset (cursor) pagination helpers
+
+A cursor is the sort-key values of the last row on a page, JSON encoded and
+base64url wrapped so clients treat it as opaque. Pages after the first are
+fetched with a row comparison on an indexed sort key, so they cost the same no
+matter how deep the client pages.
+"""
+import base64
+import json
+from datetime import date, datetime, time
+from typing import Any, List, Optional, Sequence, Tuple
+from uuid import UUID
+from fastapi import HTTPException, Request, status
+from sqlalchemy import tuple_
+from sqlalchemy.sql import Select
+
+_PARSERS = {
+    datetime: datetime.fromisoformat,
+    date: date.fromisoformat,
+    time: time.fromisoformat,
+    UUID: UUID,
+}
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([v.isoformat() if hasattr(v, "isoformat") else str(v) for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_keys: Sequence) -> Tuple[Any, ...]:
+    """Parse a cursor back into typed sort-key values"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if len(values) != len(sort_keys):
+            raise ValueError("cursor does not match sort keys")
+        return tuple(
+            _PARSERS.get(column.type.python_type, lambda v: v)(value)
+            for column, value in zip(sort_keys, values)
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def paginate_query(
+    query: Select,
+    sort_keys: Sequence,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    descending: bool = False,
+) -> Select:
+    """
+    Order by the sort keys and fetch one row past the page (to detect a next
+    page). With a cursor the page starts after it; otherwise `skip` is used as
+    a plain offset for backward compatibility.
+    """
+    if descending:
+        query = query.order_by(*(column.desc() for column in sort_keys))
+    else:
+        query = query.order_by(*sort_keys)
+
+    if cursor:
+        values = decode_cursor(cursor, sort_keys)
+        keys = tuple_(*sort_keys)
+        query = query.filter(keys < tuple_(*values) if descending else keys > tuple_(*values))
+    elif skip:
+        query = query.offset(skip)
+
+    return query.limit(limit + 1)
+
+
+def page_with_links(request: Request, rows: Sequence, sort_keys: Sequence, limit: int) -> Tuple[List, dict]:
+    """Trim the extra row and build next-page headers (X-Next-Cursor and a Link rel=next)"""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, {}
+
+    rows = rows[:limit]
+    last = rows[-1]
+    cursor = encode_cursor([getattr(last, column.key) for column in sort_keys])
+    next_url = request.url.remove_query_params("skip").include_query_params(cursor=cursor)
+    return rows, {
+        "X-Next-Cursor": cursor,
+        "Link": f'<{next_url}>; rel="next"',
+    }
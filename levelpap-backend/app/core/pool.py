@@ -0,0 +1,101 @@
+"""
+Connection pool telemetry and admission control
+
+Each engine's pool reports checkout wait times plus in-use / overflow gauges to
+/metrics. When a pool is exhausted and checkouts have recently been waiting
+longer than DB_SHED_WAIT_SECONDS, new checkouts fail immediately with
+PoolSaturatedError (answered with 503 + Retry-After) instead of queueing behind
+the backlog; waits that do queue are capped at DB_POOL_TIMEOUT_SECONDS.
+"""
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.metrics import metrics
+
+_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolSaturatedError(Exception):
+    """No connection is free and recent checkouts have been queueing too long"""
+
+
+class PoolTelemetry:
+    def __init__(self, name: str, shed_wait: float, shed_window: float, max_overflow: int):
+        self.shed_wait = shed_wait
+        self.shed_window = shed_window
+        # The pool's max_overflow as configured (SQLAlchemy keeps it private)
+        self.max_overflow = max_overflow
+        self.last_slow_checkout = float("-inf")
+        # Start times of checkouts currently queued for a connection
+        self.waiting = []
+        self.checkout_wait = metrics.histogram(
+            f"db_pool_{name}_checkout_wait_seconds", "Time spent waiting for a pooled connection", buckets=_WAIT_BUCKETS
+        )
+        self.checked_out = metrics.gauge(f"db_pool_{name}_in_use", "Connections checked out")
+        self.overflow = metrics.gauge(f"db_pool_{name}_overflow", "Connections open beyond pool_size")
+        self.shed = metrics.counter(f"db_pool_{name}_shed_total", "Checkouts rejected while saturated")
+        self.timeouts = metrics.counter(f"db_pool_{name}_timeouts_total", "Checkouts that hit the pool timeout")
+
+    def observe_wait(self, seconds: float):
+        self.checkout_wait.observe(seconds)
+        if seconds >= self.shed_wait:
+            self.last_slow_checkout = time.monotonic()
+
+    def headroom(self, pool: "InstrumentedPool") -> int:
+        """Connections that can still be checked out without waiting for one to be returned"""
+        return pool.size() + self.max_overflow - pool.checkedout()
+
+    def should_shed(self, pool: "InstrumentedPool") -> bool:
+        """Exhausted pool, and the oldest queued checkout (or a recent one) has waited past the threshold"""
+        if self.headroom(pool) > 0:
+            return False
+        now = time.monotonic()
+        if self.waiting and now - self.waiting[0] >= self.shed_wait:
+            return True
+        return now - self.last_slow_checkout < self.shed_window
+
+    def update(self, pool: "InstrumentedPool"):
+        self.checked_out.set(pool.checkedout())
+        self.overflow.set(max(pool.overflow(), 0))
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that times checkouts and sheds them while saturated"""
+
+    telemetry: PoolTelemetry = None
+
+    def _do_get(self):
+        telemetry = self.telemetry
+        if telemetry is None:
+            return super()._do_get()
+        if telemetry.should_shed(self):
+            telemetry.shed.inc()
+            raise PoolSaturatedError()
+        start = time.monotonic()
+        telemetry.waiting.append(start)
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            telemetry.timeouts.inc()
+            raise
+        finally:
+            telemetry.waiting.remove(start)
+            telemetry.observe_wait(time.monotonic() - start)
+        telemetry.update(self)
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        if self.telemetry is not None:
+            self.telemetry.update(self)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.telemetry = self.telemetry
+        return pool
+
+
+def instrument_pool(engine: AsyncEngine, name: str, shed_wait: float, shed_window: float, max_overflow: int):
+    """Attach telemetry to an engine created with poolclass=InstrumentedPool and this max_overflow"""
+    engine.sync_engine.pool.telemetry = PoolTelemetry(name, shed_wait, shed_window, max_overflow)
@@ -0,0 +1,136 @@
+"""
+Per-request database query accounting
+
+Cursor-level engine events count and time every statement against the
+QueryStats of the current request (a ContextVar set by the middleware in
+app.main). The same statement repeated many times in one request is logged as
+a likely N+1. Routes declare a query budget with `Depends(query_budget(n))`;
+in strict mode (DB_STRICT_LOADING) ORM selects also get raiseload("*"), so a
+lazy relationship load raises instead of querying, and a request that goes over
+its budget fails with a 500 so CI catches it.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, raiseload
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_queries_per_request = metrics.histogram(
+    "db_queries_per_request", "Statements issued per request",
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+_db_seconds_per_request = metrics.histogram("db_seconds_per_request", "Database time per request")
+_budget_exceeded = metrics.counter("db_query_budget_exceeded_total", "Requests over their query budget")
+_repeated_queries = metrics.counter("db_repeated_query_requests_total", "Requests repeating one statement (likely N+1)")
+
+
+class QueryStats:
+    def __init__(self, budget: int):
+        self.count = 0
+        self.writes = 0
+        self.duration = 0.0
+        self.budget = budget
+        # Statements issued around the route (see exempt_from_budget), not counted against its budget
+        self.exempt = 0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, duration: float, write: bool = False):
+        self.count += 1
+        self.writes += write
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        return [(stmt, n) for stmt, n in self.statements.most_common() if n >= threshold]
+
+    @property
+    def over_budget(self) -> bool:
+        return self.count - self.exempt > self.budget
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Attribute statements issued inside the block (and tasks it starts) to one QueryStats"""
+    stats = QueryStats(settings.DB_DEFAULT_QUERY_BUDGET)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def exempt_from_budget() -> Iterator[None]:
+    """Count statements issued inside the block in the request's total but not against its route's budget"""
+    stats = _current.get()
+    before = stats.count if stats is not None else 0
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.exempt += stats.count - before
+
+
+def query_budget(limit: int):
+    """Route dependency declaring the most statements the route may issue"""
+    def set_budget():
+        stats = _current.get()
+        if stats is not None:
+            stats.budget = limit
+    return set_budget
+
+
+def report(stats: QueryStats, route: str) -> bool:
+    """Log and record a finished request's stats; returns False when strict mode should fail it"""
+    _queries_per_request.observe(stats.count)
+    _db_seconds_per_request.observe(stats.duration)
+    logger.debug("%s: %s queries in %.1f ms", route, stats.count, stats.duration * 1000)
+
+    repeated = stats.repeated(settings.DB_REPEATED_QUERY_THRESHOLD)
+    if repeated:
+        _repeated_queries.inc()
+        statement, times = repeated[0]
+        logger.warning("%s: possible N+1, statement ran %s times: %s", route, times, statement[:200])
+
+    if stats.over_budget:
+        _budget_exceeded.inc()
+        logger.warning("%s: %s queries exceeds budget of %s", route, stats.count, stats.budget)
+        return not settings.DB_STRICT_LOADING
+    return True
+
+
+def instrument_engine(engine: Engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_start_time"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop("query_start_time", None)
+        stats = _current.get()
+        if stats is not None and started is not None:
+            write = context is not None and (context.isinsert or context.isupdate or context.isdelete)
+            stats.record(statement, time.perf_counter() - started, write)
+
+
+def enable_strict_loading():
+    """Make every lazy relationship load raise (explicit eager-load options still apply)"""
+    @event.listens_for(Session, "do_orm_execute")
+    def _raiseload(execute_state):
+        if execute_state.is_select and not execute_state.is_column_load and not execute_state.is_relationship_load:
+            execute_state.statement = execute_state.statement.options(raiseload("*"))
@@ -0,0 +1,147 @@
+"""
+Read-replica routing
+
+Read-only routes take their session from `get_read_db`, which pins it to one
+healthy replica (round-robin). RoutingSession then sends that session's
+SELECTs to the replica and anything else (flushes, UPDATE ... RETURNING) to the
+primary. Replicas are health-checked in the background and taken out of
+rotation when unreachable or lagging more than DATABASE_REPLICA_MAX_LAG_SECONDS.
+
+A client that has just written reads from the primary for
+READ_YOUR_WRITES_SECONDS so its own changes are visible: the worker that served
+the write remembers the user, and a short-lived cookie carries the same hint to
+the other workers.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional
+from fastapi import Request, Response
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+from app.core.metrics import metrics
+from app.core.security import decode_access_token
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = "primary_reads_until"
+
+_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class RoutingSession(Session):
+    """Session whose SELECTs go to the replica in `info["replica"]`, when one is set"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None and not self._flushing and isinstance(clause, Select):
+            return replica.sync_engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+class Replica:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        # Out of rotation until the first health check passes
+        self.healthy = False
+        self.lag = 0.0
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+
+class ReplicaRouter:
+    def __init__(self, engines: List[AsyncEngine], sticky_seconds: float, check_interval: float, max_lag: float):
+        self.replicas = [Replica(engine) for engine in engines]
+        self.sticky_seconds = sticky_seconds
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self._turn = itertools.count()
+        # user id -> monotonic time until which their reads go to the primary
+        self._sticky: Dict[str, float] = {}
+        self.replica_reads = metrics.counter("db_replica_reads_total", "Read-only sessions served by a replica")
+        self.primary_reads = metrics.counter("db_primary_reads_total", "Read-only sessions served by the primary")
+        self.healthy_replicas = metrics.gauge("db_replicas_healthy", "Replicas currently in rotation")
+
+    def choose(self, request: Request) -> Optional[AsyncEngine]:
+        """Replica engine for a read-only request, or None to read from the primary"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy or self._is_sticky(request):
+            if self.replicas:
+                self.primary_reads.inc()
+            return None
+        self.replica_reads.inc()
+        return healthy[next(self._turn) % len(healthy)].engine
+
+    def mark_down(self, engine: AsyncEngine):
+        for replica in self.replicas:
+            if replica.engine is engine and replica.healthy:
+                replica.healthy = False
+                logger.warning("Replica %s taken out of rotation", replica.name)
+        self.healthy_replicas.set(sum(replica.healthy for replica in self.replicas))
+
+    def record_write(self, request: Request, response: Response):
+        """Send this client's reads to the primary for the read-your-writes window"""
+        if not self.replicas:
+            return
+        user = _request_user(request)
+        if user is not None:
+            now = time.monotonic()
+            self._sticky = {key: until for key, until in self._sticky.items() if until > now}
+            self._sticky[user] = now + self.sticky_seconds
+        response.set_cookie(
+            STICKY_COOKIE,
+            str(int(time.time() + self.sticky_seconds)),
+            max_age=int(self.sticky_seconds) + 1,
+            httponly=True,
+            samesite="lax",
+        )
+
+    def _is_sticky(self, request: Request) -> bool:
+        cookie = request.cookies.get(STICKY_COOKIE)
+        if cookie and cookie.isdigit() and time.time() < min(int(cookie), time.time() + self.sticky_seconds):
+            return True
+        if not self._sticky:
+            return False
+        user = _request_user(request)
+        return user is not None and self._sticky.get(user, 0) > time.monotonic()
+
+    async def check(self):
+        """Ping every replica and update its health and replication lag"""
+        for replica in self.replicas:
+            try:
+                async with replica.engine.connect() as conn:
+                    replica.lag = float((await conn.execute(_LAG_QUERY)).scalar() or 0)
+                healthy = replica.lag <= self.max_lag
+            except Exception as exc:
+                logger.warning("Replica %s health check failed: %s", replica.name, exc)
+                healthy = False
+            if healthy != replica.healthy:
+                logger.info("Replica %s is %s (lag %.1fs)", replica.name, "healthy" if healthy else "unhealthy", replica.lag)
+            replica.healthy = healthy
+        self.healthy_replicas.set(sum(replica.healthy for replica in self.replicas))
+
+    async def run(self):
+        """Background health-check loop (returns at once when no replicas are configured)"""
+        while self.replicas:
+            try:
+                await self.check()
+            except Exception:
+                logger.exception("Failed to check replicas")
+            await asyncio.sleep(self.check_interval)
+
+
+def _request_user(request: Request) -> Optional[str]:
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = decode_access_token(token)
+    return payload.get("sub") if payload else None
@@ -0,0 +1,100 @@
+"""
+In-memory token revocation list (per worker)
+
+Tokens carry the user's token_version and active flag. A token is revoked when
+the user has since been deactivated or their token_version has moved past the
+one in the token. Only users changed within the token lifetime can hold a live
+revoked token, so that is all this list keeps; it is refreshed from the
+database on an interval and updated immediately by the worker that made the
+change.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Tuple
+from uuid import UUID
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationList:
+    def __init__(self, refresh_interval: float, token_lifetime: timedelta):
+        self.refresh_interval = refresh_interval
+        self.token_lifetime = token_lifetime
+        # user_id -> (token_version, is_active, recorded at)
+        self._entries: Dict[UUID, Tuple[int, bool, float]] = {}
+        self.last_refresh = 0.0
+
+    def is_revoked(self, user_id: UUID, token_version: int) -> bool:
+        entry = self._entries.get(user_id)
+        return entry is not None and token_version < entry[0]
+
+    def is_deactivated(self, user_id: UUID) -> bool:
+        entry = self._entries.get(user_id)
+        return entry is not None and not entry[1]
+
+    def record(self, user_id: UUID, token_version: int, is_active: bool):
+        current = self._entries.get(user_id)
+        if current is None or token_version >= current[0]:
+            self._entries[user_id] = (token_version, is_active, time.monotonic())
+
+    async def refresh(self):
+        """Reload users changed within the token lifetime and drop stale entries"""
+        since = datetime.now(timezone.utc) - self.token_lifetime
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(User.id, User.token_version, User.is_active).filter(User.updated_at >= since)
+            )
+            rows = result.all()
+
+        for user_id, token_version, is_active in rows:
+            self.record(user_id, token_version, is_active)
+
+        cutoff = time.monotonic() - self.token_lifetime.total_seconds()
+        self._entries = {
+            user_id: entry for user_id, entry in self._entries.items() if entry[2] >= cutoff
+        }
+        self.last_refresh = time.monotonic()
+
+    async def run(self):
+        """Background refresh loop"""
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh token revocation list")
+            await asyncio.sleep(self.refresh_interval)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+revocation_list = RevocationList(
+    refresh_interval=settings.TOKEN_REVOCATION_REFRESH_SECONDS,
+    token_lifetime=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+)
+
+
+async def revoke_user_tokens(db: AsyncSession, user_id: UUID, **values) -> int:
+    """
+    Bump a user's token_version (plus any other column values) and record the
+    revocation locally. Commits the session.
+    """
+    result = await db.execute(
+        update(User)
+        .filter(User.id == user_id)
+        .values(token_version=User.token_version + 1, **values)
+        .returning(User.token_version, User.is_active)
+    )
+    row = result.first()
+    await db.commit()
+    if row is None:
+        return 0
+    revocation_list.record(user_id, row.token_version, row.is_active)
+    return row.token_version
@@ -1,20 +1,129 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from fastapi import HTTPException, status
 from app.core.config import settings
+from app.core.metrics import metrics
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# jose (with the cryptography backend) and passlib are imported on first use so
+# scripts and migrations that only need settings or models don't pay for them;
+# the server loads them up front in app.core.startup.prepare()
+@lru_cache(maxsize=None)
+def pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
+
+
+def _timed_call(func, *args):
+    """Run func in a pool worker, returning (result, start wall time, duration)"""
+    started = time.time()
+    result = func(*args)
+    return result, started, time.time() - started
+
+
+hash_queue_wait = metrics.histogram("password_hash_queue_wait_seconds", "Time hashing jobs wait for a pool worker")
+hash_duration = metrics.histogram("password_hash_seconds", "Time spent in bcrypt per job")
+hash_in_flight = metrics.gauge("password_hash_in_flight", "Hashing jobs queued or running")
+hash_rejected = metrics.counter("password_hash_rejected_total", "Hashing jobs rejected because the queue was full")
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a bounded process pool so hashing never blocks the event loop.
+
+    At most `workers` jobs run at once and `max_queue` more may wait; anything
+    beyond that is rejected immediately with 503 instead of queueing.
+    """
+
+    def __init__(self, workers: int, max_queue: int, retry_after: int = 1):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self._pending >= self.workers + self.max_queue:
+            hash_rejected.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, please retry",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        self._pending += 1
+        hash_in_flight.inc()
+        submitted = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            try:
+                result, started, duration = await loop.run_in_executor(
+                    self._get_executor(), _timed_call, func, *args
+                )
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool and retry once
+                self._executor = None
+                result, started, duration = await loop.run_in_executor(
+                    self._get_executor(), _timed_call, func, *args
+                )
+        finally:
+            self._pending -= 1
+            hash_in_flight.dec()
+
+        hash_queue_wait.observe(max(started - submitted, 0.0))
+        hash_duration.observe(duration)
+        return result
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password against its hash without blocking the event loop"""
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password without blocking the event loop"""
+        return await self._run(get_password_hash, password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER_SECONDS,
+)
+
+
+def token_claims(user) -> dict:
+    """Claims that let requests authorize without loading the user row"""
+    return {
+        "sub": str(user.id),
+        "email": user.email,
+        "role": user.role.value,
+        "active": user.is_active,
+        "ver": user.token_version,
+    }
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -26,12 +135,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
 def decode_access_token(token: str) -> Optional[dict]:
     """Decode and verify a JWT token"""
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         return payload
@@ -0,0 +1,30 @@
+"""
+JSON rendering straight from ORM objects to bytes
+
+FastAPI's response_model path validates the returned objects, dumps them to
+Python dicts and then encodes those with the stdlib json module. Routes that
+return `respond(schema, data)` (or a Response around render_json) skip all of
+that: the data is validated once from the ORM attributes and encoded in
+pydantic-core. Keep `response_model` on such routes for the OpenAPI docs;
+FastAPI passes returned Response objects through untouched.
+"""
+from functools import lru_cache
+from typing import Any, Optional
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def get_adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def render_json(schema: Any, data: Any) -> bytes:
+    """Validate data (ORM objects or dicts) against a schema and encode it as JSON"""
+    adapter = get_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+
+def respond(schema: Any, data: Any, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """JSON response for data rendered against schema in a single validate-and-encode pass"""
+    return Response(render_json(schema, data), status_code=status_code, headers=headers, media_type="application/json")
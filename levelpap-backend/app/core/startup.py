@@ -0,0 +1,47 @@
+"""
+Boot-time preparation
+
+Work that would otherwise land on the first requests a process serves: mapper
+configuration, JSON validators for the hot response schemas and the lazily
+imported auth libraries. Run once when app.main is imported; under
+`gunicorn --preload` that happens in the master, so every forked worker starts
+with it done. Nothing here opens a database connection,
+since connections must not be shared across the fork.
+"""
+import logging
+import time
+from typing import List
+from fastapi import FastAPI
+from sqlalchemy.orm import configure_mappers
+from app import models  # noqa: F401 - every mapper must be registered before configuring
+from app.core.serialization import get_adapter
+from app.schemas import (
+    BookingResponse, CorporateRequestResponse, CourseDetailResponse, CourseResponse, CourseSearchResult,
+    PaymentResponse, SessionResponse, TrainerResponse, UserResponse,
+)
+
+logger = logging.getLogger(__name__)
+
+# Schemas rendered through render_json / respond() by the read endpoints
+PREBUILT_SCHEMAS = (
+    CourseResponse, List[CourseResponse], List[CourseSearchResult], CourseDetailResponse,
+    TrainerResponse, List[TrainerResponse],
+    SessionResponse, List[SessionResponse],
+    BookingResponse, List[BookingResponse],
+    UserResponse, List[UserResponse],
+    CorporateRequestResponse, List[CorporateRequestResponse],
+    PaymentResponse,
+)
+
+
+def prepare(app: FastAPI):
+    """Do the one-off per-process setup now rather than on the first requests"""
+    started = time.perf_counter()
+    configure_mappers()
+    for schema in PREBUILT_SCHEMAS:
+        get_adapter(schema)
+
+    from jose import jwt  # noqa: F401
+    from app.core.security import pwd_context
+    pwd_context().handler("bcrypt").get_backend()
+    logger.info("Prepared app in %.0f ms", (time.perf_counter() - started) * 1000)
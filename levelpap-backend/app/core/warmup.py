@@ -0,0 +1,117 @@
+"""
+Per-worker warm-up and readiness
+
+Before a worker takes traffic it opens WARMUP_CONNECTIONS pooled connections
+(primary and replicas), runs one password hash so the bcrypt process pool is
+started, fetches the M-Pesa OAuth token (which also opens a kept-alive provider
+connection), and requests the hot catalog reads in-process, which primes the
+catalog cache and SQLAlchemy's compiled statement cache. `/ready` reports
+whether that has happened plus live database latency and pool headroom, so the
+load balancer only routes to a worker that can serve at steady-state latency.
+"""
+import asyncio
+import logging
+import time
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.core.cache import catalog_cache
+from app.core.config import settings
+from app.core.database import async_engine, replica_engines
+from app.core.security import password_hasher
+from app.services.payments import ProviderError, mpesa_client
+
+logger = logging.getLogger(__name__)
+
+# Anonymous reads every visitor hits first
+WARMUP_PATHS = ("/api/courses", "/api/trainers", "/api/sessions")
+
+
+async def open_connections(engine: AsyncEngine, count: int):
+    """Check out `count` connections at once so the pool keeps them open"""
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(ping() for _ in range(count)))
+
+
+class Warmup:
+    def __init__(self, connections: int, retry_interval: float = 5):
+        self.connections = connections
+        self.retry_interval = retry_interval
+        self.warmed = False
+        self.duration = None
+
+    async def warm(self, app: FastAPI):
+        started = time.perf_counter()
+        await open_connections(async_engine, self.connections)
+        for engine in replica_engines:
+            try:
+                await open_connections(engine, self.connections)
+            except Exception as exc:
+                # Replicas are optional; the health checker keeps unreachable ones out of rotation
+                logger.warning("Could not warm replica %s: %s", engine.url.render_as_string(hide_password=True), exc)
+
+        await password_hasher.hash("warm-up")
+
+        if mpesa_client.configured:
+            try:
+                # Fetch the OAuth token and open a kept-alive connection before the first checkout
+                await mpesa_client.access_token()
+            except ProviderError as exc:
+                logger.warning("Could not warm M-Pesa client: %s", exc)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://warmup") as client:
+            for path in WARMUP_PATHS:
+                response = await client.get(path)
+                if response.status_code != 200:
+                    raise RuntimeError(f"GET {path} returned {response.status_code}")
+
+        self.duration = time.perf_counter() - started
+        self.warmed = True
+        logger.info("Worker warmed up in %.0f ms", self.duration * 1000)
+
+    async def run(self, app: FastAPI):
+        """Warm up, retrying until it succeeds (e.g. the database was still starting)"""
+        while not self.warmed:
+            try:
+                await self.warm(app)
+            except Exception:
+                logger.exception("Warm-up failed, retrying in %ss", self.retry_interval)
+                await asyncio.sleep(self.retry_interval)
+
+
+warmup = Warmup(connections=min(settings.WARMUP_CONNECTIONS, settings.DB_POOL_SIZE))
+
+
+async def readiness() -> dict:
+    """Warm-up state, primary round-trip latency, pool headroom and cache warmth"""
+    pool = async_engine.sync_engine.pool
+    db = {"ok": False, "latency_ms": None}
+    started = time.perf_counter()
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        db["ok"] = True
+        db["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    except Exception as exc:
+        db["error"] = type(exc).__name__
+
+    headroom = pool.telemetry.headroom(pool)
+    ready = (
+        warmup.warmed
+        and db["ok"]
+        and db["latency_ms"] <= settings.READY_MAX_DB_LATENCY_MS
+        and headroom > 0
+    )
+    return {
+        "status": "ready" if ready else ("warming" if not warmup.warmed else "degraded"),
+        "warmed": warmup.warmed,
+        "warmup_ms": round(warmup.duration * 1000) if warmup.duration is not None else None,
+        "db": db,
+        "pool": {"in_use": pool.checkedout(), "idle": pool.checkedin(), "headroom": headroom},
+        "cache": {"catalog_entries": len(catalog_cache)},
+    }
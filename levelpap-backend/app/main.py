@@ -1,16 +1,70 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from fastapi import Depends, FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.cache import catalog_cache
 from app.core.config import settings
+from app.core.database import replica_router
+from app.core.dependencies import require_admin
+from app.core.idempotency import idempotency_store, idempotent_requests
+from app.core.metrics import metrics
+from app.core.pool import PoolSaturatedError
+from app.core.query_stats import report, track_queries
+from app.core.revocation import revocation_list
+from app.core.security import password_hasher
+from app.core.startup import prepare
+from app.core.warmup import readiness, warmup
+from app.services.payment_events import payment_events
+from app.services.payments import close_clients
+from app.services.seats import run_hold_sweeper
+from app.services.webhooks import webhook_worker
 from app.api.v1.api import api_router
 
+
+# Catalog cache invalidations from other workers arrive on the payment listener's connection
+payment_events.subscribe(catalog_cache.channel, catalog_cache.apply_notification)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background_tasks = [
+        asyncio.create_task(revocation_list.run()),
+        asyncio.create_task(replica_router.run()),
+        asyncio.create_task(run_hold_sweeper(settings.SEAT_HOLD_SWEEP_SECONDS)),
+        asyncio.create_task(webhook_worker.run()),
+        asyncio.create_task(payment_events.run()),
+        asyncio.create_task(idempotency_store.run()),
+        asyncio.create_task(catalog_cache.run()),
+    ]
+    # Serve once warm; if warm-up is slow (database still starting) keep retrying in the
+    # background while /ready reports "warming"
+    warmup_task = asyncio.create_task(warmup.run(app))
+    background_tasks.append(warmup_task)
+    await asyncio.wait({warmup_task}, timeout=settings.WARMUP_TIMEOUT_SECONDS)
+    yield
+    for task in background_tasks:
+        task.cancel()
+    for task in background_tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+    password_hasher.shutdown()
+    await close_clients()
+
+
 app = FastAPI(
     title="Tech Training Platform API",
     description="Backend API for Tech Training Platform",
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
+# Idempotency-Key replays (app.core.idempotency); added first so it runs inside CORS and query accounting
+app.middleware("http")(idempotent_requests)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -20,6 +74,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(PoolSaturatedError)
+@app.exception_handler(PoolTimeoutError)
+async def database_busy(request: Request, exc: Exception):
+    """Shed load while the connection pool is saturated instead of queueing until the worker timeout"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Service is busy, please retry"},
+        headers={"Retry-After": str(settings.DB_RETRY_AFTER_SECONDS)},
+    )
+
+
+@app.middleware("http")
+async def count_queries(request: Request, call_next):
+    """Expose each request's query count and database time (X-DB-Queries, Server-Timing); pin writers to the primary"""
+    with track_queries() as stats:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    name = f"{request.method} {route.path if route else request.url.path}"
+    if not report(stats, name):
+        response = JSONResponse(
+            status_code=500,
+            content={"detail": f"Query budget exceeded: {stats.count} queries (budget {stats.budget})"},
+        )
+    if stats.writes:
+        replica_router.record_write(request, response)
+    response.headers["X-DB-Queries"] = str(stats.count)
+    response.headers["Server-Timing"] = f"db;dur={stats.duration * 1000:.1f}"
+    return response
+
+
 # Include API router
 app.include_router(api_router, prefix="/api")
 
@@ -31,5 +115,22 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up (see /ready for whether it should get traffic)"""
     return {"status": "healthy"}
 
+
+@app.get("/ready")
+async def ready():
+    """Readiness: warmed up, database reachable at normal latency and pool headroom left"""
+    checks = await readiness()
+    status_code = status.HTTP_200_OK if checks["status"] == "ready" else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=status_code, content=checks)
+
+
+@app.get("/metrics", dependencies=[Depends(require_admin)])
+async def get_metrics():
+    """In-process metrics for this worker (admin only: pool and queue state would help size an attack)"""
+    return metrics.snapshot()
+
+
+prepare(app)
@@ -5,6 +5,7 @@ from app.models.session import Session
 from app.models.booking import Booking
 from app.models.payment import Payment, PaymentWebhook
 from app.models.corporate_request import CorporateRequest
+from app.models.idempotency_key import IdempotencyKey
 
 __all__ = [
     "User",
@@ -15,5 +16,6 @@ __all__ = [
     "Payment",
     "PaymentWebhook",
     "CorporateRequest",
+    "IdempotencyKey",
 ]
 
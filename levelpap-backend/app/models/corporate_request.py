@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, ForeignKey, Numeric, Enum as SQLEnum, JSON
+from sqlalchemy import Column, Index, String, Integer, Boolean, DateTime, Text, ForeignKey, Numeric, Enum as SQLEnum, JSON
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -34,3 +34,8 @@ class CorporateRequest(Base):
     trainer = relationship("Trainer", foreign_keys=[assigned_to_trainer_id])
     admin_user = relationship("User", foreign_keys=[responded_by])
 
+    # Keyset pagination sort key
+    __table_args__ = (
+        Index("ix_corporate_requests_created_at_id", "created_at", "id"),
+    )
+
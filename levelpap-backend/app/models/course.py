@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, Numeric, ForeignKey, Enum as SQLEnum, JSON
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Index, String, Integer, Boolean, DateTime, Text, Numeric, ForeignKey, Enum as SQLEnum, JSON
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 import uuid
 from app.core.database import Base
@@ -24,8 +24,17 @@ class Course(Base):
     is_active = Column(Boolean, default=True, nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Weighted full-text document (title, syllabus, description); see app.services.search.
+    # Deferred: only the search query reads it, so course loads do not fetch it
+    search_vector = deferred(Column(TSVECTOR().with_variant(Text(), "sqlite"), nullable=True))
 
     # Relationships
     trainer = relationship("Trainer", back_populates="courses")
-    sessions = relationship("Session", back_populates="course")
+    sessions = relationship("Session", back_populates="course", order_by="(Session.date, Session.start_time)")
+
+    # Keyset pagination sort key and full-text search
+    __table_args__ = (
+        Index("ix_courses_created_at_id", "created_at", "id"),
+        Index("ix_courses_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON, LargeBinary, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+import uuid
+from app.core.database import Base
+
+
+class IdempotencyKey(Base):
+    """A client's Idempotency-Key and the response it produced (see app.core.idempotency)"""
+    __tablename__ = "idempotency_keys"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    # SHA-256 of method, path and body; a reused key must come with the same request
+    fingerprint = Column(String(64), nullable=False)
+    # Null while the first request is still running
+    status_code = Column(Integer, nullable=True)
+    # [name, value] pairs, so repeated headers such as Set-Cookie are replayed as sent
+    response_headers = Column(JSON, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+    # Constraints
+    __table_args__ = (
+        UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),
+    )
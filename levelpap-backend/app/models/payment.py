@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Text, ForeignKey, Numeric, Enum as SQLEnum, JSON
+from sqlalchemy import Index, Column, String, Boolean, DateTime, Text, ForeignKey, Numeric, Enum as SQLEnum, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -9,6 +9,10 @@ from app.core.enums import PaymentProvider, PaymentTransactionStatus
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        # Reconciliation scans open payments oldest first; also serves status-only filters
+        Index("ix_payments_status_initiated_at", "status", "initiated_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     booking_id = Column(UUID(as_uuid=True), ForeignKey("bookings.id"), unique=True, nullable=False, index=True)
@@ -16,7 +20,7 @@ class Payment(Base):
     payment_reference = Column(String, unique=True, nullable=False, index=True)
     amount = Column(Numeric(10, 2), nullable=False)
     currency = Column(String, default="KES", nullable=False)
-    status = Column(SQLEnum(PaymentTransactionStatus), default=PaymentTransactionStatus.PENDING, nullable=False, index=True)
+    status = Column(SQLEnum(PaymentTransactionStatus), default=PaymentTransactionStatus.PENDING, nullable=False)
     provider_response = Column(JSON, nullable=True)
     provider_transaction_id = Column(String, nullable=True, index=True)
     initiated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -30,14 +34,24 @@ class Payment(Base):
     booking = relationship("Booking", back_populates="payment")
     webhooks = relationship("PaymentWebhook", back_populates="payment")
 
+    @property
+    def checkout_url(self):
+        """Hosted payment page the customer is sent to (Flutterwave)"""
+        return (self.payment_metadata or {}).get("checkout_url")
+
 
 class PaymentWebhook(Base):
     __tablename__ = "payment_webhooks"
+    __table_args__ = (
+        # Provider retries of the same callback are dropped on insert
+        Index("uq_payment_webhooks_provider_transaction_id", "provider", "provider_transaction_id", unique=True),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     payment_id = Column(UUID(as_uuid=True), ForeignKey("payments.id"), nullable=True, index=True)
     provider = Column(SQLEnum(PaymentProvider), nullable=False)
     event_type = Column(String, nullable=False)
+    provider_transaction_id = Column(String, nullable=True)
     payload = Column(JSON, nullable=False)
     processed = Column(Boolean, default=False, nullable=False, index=True)
     processing_error = Column(Text, nullable=True)
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Date, Time, Text, ForeignKey, Enum as SQLEnum
+from sqlalchemy import Column, Index, String, Integer, Boolean, DateTime, Date, Time, Text, ForeignKey, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import uuid
@@ -19,6 +20,8 @@ class Session(Base):
     trainer_id = Column(UUID(as_uuid=True), ForeignKey("trainers.id"), nullable=True, index=True)
     capacity = Column(Integer, default=1, nullable=False)
     seats_booked = Column(Integer, default=0, nullable=False)
+    # Seats reserved by unpaid bookings whose hold has not expired
+    seats_held = Column(Integer, default=0, server_default="0", nullable=False)
     status = Column(SQLEnum(SessionStatus), default=SessionStatus.SCHEDULED, nullable=False, index=True)
     notes = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -29,3 +32,19 @@ class Session(Base):
     trainer = relationship("Trainer", foreign_keys=[trainer_id])
     bookings = relationship("Booking", back_populates="session")
 
+    # Keyset pagination sort key
+    __table_args__ = (
+        Index("ix_sessions_date_start_time_id", "date", "start_time", "id"),
+    )
+
+    # Columns behind computed response fields (for sparse fieldsets)
+    field_dependencies = {"seats_left": ("capacity", "seats_booked", "seats_held")}
+
+    @hybrid_property
+    def seats_left(self) -> int:
+        return max(self.capacity - self.seats_booked - self.seats_held, 0)
+
+    @seats_left.expression
+    def seats_left(cls):
+        return func.greatest(cls.capacity - cls.seats_booked - cls.seats_held, 0)
+
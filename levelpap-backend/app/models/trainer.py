@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Text, Numeric, ForeignKey, JSON
+from sqlalchemy import Column, Index, String, Integer, Boolean, DateTime, Text, Numeric, ForeignKey, JSON
 from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -27,3 +27,8 @@ class Trainer(Base):
     user = relationship("User", backref="trainer_profile", uselist=False)
     courses = relationship("Course", back_populates="trainer")
 
+    # Keyset pagination sort key
+    __table_args__ = (
+        Index("ix_trainers_created_at_id", "created_at", "id"),
+    )
+
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Enum as SQLEnum
+from sqlalchemy import Column, Index, String, Integer, Boolean, DateTime, Enum as SQLEnum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -23,4 +23,11 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     last_login = Column(DateTime(timezone=True), nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
+    # Bumped to revoke every token issued before the change (logout, deactivation)
+    token_version = Column(Integer, default=0, server_default="0", nullable=False)
+
+    # Keyset pagination sort key
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
@@ -1,7 +1,7 @@
 from app.schemas.user import UserCreate, UserUpdate, UserResponse, UserLogin
 from app.schemas.auth import Token, TokenData
 from app.schemas.trainer import TrainerCreate, TrainerUpdate, TrainerResponse
-from app.schemas.course import CourseCreate, CourseUpdate, CourseResponse
+from app.schemas.course import CourseCreate, CourseUpdate, CourseResponse, CourseDetailResponse, CourseSearchResult
 from app.schemas.session import SessionCreate, SessionUpdate, SessionResponse
 from app.schemas.booking import BookingCreate, BookingUpdate, BookingResponse
 from app.schemas.payment import PaymentCreate, PaymentResponse, PaymentInitiate
@@ -20,6 +20,8 @@ __all__ = [
     "CourseCreate",
     "CourseUpdate",
     "CourseResponse",
+    "CourseDetailResponse",
+    "CourseSearchResult",
     "SessionCreate",
     "SessionUpdate",
     "SessionResponse",
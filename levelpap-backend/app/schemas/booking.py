@@ -31,6 +31,7 @@ class BookingResponse(BookingBase):
     total_amount: Decimal
     cancelled_at: Optional[datetime] = None
     cancellation_reason: Optional[str] = None
+    hold_expires_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
@@ -4,6 +4,8 @@ from datetime import datetime
 from uuid import UUID
 from decimal import Decimal
 from app.core.enums import CourseCategory, Audience
+from app.schemas.session import SessionResponse
+from app.schemas.trainer import TrainerResponse
 
 
 class CourseBase(BaseModel):
@@ -46,3 +48,15 @@ class CourseResponse(CourseBase):
     class Config:
         from_attributes = True
 
+
+class CourseDetailResponse(CourseResponse):
+    """Course page in one response: the course, its trainer and its upcoming sessions"""
+    trainer: Optional[TrainerResponse] = None
+    sessions: List[SessionResponse] = []
+
+
+class CourseSearchResult(BaseModel):
+    course: CourseResponse
+    rank: float
+    highlight: Optional[str] = None
+
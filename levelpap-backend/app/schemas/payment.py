@@ -33,6 +33,7 @@ class PaymentResponse(BaseModel):
     initiated_at: datetime
     completed_at: Optional[datetime] = None
     failure_reason: Optional[str] = None
+    checkout_url: Optional[str] = None  # Flutterwave hosted payment page
     created_at: datetime
     updated_at: datetime
 
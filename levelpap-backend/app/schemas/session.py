@@ -38,6 +38,8 @@ class SessionUpdate(BaseModel):
 class SessionResponse(SessionBase):
     id: UUID
     seats_booked: int
+    seats_held: int = 0
+    seats_left: int
     status: SessionStatus
     created_at: datetime
     updated_at: datetime
@@ -0,0 +1,150 @@
+"""
+Payment status notifications
+
+GET /payments/status?wait= parks the request until its payment changes instead
+of having the client poll. Writers that settle payments (the webhook worker and
+reconciliation) call notify_payment_changes() in their transaction, which
+issues a NOTIFY on CHANNEL per payment reference; Postgres delivers it on
+commit to every listening process. Each process holds one LISTEN connection,
+outside the request pool, and wakes its waiters for that reference.
+
+Notifications sent while a listener is disconnected are lost, so on every
+(re)connect all current waiters are woken to re-read, and a waiter that times
+out re-reads too; at worst a request behaves like a plain poll.
+
+Other per-process state rides on the same connection: subscribe() listens on
+another channel too (the catalog cache hears about other workers' writes that
+way), and its handler gets None on every (re)connect.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional, Set
+import psycopg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import async_engine
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "payment_status"
+
+# How often an idle listener checks its connection is still alive
+LISTEN_CHECK_SECONDS = 30
+
+status_waiters = metrics.gauge("payment_status_waiters", "Status requests parked waiting for a payment change")
+status_woken = metrics.counter("payment_status_woken_total", "Parked status requests woken by a change")
+status_timed_out = metrics.counter("payment_status_timed_out_total", "Parked status requests that waited the full time")
+notifications_received = metrics.counter("payment_notifications_received_total", "Payment NOTIFYs received")
+
+
+async def notify_payment_changes(db: AsyncSession, references: Iterable[str]):
+    """Queue a notification for each changed payment; Postgres sends them when the caller commits"""
+    references = sorted(set(references))
+    if references:
+        await db.execute(
+            text("SELECT pg_notify(:channel, reference) FROM unnest(CAST(:references AS text[])) AS reference"),
+            {"channel": CHANNEL, "references": references},
+        )
+
+
+class Watch:
+    """One parked request's interest in a payment reference"""
+
+    def __init__(self, reference: str):
+        self.reference = reference
+        self._changed = asyncio.Event()
+
+    def wake(self):
+        self._changed.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for a change; returns False on timeout"""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            status_timed_out.inc()
+            return False
+        status_woken.inc()
+        return True
+
+
+class PaymentEvents:
+    def __init__(self, dsn: str, reconnect_interval: float):
+        self.dsn = dsn
+        self.reconnect_interval = reconnect_interval
+        self.connected = False
+        self._watches: Dict[str, Set[Watch]] = defaultdict(set)
+        self._handlers: Dict[str, Callable[[Optional[str]], None]] = {}
+
+    def subscribe(self, channel: str, handler: Callable[[Optional[str]], None]):
+        """Also deliver notifications on `channel` to handler (None after a reconnect); subscribe before run()"""
+        self._handlers[channel] = handler
+
+    @contextmanager
+    def watch(self, reference: str):
+        """Register for changes to a payment; enter before reading it so a change committed meanwhile is not missed"""
+        watch = Watch(reference)
+        self._watches[reference].add(watch)
+        status_waiters.inc()
+        try:
+            yield watch
+        finally:
+            watches = self._watches.get(reference)
+            if watches is not None:
+                watches.discard(watch)
+                if not watches:
+                    del self._watches[reference]
+            status_waiters.dec()
+
+    def publish(self, reference: str):
+        """Wake this process's waiters for a payment"""
+        for watch in self._watches.get(reference, ()):
+            watch.wake()
+
+    def wake_all(self):
+        for watches in self._watches.values():
+            for watch in watches:
+                watch.wake()
+
+    async def _listen(self):
+        async with await psycopg.AsyncConnection.connect(self.dsn, autocommit=True) as conn:
+            for channel in [CHANNEL, *self._handlers]:
+                await conn.execute(f"LISTEN {channel}")
+            self.connected = True
+            # Anything committed while disconnected was not delivered; let waiters re-read
+            self.wake_all()
+            for handler in self._handlers.values():
+                handler(None)
+            while True:
+                async for notify in conn.notifies(timeout=LISTEN_CHECK_SECONDS):
+                    if notify.channel != CHANNEL:
+                        self._handlers[notify.channel](notify.payload)
+                        continue
+                    notifications_received.inc()
+                    self.publish(notify.payload)
+                await conn.execute("SELECT 1")
+
+    async def run(self):
+        """Background loop: keep a LISTEN connection open, reconnecting after failures"""
+        try:
+            while True:
+                try:
+                    await self._listen()
+                except Exception:
+                    logger.exception("Payment notification listener disconnected")
+                self.connected = False
+                await asyncio.sleep(self.reconnect_interval)
+        finally:
+            # Shutting down: return parked requests now rather than at their timeout
+            self.connected = False
+            self.wake_all()
+
+
+payment_events = PaymentEvents(
+    dsn=async_engine.url.set(drivername="postgresql").render_as_string(hide_password=False),
+    reconnect_interval=settings.PAYMENT_EVENTS_RECONNECT_SECONDS,
+)
@@ -0,0 +1,23 @@
+"""
+Payment provider clients
+
+Each provider has one module-level client holding a pooled, kept-alive
+httpx.AsyncClient with its own timeout (MPESA_TIMEOUT_SECONDS,
+FLUTTERWAVE_TIMEOUT_SECONDS). Failures surface as ProviderError. Point
+MPESA_BASE_URL / FLUTTERWAVE_BASE_URL at scripts/stub_providers.py to run
+without real provider accounts.
+"""
+from app.services.payments.client import ProviderError
+from app.services.payments.flutterwave import flutterwave_client
+from app.services.payments.mpesa import mpesa_client
+
+provider_clients = (mpesa_client, flutterwave_client)
+
+
+async def close_clients():
+    """Close the pooled connections on shutdown"""
+    for client in provider_clients:
+        await client.close()
+
+
+__all__ = ["ProviderError", "mpesa_client", "flutterwave_client", "provider_clients", "close_clients"]
@@ -0,0 +1,77 @@
+import logging
+import time
+from typing import Optional
+import httpx
+from app.core.config import settings
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """A payment provider call failed or was rejected"""
+
+    def __init__(self, provider: str, message: str, response: Optional[dict] = None):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.message = message
+        self.response = response
+
+
+class ProviderClient:
+    """
+    One pooled httpx.AsyncClient per provider, created on first use and reused
+    for the life of the worker, so calls ride kept-alive connections instead of
+    paying TCP and TLS setup per payment.
+    """
+
+    name = "provider"
+
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self.latency = metrics.histogram(f"payment_provider_{self.name}_seconds", "Provider API call time")
+        self.errors = metrics.counter(f"payment_provider_{self.name}_errors_total", "Failed provider API calls")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=settings.PROVIDER_CONNECT_TIMEOUT_SECONDS),
+                limits=httpx.Limits(
+                    max_connections=settings.PROVIDER_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.PROVIDER_MAX_CONNECTIONS,
+                    keepalive_expiry=settings.PROVIDER_KEEPALIVE_SECONDS,
+                ),
+            )
+        return self._client
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Send a request, raising ProviderError on network errors and timeouts"""
+        started = time.perf_counter()
+        try:
+            return await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError as exc:
+            self.errors.inc()
+            logger.warning("%s %s %s failed: %r", self.name, method, path, exc)
+            raise ProviderError(self.name, f"{type(exc).__name__} calling {path}") from exc
+        finally:
+            self.latency.observe(time.perf_counter() - started)
+
+    def json(self, response: httpx.Response) -> dict:
+        """Decode a JSON response, raising ProviderError for non-2xx statuses or bad bodies"""
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if not response.is_success or not isinstance(body, dict):
+            self.errors.inc()
+            raise ProviderError(self.name, f"HTTP {response.status_code} from {response.request.url.path}", body)
+        return body
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
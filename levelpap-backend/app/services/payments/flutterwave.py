@@ -0,0 +1,56 @@
+from decimal import Decimal
+from typing import Optional
+from app.core.config import settings
+from app.services.payments.client import ProviderClient, ProviderError
+
+
+class FlutterwaveClient(ProviderClient):
+    """Flutterwave v3 client; requests authenticate with the secret key, so there is no token to cache"""
+
+    name = "flutterwave"
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.FLUTTERWAVE_SECRET_KEY)
+
+    async def create_payment(self, reference: str, amount: Decimal, currency: str, email: str) -> dict:
+        """Create a hosted payment and return Flutterwave's response; data.link is the checkout page"""
+        payload = {
+            "tx_ref": reference,
+            "amount": str(amount),
+            "currency": currency,
+            "redirect_url": settings.FLUTTERWAVE_REDIRECT_URL,
+            "customer": {"email": email},
+        }
+        response = await self.request(
+            "POST",
+            "/v3/payments",
+            json=payload,
+            headers={"Authorization": f"Bearer {settings.FLUTTERWAVE_SECRET_KEY}"},
+        )
+        body = self.json(response)
+        if body.get("status") != "success" or not (body.get("data") or {}).get("link"):
+            raise ProviderError(self.name, body.get("message") or "Payment creation rejected", body)
+        return body
+
+    async def verify(self, reference: str) -> Optional[dict]:
+        """Look up the transaction for a tx_ref; returns its data (as in webhooks) or None if there is none"""
+        response = await self.request(
+            "GET",
+            "/v3/transactions/verify_by_reference",
+            params={"tx_ref": reference},
+            headers={"Authorization": f"Bearer {settings.FLUTTERWAVE_SECRET_KEY}"},
+        )
+        if response.status_code in (400, 404):
+            # Flutterwave answers "No transaction was found" with a 400
+            return None
+        body = self.json(response)
+        if body.get("status") != "success" or not isinstance(body.get("data"), dict):
+            raise ProviderError(self.name, body.get("message") or "Verification failed", body)
+        return body["data"]
+
+
+flutterwave_client = FlutterwaveClient(
+    base_url=settings.FLUTTERWAVE_BASE_URL,
+    timeout=settings.FLUTTERWAVE_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,166 @@
+import asyncio
+import base64
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import ROUND_UP, Decimal
+from typing import Optional
+from app.core.config import settings
+from app.services.payments.client import ProviderClient, ProviderError
+
+logger = logging.getLogger(__name__)
+
+MPESA_BASE_URLS = {
+    "sandbox": "https://sandbox.safaricom.co.ke",
+    "production": "https://api.safaricom.co.ke",
+}
+
+# Daraja's STK query error while the customer has not yet answered the prompt
+STK_STILL_PROCESSING = "500.001.1001"
+
+# Daraja timestamps are in Kenyan local time
+EAT = timezone(timedelta(hours=3))
+
+
+def normalize_phone(phone: str) -> str:
+    """07XXXXXXXX / +2547XXXXXXXX / 2547XXXXXXXX -> 2547XXXXXXXX"""
+    digits = "".join(ch for ch in phone if ch.isdigit())
+    if digits.startswith("0"):
+        digits = "254" + digits[1:]
+    elif len(digits) == 9:
+        digits = "254" + digits
+    return digits
+
+
+class MpesaClient(ProviderClient):
+    """
+    Daraja API client. The OAuth access token is cached: inside the last
+    MPESA_TOKEN_REFRESH_MARGIN_SECONDS of its life it is refreshed in the
+    background while the current token keeps being used, so a payment only
+    waits for OAuth on the very first call (or after a long idle period).
+    Concurrent callers share a single refresh.
+    """
+
+    name = "mpesa"
+
+    def __init__(self, base_url: str, timeout: float, refresh_margin: float):
+        super().__init__(base_url, timeout)
+        self.refresh_margin = refresh_margin
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.MPESA_CONSUMER_KEY and settings.MPESA_CONSUMER_SECRET)
+
+    async def _fetch_token(self):
+        response = await self.request(
+            "GET",
+            "/oauth/v1/generate",
+            params={"grant_type": "client_credentials"},
+            auth=(settings.MPESA_CONSUMER_KEY, settings.MPESA_CONSUMER_SECRET),
+        )
+        body = self.json(response)
+        try:
+            token, expires_in = body["access_token"], float(body["expires_in"])
+        except (KeyError, TypeError, ValueError):
+            raise ProviderError(self.name, "Malformed OAuth response", body)
+        self._token = token
+        self._expires_at = time.monotonic() + expires_in
+
+    def _refresh(self) -> asyncio.Task:
+        """Start a token refresh, or join the one already running"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._fetch_token())
+            self._refreshing.add_done_callback(self._refresh_done)
+        return self._refreshing
+
+    def _refresh_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("M-Pesa token refresh failed: %s", task.exception())
+
+    async def access_token(self) -> str:
+        """A valid OAuth token, fetched only when the cached one has expired"""
+        now = time.monotonic()
+        if self._token is not None and now < self._expires_at:
+            if now >= self._expires_at - self.refresh_margin:
+                self._refresh()
+            return self._token
+        await asyncio.shield(self._refresh())
+        return self._token
+
+    def invalidate_token(self):
+        self._token = None
+        self._expires_at = 0.0
+
+    def _credentials(self) -> dict:
+        """Shortcode, password and timestamp fields every Lipa na M-Pesa request carries"""
+        timestamp = datetime.now(EAT).strftime("%Y%m%d%H%M%S")
+        password = base64.b64encode(
+            f"{settings.MPESA_SHORTCODE}{settings.MPESA_PASSKEY}{timestamp}".encode()
+        ).decode()
+        return {"BusinessShortCode": settings.MPESA_SHORTCODE, "Password": password, "Timestamp": timestamp}
+
+    async def _post(self, path: str, payload: dict):
+        """POST with the cached token, fetching a new one and retrying once on 401"""
+        for attempt in range(2):
+            token = await self.access_token()
+            response = await self.request("POST", path, json=payload, headers={"Authorization": f"Bearer {token}"})
+            if response.status_code == 401 and attempt == 0:
+                # Token revoked or expired early
+                self.invalidate_token()
+                continue
+            return response
+
+    async def stk_push(self, phone: str, amount: Decimal, reference: str, description: str = "Course booking") -> dict:
+        """
+        Send an STK push (Lipa na M-Pesa Online) and return Daraja's response;
+        its CheckoutRequestID identifies the payment in the result callback.
+        """
+        payload = {
+            **self._credentials(),
+            "TransactionType": "CustomerPayBillOnline",
+            # Whole shillings only; rounding up keeps the paid amount >= the amount due
+            "Amount": int(amount.to_integral_value(rounding=ROUND_UP)),
+            "PartyA": normalize_phone(phone),
+            "PartyB": settings.MPESA_SHORTCODE,
+            "PhoneNumber": normalize_phone(phone),
+            "CallBackURL": f"{settings.MPESA_CALLBACK_URL}?token={settings.MPESA_CALLBACK_TOKEN}",
+            "AccountReference": reference[:12],
+            "TransactionDesc": description[:13],
+        }
+
+        body = self.json(await self._post("/mpesa/stkpush/v1/processrequest", payload))
+        if str(body.get("ResponseCode")) != "0" or not body.get("CheckoutRequestID"):
+            raise ProviderError(self.name, body.get("ResponseDescription") or "STK push rejected", body)
+        return body
+
+    async def stk_query(self, checkout_request_id: str) -> Optional[dict]:
+        """
+        Ask Daraja for the result of an STK push. Returns the response (its
+        ResultCode is the same code the callback carries), or None while the
+        customer has not finished.
+        """
+        response = await self._post(
+            "/mpesa/stkpushquery/v1/query",
+            {**self._credentials(), "CheckoutRequestID": checkout_request_id},
+        )
+        if response.status_code == 500:
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            if body.get("errorCode") == STK_STILL_PROCESSING:
+                return None
+        body = self.json(response)
+        if body.get("ResultCode") is None:
+            raise ProviderError(self.name, body.get("ResponseDescription") or "STK query rejected", body)
+        return body
+
+
+mpesa_client = MpesaClient(
+    base_url=settings.MPESA_BASE_URL or MPESA_BASE_URLS.get(settings.MPESA_ENVIRONMENT, MPESA_BASE_URLS["sandbox"]),
+    timeout=settings.MPESA_TIMEOUT_SECONDS,
+    refresh_margin=settings.MPESA_TOKEN_REFRESH_MARGIN_SECONDS,
+)
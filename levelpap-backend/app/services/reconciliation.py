@@ -0,0 +1,256 @@
+"""
+Payment reconciliation
+
+A payment stays PENDING/PROCESSING until its provider's callback arrives, so
+a lost callback would leave it, and its booking's seat hold, open forever.
+reconcile_payments() walks open payments initiated before a cutoff, oldest
+first through the (status, initiated_at) index, asks the provider for each
+result with a bounded number of calls in flight, and applies a batch of
+results in one transaction: a single UPDATE ... FROM (VALUES ...) for the
+payments, then one statement per outcome for their bookings and the
+sessions' seat counters, and a notification for status long-polls. Payments
+settled by a webhook in the meantime are left alone.
+"""
+import asyncio
+import logging
+import statistics
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from uuid import UUID
+from sqlalchemy import JSON, String, Text, cast, column, func, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import AsyncSessionLocal
+from app.core.enums import PaymentProvider, PaymentTransactionStatus
+from app.models.booking import Booking
+from app.models.payment import Payment
+from app.services.payment_events import notify_payment_changes
+from app.services.payments import ProviderError, flutterwave_client, mpesa_client
+from app.services.seats import complete_booking_payment, settle_pending_bookings
+from app.services.webhooks import check_amount, flutterwave_outcome, mpesa_result_status
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = (PaymentTransactionStatus.PENDING, PaymentTransactionStatus.PROCESSING)
+EXPIRED_REASON = "Expired without a result from the provider"
+
+
+@dataclass
+class Result:
+    payment_id: UUID
+    status: PaymentTransactionStatus
+    failure_reason: Optional[str] = None
+    provider_transaction_id: Optional[str] = None
+    provider_response: Optional[dict] = None
+
+
+@dataclass
+class ReconcileReport:
+    checked: int = 0
+    outcomes: Counter = field(default_factory=Counter)
+    refunds: List[str] = field(default_factory=list)
+    provider_seconds: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    apply_seconds: List[float] = field(default_factory=list)
+    duration: float = 0
+
+    def summary(self) -> str:
+        rate = self.checked / self.duration if self.duration else 0
+        lines = [
+            f"Checked {self.checked} stale payment(s) in {self.duration:.1f}s ({rate:.0f}/s)",
+            "  " + ", ".join(f"{name}: {count}" for name, count in sorted(self.outcomes.items())) if self.outcomes else "  nothing to do",
+        ]
+        for provider, timings in sorted(self.provider_seconds.items()):
+            timings = sorted(timings)
+            lines.append(
+                f"  {provider} calls: {len(timings)}, p50 {statistics.median(timings) * 1000:.0f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95)] * 1000:.0f} ms, max {timings[-1] * 1000:.0f} ms"
+            )
+        if self.apply_seconds:
+            lines.append(
+                f"  batches applied: {len(self.apply_seconds)}, "
+                f"p50 {statistics.median(self.apply_seconds) * 1000:.0f} ms, max {max(self.apply_seconds) * 1000:.0f} ms"
+            )
+        if self.refunds:
+            shown = ", ".join(self.refunds[:20]) + (f" and {len(self.refunds) - 20} more" if len(self.refunds) > 20 else "")
+            lines.append(f"  refund required (paid but the session is full): {len(self.refunds)}: {shown}")
+        return "\n".join(lines)
+
+
+async def stale_payments(db: AsyncSession, cutoff: datetime, after: Optional[tuple], limit: int) -> list:
+    """The next `limit` open payments initiated before `cutoff`, after the (initiated_at, id) keyset position"""
+    query = (
+        select(
+            Payment.id,
+            Payment.provider,
+            Payment.payment_reference,
+            Payment.provider_transaction_id,
+            Payment.amount,
+            Payment.initiated_at,
+        )
+        .where(Payment.status.in_(OPEN_STATUSES), Payment.initiated_at < cutoff)
+        .order_by(Payment.initiated_at, Payment.id)
+        .limit(limit)
+    )
+    if after is not None:
+        query = query.where(tuple_(Payment.initiated_at, Payment.id) > tuple_(*after))
+    return (await db.execute(query)).all()
+
+
+def can_query(payment) -> bool:
+    """Whether the provider can be asked about a payment (an STK push that never got a checkout id cannot)"""
+    if payment.provider == PaymentProvider.MPESA:
+        return bool(payment.provider_transaction_id)
+    return payment.provider == PaymentProvider.FLUTTERWAVE
+
+
+async def query_provider(payment) -> Optional[Result]:
+    """The provider's final result for a payment, or None while it has none"""
+    if not can_query(payment):
+        return None
+    if payment.provider == PaymentProvider.MPESA:
+        body = await mpesa_client.stk_query(payment.provider_transaction_id)
+        if body is None:
+            return None
+        status = mpesa_result_status(body.get("ResultCode"))
+        return Result(
+            payment.id,
+            status,
+            failure_reason=None if status == PaymentTransactionStatus.COMPLETED else body.get("ResultDesc"),
+            provider_response=body,
+        )
+
+    if payment.provider == PaymentProvider.FLUTTERWAVE:
+        data = await flutterwave_client.verify(payment.payment_reference)
+        if data is None:
+            return None
+        outcome = flutterwave_outcome({"data": data})
+        if outcome.status is None:
+            return None
+        status, failure_reason = check_amount(outcome.status, outcome.failure_reason, outcome.amount, payment.amount)
+        return Result(
+            payment.id,
+            status,
+            failure_reason=failure_reason,
+            provider_transaction_id=outcome.provider_transaction_id,
+            provider_response=data,
+        )
+    return None
+
+
+async def apply_results(db: AsyncSession, results: List[Result], report: ReconcileReport):
+    """Write a batch of results to payments, bookings and seat counters; the caller commits"""
+    if not results:
+        return
+    rows = values(
+        column("id", PG_UUID(as_uuid=True)),
+        column("status", String),
+        column("failure_reason", Text),
+        column("provider_transaction_id", String),
+        column("provider_response", JSON(none_as_null=True)),
+        name="results",
+    ).data([
+        (r.payment_id, r.status.name, r.failure_reason, r.provider_transaction_id, r.provider_response)
+        for r in results
+    ])
+    updated = (await db.execute(
+        update(Payment)
+        .where(Payment.id == rows.c.id, Payment.status.in_(OPEN_STATUSES))
+        .values(
+            status=cast(rows.c.status, Payment.__table__.c.status.type),
+            completed_at=func.now(),
+            # A VALUES column that is NULL in every row comes out as text, so the nullable ones are cast
+            failure_reason=cast(rows.c.failure_reason, Text),
+            provider_transaction_id=func.coalesce(
+                cast(rows.c.provider_transaction_id, String), Payment.provider_transaction_id
+            ),
+            provider_response=func.coalesce(cast(rows.c.provider_response, JSON), Payment.provider_response),
+        )
+        .returning(Payment.booking_id, Payment.status, Payment.payment_reference)
+        .execution_options(synchronize_session=False)
+    )).all()
+    if len(updated) < len(results):
+        report.outcomes["settled by webhook meanwhile"] += len(results) - len(updated)
+
+    references = {}
+    by_outcome = {True: [], False: []}
+    for booking_id, status, reference in updated:
+        report.outcomes[status.value] += 1
+        references[booking_id] = reference
+        by_outcome[status == PaymentTransactionStatus.COMPLETED].append(booking_id)
+    await notify_payment_changes(db, references.values())
+
+    leftovers = {}
+    for paid, booking_ids in by_outcome.items():
+        settled = await settle_pending_bookings(db, booking_ids, paid)
+        leftovers.update({booking_id: paid for booking_id in booking_ids if booking_id not in settled})
+
+    # Bookings that were cancelled or whose hold had already expired take the per-booking path
+    if leftovers:
+        bookings = (await db.execute(select(Booking).where(Booking.id.in_(leftovers)))).scalars().all()
+        for booking in bookings:
+            if not await complete_booking_payment(db, booking, leftovers[booking.id]):
+                report.refunds.append(references[booking.id])
+                logger.warning("Payment %s needs a refund: booking cancelled or session full", references[booking.id])
+
+
+async def reconcile_payments(
+    older_than: timedelta,
+    expire_after: timedelta,
+    batch_size: int,
+    concurrency: int,
+    limit: Optional[int] = None,
+    dry_run: bool = False,
+) -> ReconcileReport:
+    """Check every payment still open `older_than` after initiation with its provider and apply the results"""
+    report = ReconcileReport()
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    cutoff, expire_before = now - older_than, now - expire_after
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check(payment) -> Optional[Result]:
+        result = None
+        if can_query(payment):
+            async with semaphore:
+                call_started = time.perf_counter()
+                try:
+                    result = await query_provider(payment)
+                except ProviderError as exc:
+                    report.outcomes["provider errors"] += 1
+                    logger.warning("Could not check payment %s: %s", payment.payment_reference, exc)
+                    return None
+                finally:
+                    report.provider_seconds[payment.provider.value].append(time.perf_counter() - call_started)
+        if result is None and payment.initiated_at < expire_before:
+            return Result(payment.id, PaymentTransactionStatus.FAILED, failure_reason=EXPIRED_REASON)
+        if result is None:
+            report.outcomes["still open"] += 1
+        return result
+
+    after = None
+    while limit is None or report.checked < limit:
+        size = batch_size if limit is None else min(batch_size, limit - report.checked)
+        async with AsyncSessionLocal() as db:
+            payments = await stale_payments(db, cutoff, after, size)
+        if not payments:
+            break
+        after = (payments[-1].initiated_at, payments[-1].id)
+        report.checked += len(payments)
+
+        results = [result for result in await asyncio.gather(*(check(p) for p in payments)) if result is not None]
+        if dry_run:
+            report.outcomes.update(f"would be {result.status.value}" for result in results)
+        else:
+            applied = time.perf_counter()
+            async with AsyncSessionLocal() as db:
+                await apply_results(db, results, report)
+                await db.commit()
+            report.apply_seconds.append(time.perf_counter() - applied)
+        if len(payments) < size:
+            break
+
+    report.duration = time.perf_counter() - started
+    return report
@@ -0,0 +1,184 @@
+"""
+Course full-text search
+
+On PostgreSQL courses carry a weighted `search_vector` (title > syllabus >
+description) backed by a GIN index; queries use websearch syntax, are ranked
+with ts_rank_cd and highlighted with ts_headline. Other databases (SQLite in
+tests) fall back to an in-process inverted index with the same weighting.
+"""
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+from uuid import UUID
+from sqlalchemy import func, literal_column, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.course import Course
+
+SEARCH_CONFIG = "english"
+HIGHLIGHT_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=25, MinWords=8"
+
+# Same relative weights as PostgreSQL's default {A, B, C} = {1.0, 0.4, 0.2}
+FIELD_WEIGHTS = (("title", 1.0), ("syllabus", 0.4), ("description", 0.2))
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the to with".split()
+)
+
+
+def _is_postgres(db: AsyncSession) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def course_search_vector():
+    """Weighted tsvector expression over a course's searchable text"""
+    def weighted(text, weight):
+        # setweight() takes a "char", which a bound varchar parameter does not cast to
+        return func.setweight(func.to_tsvector(SEARCH_CONFIG, func.coalesce(text, "")), literal_column(f"'{weight}'"))
+
+    return (
+        weighted(Course.title, "A")
+        .op("||")(weighted(func.array_to_string(Course.syllabus, " "), "B"))
+        .op("||")(weighted(Course.description, "C"))
+    )
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOP_WORDS]
+
+
+def _course_fields(course: Course) -> Dict[str, str]:
+    return {
+        "title": course.title or "",
+        "syllabus": " ".join(course.syllabus or []),
+        "description": course.description or "",
+    }
+
+
+class InvertedIndex:
+    """Pure-Python weighted inverted index used when full-text search is unavailable"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[UUID, float]] = defaultdict(dict)
+        self.documents: Dict[UUID, Dict[str, str]] = {}
+        self.loaded = False
+
+    def add(self, course_id: UUID, fields: Dict[str, str]):
+        self.remove(course_id)
+        self.documents[course_id] = fields
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokenize(fields.get(field, "")):
+                postings = self.postings[token]
+                postings[course_id] = postings.get(course_id, 0.0) + weight
+
+    def remove(self, course_id: UUID):
+        fields = self.documents.pop(course_id, None)
+        if fields is None:
+            return
+        for token in set(tokenize(" ".join(fields.values()))):
+            postings = self.postings.get(token)
+            if postings is not None:
+                postings.pop(course_id, None)
+                if not postings:
+                    del self.postings[token]
+
+    def search(self, query: str) -> List[Tuple[UUID, float]]:
+        """Documents containing every query term, best first"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        candidates: Optional[set] = None
+        for term in terms:
+            ids = set(self.postings.get(term, ()))
+            candidates = ids if candidates is None else candidates & ids
+            if not candidates:
+                return []
+
+        total = len(self.documents)
+        scores = []
+        for course_id in candidates:
+            score = 0.0
+            for term in terms:
+                postings = self.postings[term]
+                idf = math.log(1 + total / len(postings))
+                score += postings[course_id] * idf
+            scores.append((course_id, score))
+        scores.sort(key=lambda item: (-item[1], str(item[0])))
+        return scores
+
+    def highlight(self, course_id: UUID, query: str, max_words: int = 25) -> str:
+        fields = self.documents.get(course_id, {})
+        words = " ".join(fields.get(field, "") for field, _ in FIELD_WEIGHTS).split()
+        terms = set(tokenize(query))
+        hits = [i for i, w in enumerate(words) if tokenize(w) and tokenize(w)[0] in terms]
+        start = max(hits[0] - max_words // 3, 0) if hits else 0
+        return " ".join(
+            f"<mark>{w}</mark>" if tokenize(w) and tokenize(w)[0] in terms else w
+            for w in words[start:start + max_words]
+        )
+
+
+course_index = InvertedIndex()
+
+
+async def refresh_search_vector(db: AsyncSession, course_ids: Optional[Sequence[UUID]] = None):
+    """Recompute search data for the given courses (all courses when None); caller commits"""
+    if _is_postgres(db):
+        # Keep updated_at as is: reindexing is not a content change
+        stmt = update(Course).values(search_vector=course_search_vector(), updated_at=Course.updated_at)
+        if course_ids is not None:
+            stmt = stmt.where(Course.id.in_(course_ids))
+        await db.execute(stmt.execution_options(synchronize_session=False))
+        return
+
+    query = select(Course)
+    if course_ids is not None:
+        query = query.where(Course.id.in_(course_ids))
+    result = await db.execute(query)
+    for course in result.scalars().all():
+        if course.is_active and course.is_published:
+            course_index.add(course.id, _course_fields(course))
+        else:
+            course_index.remove(course.id)
+
+
+def _searchable():
+    return (Course.is_active == True, Course.is_published == True)
+
+
+async def search_courses(db: AsyncSession, q: str, skip: int, limit: int) -> List[Tuple[Course, float, str]]:
+    """Ranked page of published courses matching q, as (course, rank, highlight)"""
+    if _is_postgres(db):
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        rank = func.ts_rank_cd(Course.search_vector, tsquery).label("rank")
+        # Rank and page first so ts_headline only runs on the returned rows
+        page = (
+            select(Course.id, rank)
+            .where(Course.search_vector.op("@@")(tsquery), *_searchable())
+            .order_by(rank.desc(), Course.id)
+            .offset(skip)
+            .limit(limit)
+            .subquery()
+        )
+        document = func.concat_ws(" ", Course.title, Course.description, func.array_to_string(Course.syllabus, " "))
+        result = await db.execute(
+            select(Course, page.c.rank, func.ts_headline(SEARCH_CONFIG, document, tsquery, HIGHLIGHT_OPTIONS))
+            .join(page, page.c.id == Course.id)
+            .order_by(page.c.rank.desc(), Course.id)
+        )
+        return [(course, float(rank), headline) for course, rank, headline in result.all()]
+
+    if not course_index.loaded:
+        await refresh_search_vector(db)
+        course_index.loaded = True
+    matches = course_index.search(q)[skip:skip + limit]
+    if not matches:
+        return []
+    result = await db.execute(select(Course).where(Course.id.in_([m[0] for m in matches]), *_searchable()))
+    courses = {course.id: course for course in result.scalars().all()}
+    return [
+        (courses[course_id], score, course_index.highlight(course_id, q))
+        for course_id, score in matches
+        if course_id in courses
+    ]
@@ -0,0 +1,307 @@
+"""
+Seat accounting for sessions
+
+`Session.seats_held` counts seats reserved by unpaid bookings whose hold has not
+expired, `Session.seats_booked` counts seats of paid bookings. Both are only
+ever changed with single conditional UPDATEs, so concurrent checkouts cannot
+oversell a session and no row lock is held across the payment round trip.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Sequence, Set
+from uuid import UUID
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import catalog_cache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.enums import PaymentStatus
+from app.models.booking import Booking
+from app.models.session import Session
+
+logger = logging.getLogger(__name__)
+
+HOLD_EXPIRED_REASON = "Seat hold expired before payment"
+
+
+def hold_expiry() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(minutes=settings.SEAT_HOLD_TTL_MINUTES)
+
+
+def hold_is_expired(booking: Booking) -> bool:
+    return booking.hold_expires_at is not None and booking.hold_expires_at <= datetime.now(timezone.utc)
+
+
+def is_renewable(booking: Booking) -> bool:
+    """A booking that holds no seats any more (payment failed or hold lapsed) and may be booked again"""
+    if booking.cancelled_at:
+        return False
+    return booking.payment_status == PaymentStatus.FAILED or (
+        booking.payment_status == PaymentStatus.PENDING and hold_is_expired(booking)
+    )
+
+
+async def hold_seats(db: AsyncSession, session_id: UUID, seats: int) -> Optional[int]:
+    """Reserve seats if capacity allows; returns the seats left afterwards, or None if there were not enough"""
+    result = await db.execute(
+        update(Session)
+        .where(
+            Session.id == session_id,
+            Session.seats_booked + Session.seats_held + seats <= Session.capacity,
+        )
+        .values(seats_held=Session.seats_held + seats)
+        .returning(Session.capacity - Session.seats_booked - Session.seats_held)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one_or_none()
+
+
+async def claim_seats(db: AsyncSession, session_id: UUID, seats: int) -> Optional[int]:
+    """Book seats outright (no hold) if capacity allows; returns the seats left, or None"""
+    result = await db.execute(
+        update(Session)
+        .where(
+            Session.id == session_id,
+            Session.seats_booked + Session.seats_held + seats <= Session.capacity,
+        )
+        .values(seats_booked=Session.seats_booked + seats)
+        .returning(Session.capacity - Session.seats_booked - Session.seats_held)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one_or_none()
+
+
+async def release_seats(db: AsyncSession, session_id: UUID, seats: int, held: bool):
+    """Give held (unpaid) or booked (paid) seats back to a session"""
+    column = Session.seats_held if held else Session.seats_booked
+    await db.execute(
+        update(Session)
+        .where(Session.id == session_id)
+        .values({column: func.greatest(column - seats, 0)})
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def get_seats_left(db: AsyncSession, session_id: UUID) -> int:
+    result = await db.execute(
+        select(Session.capacity - Session.seats_booked - Session.seats_held).where(Session.id == session_id)
+    )
+    return max(result.scalar_one_or_none() or 0, 0)
+
+
+async def cancel_booking_seats(
+    db: AsyncSession, booking_id: UUID, payment_status: PaymentStatus, reason: Optional[str]
+) -> Optional[Booking]:
+    """
+    Cancel a booking in one conditional UPDATE, provided it is not cancelled and
+    still has `payment_status` (as the caller read it), then give back the seats
+    it occupied: its hold while pending, its seats once paid. Returns the
+    cancelled booking, or None when it changed meanwhile (a payment settled it,
+    its hold was swept or another cancel won).
+    """
+    result = await db.execute(
+        update(Booking)
+        .where(
+            Booking.id == booking_id,
+            Booking.cancelled_at.is_(None),
+            Booking.payment_status == payment_status,
+        )
+        .values(
+            payment_status=PaymentStatus.REFUNDED,
+            cancelled_at=func.now(),
+            cancellation_reason=reason,
+            hold_expires_at=None,
+        )
+        .returning(Booking)
+        .execution_options(populate_existing=True)
+    )
+    booking = result.scalars().first()
+    if booking is None:
+        return None
+    if payment_status == PaymentStatus.PENDING:
+        await release_seats(db, booking.session_id, booking.seats, held=True)
+    elif payment_status == PaymentStatus.PAID:
+        await release_seats(db, booking.session_id, booking.seats, held=False)
+    return booking
+
+
+async def complete_booking_payment(db: AsyncSession, booking: Booking, paid: bool) -> bool:
+    """
+    Apply a payment outcome to a booking. A successful payment turns the hold
+    into booked seats; if the hold already expired the seats are claimed again
+    when still available. Returns False when a paid booking could not get its
+    seats, because it was cancelled meanwhile or the session filled up (the
+    payment needs refunding).
+    """
+    if booking.cancelled_at:
+        # Cancelled while the checkout was still open: its seats are gone, so a payment is refunded
+        return not paid
+    if booking.payment_status == PaymentStatus.PAID:
+        return True
+
+    if booking.payment_status == PaymentStatus.PENDING:
+        if paid:
+            await db.execute(
+                update(Session)
+                .where(Session.id == booking.session_id)
+                .values(
+                    seats_held=func.greatest(Session.seats_held - booking.seats, 0),
+                    seats_booked=Session.seats_booked + booking.seats,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            booking.payment_status = PaymentStatus.PAID
+        else:
+            await release_seats(db, booking.session_id, booking.seats, held=True)
+            booking.payment_status = PaymentStatus.FAILED
+        booking.hold_expires_at = None
+        return True
+
+    # Hold expired (booking FAILED) but the customer paid anyway
+    if paid and booking.cancellation_reason == HOLD_EXPIRED_REASON:
+        if await claim_seats(db, booking.session_id, booking.seats) is None:
+            return False
+        booking.payment_status = PaymentStatus.PAID
+        booking.cancellation_reason = None
+        return True
+    return not paid
+
+
+async def settle_pending_bookings(db: AsyncSession, booking_ids: Sequence[UUID], paid: bool) -> Set[UUID]:
+    """
+    Bulk form of complete_booking_payment for bookings still holding seats:
+    marks them PAID (held seats become booked) or FAILED (held seats are
+    released) in a single statement. Returns the ids it settled; anything else
+    (cancelled, already settled, hold expired) is left for complete_booking_payment.
+    """
+    if not booking_ids:
+        return set()
+    settled = (
+        update(Booking)
+        .where(
+            Booking.id.in_(booking_ids),
+            Booking.payment_status == PaymentStatus.PENDING,
+            Booking.cancelled_at.is_(None),
+        )
+        .values(payment_status=PaymentStatus.PAID if paid else PaymentStatus.FAILED, hold_expires_at=None)
+        .returning(Booking.id, Booking.session_id, Booking.seats)
+        .cte("settled")
+    )
+    totals = (
+        select(settled.c.session_id, func.sum(settled.c.seats).label("seats"))
+        .group_by(settled.c.session_id)
+        .cte("totals")
+    )
+    seats = {"seats_held": func.greatest(Session.seats_held - totals.c.seats, 0)}
+    if paid:
+        seats["seats_booked"] = Session.seats_booked + totals.c.seats
+    sessions = (
+        update(Session)
+        .where(Session.id == totals.c.session_id)
+        .values(**seats)
+        .returning(Session.id)
+        .cte("sessions")
+    )
+    # Postgres runs every data-modifying CTE, referenced or not
+    result = await db.execute(select(settled.c.id).add_cte(sessions))
+    return set(result.scalars().all())
+
+
+async def renew_booking(db: AsyncSession, booking_id: UUID, values: dict) -> Optional[Booking]:
+    """
+    Put a failed booking back on hold with `values` (its new seats, amount and
+    hold_expires_at) in one conditional UPDATE; the caller holds the seats.
+    Returns the booking, or None when it is no longer failed.
+    """
+    result = await db.execute(
+        update(Booking)
+        .where(
+            Booking.id == booking_id,
+            Booking.payment_status == PaymentStatus.FAILED,
+            Booking.cancelled_at.is_(None),
+        )
+        .values(payment_status=PaymentStatus.PENDING, cancellation_reason=None, **values)
+        .returning(Booking)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+
+async def expire_seat_holds(db: AsyncSession, booking_ids: Optional[Sequence[UUID]] = None) -> int:
+    """
+    Fail every pending booking whose hold has lapsed (only `booking_ids` when
+    given) and return its seats, in a single statement. Returns the number of
+    seats released.
+    """
+    lapsed = [
+        Booking.payment_status == PaymentStatus.PENDING,
+        Booking.cancelled_at.is_(None),
+        Booking.hold_expires_at <= func.now(),
+    ]
+    if booking_ids is not None:
+        lapsed.append(Booking.id.in_(booking_ids))
+    expired = (
+        update(Booking)
+        .where(*lapsed)
+        .values(
+            payment_status=PaymentStatus.FAILED,
+            hold_expires_at=None,
+            cancellation_reason=HOLD_EXPIRED_REASON,
+        )
+        .returning(Booking.session_id, Booking.seats)
+        .cte("expired")
+    )
+    totals = (
+        select(expired.c.session_id, func.sum(expired.c.seats).label("seats"))
+        .group_by(expired.c.session_id)
+        .cte("totals")
+    )
+    result = await db.execute(
+        update(Session)
+        .where(Session.id == totals.c.session_id)
+        .values(seats_held=func.greatest(Session.seats_held - totals.c.seats, 0))
+        .returning(totals.c.seats)
+        .execution_options(synchronize_session=False)
+    )
+    return sum(result.scalars().all())
+
+
+async def run_hold_sweeper(interval: float):
+    """Background loop expiring stale seat holds"""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                released = await expire_seat_holds(db)
+                await db.commit()
+            if released:
+                catalog_cache.invalidate("sessions")
+                logger.info("Released %s seats from expired holds", released)
+        except Exception:
+            logger.exception("Failed to expire seat holds")
+        await asyncio.sleep(interval)
+
+
+async def recompute_seat_counters(db: AsyncSession) -> int:
+    """Rebuild every session's seat counters from its bookings; returns the number of sessions corrected"""
+    def seats_with_status(status: PaymentStatus):
+        return func.coalesce(
+            select(func.sum(Booking.seats))
+            .where(
+                Booking.session_id == Session.id,
+                Booking.cancelled_at.is_(None),
+                Booking.payment_status == status,
+            )
+            .scalar_subquery(),
+            0,
+        )
+
+    booked = seats_with_status(PaymentStatus.PAID)
+    held = seats_with_status(PaymentStatus.PENDING)
+    result = await db.execute(
+        update(Session)
+        .where((Session.seats_booked != booked) | (Session.seats_held != held))
+        .values(seats_booked=booked, seats_held=held)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
@@ -0,0 +1,350 @@
+"""
+Payment webhook ingestion
+
+Providers retry callbacks that are not acknowledged quickly, so the webhook
+endpoints only verify the sender, store the raw payload with a single
+INSERT ... ON CONFLICT DO NOTHING keyed on (provider, provider transaction id),
+and return. Retries of a callback already stored are dropped by that unique
+index.
+
+A background worker in every process drains unprocessed rows in batches
+(SELECT ... FOR UPDATE SKIP LOCKED, so workers never take the same rows),
+locks the payments and bookings they refer to, applies each outcome to a
+payment that is still open, and commits once per batch. Each row is applied
+in its own savepoint, so a row that cannot be read or applied is marked
+processed with its error instead of failing (and endlessly retrying) the batch.
+The batch also notifies status long-polls of the payments it settled (see
+app.services.payment_events).
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import List, Optional
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+from app.core.cache import catalog_cache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.enums import PaymentProvider, PaymentTransactionStatus
+from app.core.metrics import metrics
+from app.models.booking import Booking
+from app.models.payment import Payment, PaymentWebhook
+from app.services.payment_events import notify_payment_changes
+from app.services.seats import complete_booking_payment
+
+logger = logging.getLogger(__name__)
+
+# M-Pesa STK result codes that mean the customer backed out rather than a failure
+MPESA_CANCELLED_CODES = {1032}
+
+REFUND_REQUIRED = "Paid for a booking that was cancelled, or whose hold expired on a full session; refund required"
+
+FINAL_STATUSES = {
+    PaymentTransactionStatus.COMPLETED,
+    PaymentTransactionStatus.FAILED,
+    PaymentTransactionStatus.CANCELLED,
+}
+
+webhooks_received = metrics.counter("payment_webhooks_received_total", "Webhook callbacks accepted")
+webhooks_duplicate = metrics.counter("payment_webhooks_duplicate_total", "Webhook retries dropped as duplicates")
+webhooks_processed = metrics.counter("payment_webhooks_processed_total", "Webhook rows applied by the worker")
+webhooks_failed = metrics.counter("payment_webhooks_failed_total", "Webhook rows that could not be applied")
+
+
+def hmac_matches(secret: str, message: bytes, signature: str, encoding: str = "hex") -> bool:
+    """Constant-time check of an HMAC-SHA256 signature (hex or base64)"""
+    if not secret or not signature:
+        return False
+    digest = hmac.new(secret.encode(), message, hashlib.sha256).digest()
+    expected = base64.b64encode(digest).decode() if encoding == "base64" else digest.hex()
+    return hmac.compare_digest(expected, signature.strip())
+
+
+def token_matches(secret: str, token: str) -> bool:
+    """Constant-time comparison of a shared secret token"""
+    return bool(secret) and bool(token) and hmac.compare_digest(secret.encode(), token.encode())
+
+
+@dataclass
+class WebhookEvent:
+    event_type: str
+    provider_transaction_id: Optional[str]
+
+
+@dataclass
+class Outcome:
+    """What a callback says about a payment"""
+    payment_reference: Optional[str]
+    checkout_id: Optional[str]
+    status: Optional[PaymentTransactionStatus]
+    provider_transaction_id: Optional[str]
+    amount: Optional[Decimal]
+    failure_reason: Optional[str]
+
+
+def _decimal(value) -> Optional[Decimal]:
+    try:
+        return Decimal(str(value)) if value is not None else None
+    except InvalidOperation:
+        return None
+
+
+def mpesa_result_status(code) -> PaymentTransactionStatus:
+    """Map an STK result code (callback or STK query) to a payment status"""
+    try:
+        code = int(code)
+    except (TypeError, ValueError):
+        return PaymentTransactionStatus.FAILED
+    if code == 0:
+        return PaymentTransactionStatus.COMPLETED
+    if code in MPESA_CANCELLED_CODES:
+        return PaymentTransactionStatus.CANCELLED
+    return PaymentTransactionStatus.FAILED
+
+
+def check_amount(status: PaymentTransactionStatus, failure_reason: Optional[str], paid: Optional[Decimal], due: Decimal):
+    """Turn a completed payment for less than was due into a failure; returns (status, failure_reason)"""
+    if status == PaymentTransactionStatus.COMPLETED and paid is not None and paid < due:
+        return PaymentTransactionStatus.FAILED, f"Paid {paid} but {due} was due"
+    return status, failure_reason
+
+
+def _object(value) -> dict:
+    """A JSON object, or {} for anything else (missing, null, list, string...)"""
+    return value if isinstance(value, dict) else {}
+
+
+def _text(value) -> Optional[str]:
+    """A payload value as a string, so ids are always compared as the text they are stored as"""
+    return str(value) if value is not None else None
+
+
+def _mpesa_callback(payload: dict) -> dict:
+    return _object(_object(payload.get("Body")).get("stkCallback"))
+
+
+def mpesa_event(payload: dict) -> WebhookEvent:
+    """Identify an STK callback; raises ValueError when it is not one"""
+    callback = _mpesa_callback(payload)
+    if not callback:
+        raise ValueError("Missing Body.stkCallback object")
+    return WebhookEvent("stk_callback", _text(callback.get("CheckoutRequestID")))
+
+
+def flutterwave_event(payload: dict) -> WebhookEvent:
+    """Identify a Flutterwave event; raises ValueError when its data is not an object"""
+    data = payload.get("data")
+    if data is not None and not isinstance(data, dict):
+        raise ValueError("data must be an object")
+    return WebhookEvent(str(payload.get("event", "unknown")), _text(_object(data).get("id")))
+
+
+def mpesa_outcome(payload: dict) -> Outcome:
+    callback = _mpesa_callback(payload)
+    metadata = _object(callback.get("CallbackMetadata")).get("Item")
+    items = {
+        item.get("Name"): item.get("Value")
+        for item in map(_object, metadata if isinstance(metadata, list) else [])
+    }
+    status = mpesa_result_status(callback.get("ResultCode"))
+    return Outcome(
+        payment_reference=None,
+        checkout_id=_text(callback.get("CheckoutRequestID")),
+        status=status,
+        provider_transaction_id=_text(items.get("MpesaReceiptNumber")),
+        amount=_decimal(items.get("Amount")),
+        failure_reason=None if status == PaymentTransactionStatus.COMPLETED else _text(callback.get("ResultDesc")),
+    )
+
+
+def flutterwave_outcome(payload: dict) -> Outcome:
+    data = _object(payload.get("data"))
+    status = {
+        "successful": PaymentTransactionStatus.COMPLETED,
+        "failed": PaymentTransactionStatus.FAILED,
+        "cancelled": PaymentTransactionStatus.CANCELLED,
+    }.get(str(data.get("status", "")).lower())
+    return Outcome(
+        payment_reference=_text(data.get("tx_ref")),
+        checkout_id=None,
+        status=status,
+        provider_transaction_id=_text(data.get("id")),
+        amount=_decimal(data.get("amount")),
+        failure_reason=_text(data.get("processor_response")) if status != PaymentTransactionStatus.COMPLETED else None,
+    )
+
+
+OUTCOME_PARSERS = {
+    PaymentProvider.MPESA: mpesa_outcome,
+    PaymentProvider.FLUTTERWAVE: flutterwave_outcome,
+}
+
+
+class WebhookWorker:
+    def __init__(self, batch_size: int, poll_interval: float):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wake = asyncio.Event()
+
+    def notify(self):
+        """Wake the worker now instead of at the next poll"""
+        self._wake.set()
+
+    async def store(self, db: AsyncSession, provider: PaymentProvider, event: WebhookEvent, payload: dict) -> bool:
+        """Persist a callback in one statement; returns False when it is a retry of one already stored"""
+        result = await db.execute(
+            insert(PaymentWebhook)
+            .values(
+                provider=provider,
+                event_type=event.event_type,
+                provider_transaction_id=event.provider_transaction_id,
+                payload=payload,
+            )
+            .on_conflict_do_nothing(index_elements=["provider", "provider_transaction_id"])
+            .returning(PaymentWebhook.id)
+        )
+        stored = result.first() is not None
+        await db.commit()
+        if stored:
+            webhooks_received.inc()
+            self.notify()
+        else:
+            webhooks_duplicate.inc()
+        return stored
+
+    async def process_batch(self, db: AsyncSession) -> int:
+        """Apply up to batch_size unprocessed callbacks; caller commits. Returns the number of rows taken."""
+        result = await db.execute(
+            select(PaymentWebhook)
+            .filter(PaymentWebhook.processed == False)
+            .order_by(PaymentWebhook.created_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        webhooks = result.scalars().all()
+        if not webhooks:
+            return 0
+
+        outcomes = [self._parse(webhook) for webhook in webhooks]
+        payments = await self._load_payments(db, [outcome for outcome in outcomes if outcome is not None])
+        by_reference = {payment.payment_reference: payment for payment in payments}
+        by_checkout = {payment.provider_transaction_id: payment for payment in payments if payment.provider_transaction_id}
+
+        seats_changed = False
+        settled = []
+        for webhook, outcome in zip(webhooks, outcomes):
+            webhook.processed = True
+            if outcome is None:
+                continue
+            payment = by_reference.get(outcome.payment_reference) or by_checkout.get(outcome.checkout_id)
+            if payment is None:
+                webhook.processing_error = "No matching payment"
+                webhooks_failed.inc()
+                continue
+            webhook.payment_id = payment.id
+            if outcome.status is None or payment.status in FINAL_STATUSES:
+                # Interim event, or a later callback for a payment already settled
+                webhooks_processed.inc()
+                continue
+            # One savepoint per row: a row that cannot be applied is marked failed instead of
+            # rolling back the batch (which would be taken again, oldest first, forever)
+            booking, webhook_id = payment.booking, webhook.id
+            try:
+                async with db.begin_nested():
+                    seats_changed |= await self._apply(db, payment, outcome, webhook)
+            except Exception as exc:
+                logger.exception("Failed to apply payment webhook %s", webhook_id)
+                # The rollback expired what the row changed; reload it for later rows in the batch
+                await db.refresh(payment)
+                await db.refresh(booking)
+                webhook.processed = True
+                webhook.processing_error = f"{type(exc).__name__}: {exc}"
+                webhooks_failed.inc()
+                continue
+            settled.append(payment.payment_reference)
+            webhooks_processed.inc()
+
+        await notify_payment_changes(db, settled)
+        if seats_changed:
+            catalog_cache.invalidate("sessions")
+        return len(webhooks)
+
+    def _parse(self, webhook: PaymentWebhook) -> Optional[Outcome]:
+        """What a stored callback says, or None (recorded on the row) when it cannot be read"""
+        try:
+            return OUTCOME_PARSERS[webhook.provider](webhook.payload)
+        except Exception as exc:
+            logger.exception("Unreadable payment webhook %s", webhook.id)
+            webhook.processing_error = f"Unreadable payload: {type(exc).__name__}: {exc}"
+            webhooks_failed.inc()
+            return None
+
+    async def _load_payments(self, db: AsyncSession, outcomes: List[Outcome]) -> List[Payment]:
+        """Load and lock the payments (and their bookings) the callbacks refer to, in id order"""
+        references = {o.payment_reference for o in outcomes if o.payment_reference}
+        checkout_ids = {o.checkout_id for o in outcomes if o.checkout_id}
+        if not references and not checkout_ids:
+            return []
+        # The lock makes reconciliation, cancellation and other workers wait for this batch, and the
+        # FINAL_STATUSES check in process_batch then sees any settlement they committed first
+        result = await db.execute(
+            select(Payment)
+            .join(Payment.booking)
+            .options(contains_eager(Payment.booking))
+            .filter(or_(Payment.payment_reference.in_(references), Payment.provider_transaction_id.in_(checkout_ids)))
+            .order_by(Payment.id)
+            .with_for_update(of=(Payment, Booking))
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().all()
+
+    async def _apply(self, db: AsyncSession, payment: Payment, outcome: Outcome, webhook: PaymentWebhook) -> bool:
+        status, failure_reason = check_amount(outcome.status, outcome.failure_reason, outcome.amount, payment.amount)
+
+        payment.status = status
+        payment.completed_at = datetime.now(timezone.utc)
+        payment.failure_reason = failure_reason
+        payment.provider_response = webhook.payload
+        if outcome.provider_transaction_id and payment.provider != PaymentProvider.MPESA:
+            # M-Pesa payments are matched on the CheckoutRequestID kept here; the receipt stays in the payload
+            payment.provider_transaction_id = outcome.provider_transaction_id
+
+        paid = status == PaymentTransactionStatus.COMPLETED
+        if not await complete_booking_payment(db, payment.booking, paid):
+            webhook.processing_error = REFUND_REQUIRED
+            logger.warning("Payment %s needs a refund: booking cancelled or session full", payment.payment_reference)
+        return True
+
+    async def drain(self) -> int:
+        """Process batches until no unprocessed callbacks are left; returns the number of rows handled"""
+        total = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                taken = await self.process_batch(db)
+                await db.commit()
+            total += taken
+            if taken < self.batch_size:
+                return total
+
+    async def run(self):
+        """Background loop: drain on notification or every poll_interval"""
+        while True:
+            self._wake.clear()
+            try:
+                await self.drain()
+            except Exception:
+                logger.exception("Failed to process payment webhooks")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+webhook_worker = WebhookWorker(batch_size=settings.WEBHOOK_BATCH_SIZE, poll_interval=settings.WEBHOOK_POLL_SECONDS)
@@ -0,0 +1,59 @@
+"""
+Concurrency benchmark - blocking sync sessions vs AsyncSession on one event loop
+
+Simulates N concurrent requests that each run a query taking --query-ms on the
+database. The "sync" run issues the query through SessionLocal from inside a
+coroutine (how the endpoints used to work), the "async" run uses AsyncSessionLocal.
+
+Usage:
+    python -m scripts.bench_async_db --requests 50 --query-ms 50
+"""
+import argparse
+import asyncio
+import time
+from sqlalchemy import text
+from app.core.database import SessionLocal, AsyncSessionLocal, async_engine, engine
+
+
+async def sync_request(delay: float):
+    """Handler body using a blocking session (stalls the event loop)"""
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT pg_sleep(:d)"), {"d": delay})
+    finally:
+        db.close()
+
+
+async def async_request(delay: float):
+    """Handler body using an async session (yields while waiting on the database)"""
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SELECT pg_sleep(:d)"), {"d": delay})
+
+
+async def run(handler, requests: int, delay: float) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(delay) for _ in range(requests)))
+    return time.perf_counter() - start
+
+
+async def main(requests: int, query_ms: int):
+    delay = query_ms / 1000
+    # Warm both pools so connection setup is not measured
+    await run(sync_request, 1, 0)
+    await run(async_request, min(requests, 10), 0)
+
+    print(f"{requests} concurrent requests, {query_ms}ms query each")
+    for name, handler in (("sync (before)", sync_request), ("async (after)", async_request)):
+        elapsed = await run(handler, requests, delay)
+        print(f"  {name:<14} {elapsed:7.3f}s  {requests / elapsed:8.1f} req/s")
+
+    await async_engine.dispose()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--query-ms", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.query_ms))
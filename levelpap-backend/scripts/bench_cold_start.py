@@ -0,0 +1,110 @@
+"""
+Cold-start benchmark - import time and time to first response
+
+Imports app.main under `python -X importtime` and lists the packages that cost
+the most, then starts the server the way start.sh does (gunicorn --preload with
+uvicorn workers) and measures how long it takes from spawning the process to
+the first successful response. Exits non-zero when the median time to first
+response is over --budget, so it can run in CI to keep cold starts in check.
+
+Usage:
+    python -m scripts.bench_cold_start --runs 5 --budget 4
+    python -m scripts.bench_cold_start --url /api/courses --server uvicorn
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+import httpx
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(top: int):
+    """Print total import time of app.main and the most expensive top-level packages (self time)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, check=True,
+    )
+    by_package = defaultdict(int)
+    total = 0
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = match.groups()
+        by_package[module.split(".")[0]] += int(self_us)
+        if module == "app.main":
+            total = int(cumulative_us)
+    print(f"import app.main: {total / 1000:.0f} ms")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<24} {self_us / 1000:7.1f} ms")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_command(server: str, port: int, workers: int, preload: bool):
+    if server == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+    return [
+        sys.executable, "-m", "gunicorn", "app.main:app",
+        "--workers", str(workers), *(["--preload"] if preload else []),
+        "--worker-class", "uvicorn.workers.UvicornWorker",
+        "--bind", f"127.0.0.1:{port}", "--log-level", "critical",
+    ]
+
+
+def time_to_first_response(server: str, url: str, workers: int, preload: bool, timeout: float) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(server_command(server, port, workers, preload), env=os.environ.copy())
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            while time.perf_counter() - started < timeout:
+                if process.poll() is not None:
+                    raise RuntimeError(f"server exited with code {process.returncode}")
+                try:
+                    if client.get(url).status_code < 500:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError(f"no response from {url} within {timeout:.0f}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(runs: int, budget: float, url: str, server: str, workers: int, preload: bool, top: int) -> int:
+    import_profile(top)
+
+    timings = [time_to_first_response(server, url, workers, preload, timeout=budget * 5) for _ in range(runs)]
+    median = statistics.median(timings)
+    print(f"\n{server} time to first response ({url}, {runs} runs): median {median * 1000:.0f} ms, "
+          f"min {min(timings) * 1000:.0f} ms, max {max(timings) * 1000:.0f} ms (budget {budget * 1000:.0f} ms)")
+    if median > budget:
+        print("Cold start is over budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=4.0, help="seconds allowed to the first response")
+    parser.add_argument("--url", default="/health")
+    parser.add_argument("--server", choices=["gunicorn", "uvicorn"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--no-preload", dest="preload", action="store_false", help="gunicorn without --preload, for comparison")
+    parser.add_argument("--top", type=int, default=10, help="packages to list from the import profile")
+    args = parser.parse_args()
+    sys.exit(main(args.runs, args.budget, args.url, args.server, args.workers, args.preload, args.top))
@@ -0,0 +1,154 @@
+"""
+Payment status benchmark - client polling vs long-polling with ?wait=
+
+Starts the app in-process and seeds --clients M-Pesa payments awaiting their
+callback (see scripts/bench_reconcile.py). Each client then waits for its
+payment to settle while its callback arrives after a random 5-20 s (the time
+a customer takes to answer the STK prompt), two ways:
+
+  poll       GET /payments/status every --interval seconds until it settles
+  long-poll  GET /payments/status?wait=PAYMENT_STATUS_MAX_WAIT_SECONDS, repeated
+             until it settles
+
+Reports the status requests and statements (X-DB-Queries) spent per payment
+and how long after its callback each client saw the result.
+
+Usage:
+    python -m scripts.bench_long_poll --clients 100 --interval 1
+"""
+import argparse
+import asyncio
+import random
+import secrets
+import statistics
+import time
+import httpx
+import uvicorn
+from sqlalchemy import delete, select, update
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, async_engine
+from app.core.enums import PaymentProvider, UserRole
+from app.core.security import create_access_token, token_claims
+from app.main import app
+from app.models import Booking, Payment, PaymentWebhook, Session, User
+from scripts import bench_reconcile
+from scripts.bench_reconcile import TAG, seed
+
+PORT = 9073
+
+
+async def admin_token() -> str:
+    """Token for a seeded user promoted to admin, so it may read every seeded payment"""
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(
+            update(User).where(User.email.like(f"{TAG}-%")).values(role=UserRole.ADMIN).returning(User)
+        )).scalars().first()
+        await db.commit()
+    return create_access_token(token_claims(user))
+
+
+async def cleanup(course_ids):
+    """Remove the stored callbacks, then the seeded rows"""
+    async with AsyncSessionLocal() as db:
+        sessions = select(Session.id).where(Session.course_id.in_(course_ids))
+        payments = select(Payment.id).join(Booking).where(Booking.session_id.in_(sessions))
+        await db.execute(delete(PaymentWebhook).where(PaymentWebhook.payment_id.in_(payments)))
+        await db.commit()
+    await bench_reconcile.cleanup(course_ids)
+
+
+def callback(payment) -> dict:
+    return {"Body": {"stkCallback": {
+        "MerchantRequestID": "bench", "CheckoutRequestID": payment.provider_transaction_id,
+        "ResultCode": 0, "ResultDesc": "The service request is processed successfully.",
+        "CallbackMetadata": {"Item": [
+            {"Name": "Amount", "Value": float(payment.amount)},
+            {"Name": "MpesaReceiptNumber", "Value": secrets.token_hex(5).upper()},
+        ]},
+    }}}
+
+
+async def run_variant(client: httpx.AsyncClient, payments, delays, wait: float, interval: float) -> dict:
+    counts = {"requests": 0, "statements": 0, "shed": 0, "callbacks shed": 0}
+    seen_after = []
+
+    async def customer(payment, delay):
+        await asyncio.sleep(delay)
+        url = f"/api/payments/webhooks/mpesa?token={settings.MPESA_CALLBACK_TOKEN}"
+        # Providers retry callbacks that are not acknowledged
+        while (response := await client.post(url, json=callback(payment))).status_code == 503:
+            counts["callbacks shed"] += 1
+            await asyncio.sleep(1)
+        response.raise_for_status()
+        return time.perf_counter()
+
+    async def watch(payment, delay):
+        settled = asyncio.create_task(customer(payment, delay))
+        params = {"ref": payment.payment_reference}
+        if wait:
+            params["wait"] = wait
+        # Clients start checking out at different times
+        await asyncio.sleep(random.uniform(0, interval))
+        while True:
+            response = await client.get("/api/payments/status", params=params)
+            counts["requests"] += 1
+            counts["statements"] += int(response.headers.get("x-db-queries", 0))
+            if response.status_code == 503:
+                counts["shed"] += 1
+            elif response.json()["status"] != "processing":
+                break
+            if not wait or response.status_code == 503:
+                await asyncio.sleep(interval)
+        seen_after.append(time.perf_counter() - await settled)
+
+    await asyncio.gather(*(watch(payment, delay) for payment, delay in zip(payments, delays)))
+    seen_after.sort()
+    return {**counts, "p50": statistics.median(seen_after), "p95": seen_after[int(len(seen_after) * 0.95)]}
+
+
+async def main(clients: int, interval: float):
+    settings.MPESA_CALLBACK_TOKEN = settings.MPESA_CALLBACK_TOKEN or secrets.token_urlsafe(16)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=PORT, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    rng = random.Random(7)
+    delays = [rng.uniform(5, 20) for _ in range(clients)]
+    print(f"{clients} payments, callbacks after 5-20 s, poll interval {interval:g} s, "
+          f"long-poll wait {settings.PAYMENT_STATUS_MAX_WAIT_SECONDS:g} s")
+    print(f"{'client':<10} {'requests':>9} {'per payment':>12} {'shed (503)':>11} {'callbacks shed':>15} {'statements':>11} "
+          f"{'seen p50 ms':>12} {'seen p95 ms':>12}")
+    course_ids = []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=60,
+                                     limits=httpx.Limits(max_connections=clients * 2)) as client:
+            for name, wait in (("poll", 0), ("long-poll", settings.PAYMENT_STATUS_MAX_WAIT_SECONDS)):
+                # Seed two payments per client; only the M-Pesa half is used
+                course_ids.append(await seed(clients * 2))
+                async with AsyncSessionLocal() as db:
+                    payments = (await db.execute(
+                        select(Payment).join(Booking).join(Session)
+                        .where(Session.course_id == course_ids[-1], Payment.provider == PaymentProvider.MPESA)
+                        .limit(clients)
+                    )).scalars().all()
+                client.headers["Authorization"] = f"Bearer {await admin_token()}"
+                result = await run_variant(client, payments, delays, wait, interval)
+                print(f"{name:<10} {result['requests']:9d} {result['requests'] / clients:12.1f} {result['shed']:11d} "
+                      f"{result['callbacks shed']:15d} {result['statements']:11d} "
+                      f"{result['p50'] * 1000:12.0f} {result['p95'] * 1000:12.0f}")
+                await cleanup(course_ids)
+                course_ids = []
+    finally:
+        await cleanup(course_ids)
+        server.should_exit = True
+        await serving
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--interval", type=float, default=1, help="seconds between polls")
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.interval))
@@ -0,0 +1,106 @@
+"""
+Provider client benchmark - per-payment connections and OAuth vs the pooled client
+
+Starts scripts/stub_providers.py in-process with --latency-ms per call and
+sends --payments STK pushes, --concurrency at a time, two ways:
+
+  per-request  a new httpx.AsyncClient per payment that fetches an OAuth token
+               and then pushes (one new connection and two provider round trips)
+  pooled       app.services.payments.mpesa_client: kept-alive connections and
+               a cached token (one round trip per payment)
+
+Reports p50/p95 latency per payment, and the connections and tokens the stub
+saw. Localhost has no TLS handshake or WAN round trip, so against the real
+Daraja API the gap is larger than shown here.
+
+Usage:
+    python -m scripts.bench_providers --payments 200 --concurrency 10 --latency-ms 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from decimal import Decimal
+import httpx
+import uvicorn
+from app.core.config import settings
+from app.services.payments.mpesa import MpesaClient
+from scripts.stub_providers import build_app
+
+PORT = 9071
+
+
+async def per_request_push(base_url: str, phone: str, amount: Decimal):
+    async with httpx.AsyncClient(base_url=base_url, timeout=10) as client:
+        token = (await client.get(
+            "/oauth/v1/generate",
+            params={"grant_type": "client_credentials"},
+            auth=(settings.MPESA_CONSUMER_KEY, settings.MPESA_CONSUMER_SECRET),
+        )).json()["access_token"]
+        response = await client.post(
+            "/mpesa/stkpush/v1/processrequest",
+            json={"PhoneNumber": phone, "Amount": int(amount), "CallBackURL": "http://bench/cb"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        response.raise_for_status()
+
+
+async def run_variant(push, payments: int, concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    timings = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await push()
+            timings.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(payments)))
+    return timings
+
+
+async def stats(base_url: str) -> dict:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        return (await client.get("/stats")).json()
+
+
+async def main(payments: int, concurrency: int, latency_ms: float):
+    settings.MPESA_CONSUMER_KEY = settings.MPESA_CONSUMER_KEY or "bench-key"
+    settings.MPESA_CONSUMER_SECRET = settings.MPESA_CONSUMER_SECRET or "bench-secret"
+    base_url = f"http://127.0.0.1:{PORT}"
+    amount = Decimal("4500")
+
+    print(f"{payments} STK pushes, {concurrency} concurrent, stub latency {latency_ms:.0f} ms per call")
+    print(f"{'client':<12} {'p50 ms':>8} {'p95 ms':>8} {'payments/s':>11} {'connections':>12} {'tokens':>7}")
+    pooled = MpesaClient(base_url=base_url, timeout=10, refresh_margin=settings.MPESA_TOKEN_REFRESH_MARGIN_SECONDS)
+    variants = (
+        ("per-request", lambda: per_request_push(base_url, "254700000000", amount)),
+        ("pooled", lambda: pooled.stk_push("0700000000", amount, "BENCH")),
+    )
+    for name, push in variants:
+        # Fresh stub per variant so its connection and token counts are per variant
+        server = uvicorn.Server(uvicorn.Config(build_app(latency_ms / 1000), host="127.0.0.1", port=PORT, log_level="warning"))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.01)
+        try:
+            started = time.perf_counter()
+            timings = await run_variant(push, payments, concurrency)
+            elapsed = time.perf_counter() - started
+            seen = await stats(base_url)
+        finally:
+            await pooled.close()
+            server.should_exit = True
+            await serving
+        timings.sort()
+        print(f"{name:<12} {statistics.median(timings) * 1000:8.1f} {timings[int(len(timings) * 0.95)] * 1000:8.1f} "
+              f"{payments / elapsed:11.1f} {seen['connections']:12d} {seen['tokens_issued']:7d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--payments", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.payments, args.concurrency, args.latency_ms))
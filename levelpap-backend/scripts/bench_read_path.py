@@ -0,0 +1,131 @@
+"""
+Read-path benchmark - ORM instances vs plain rows for large list queries
+
+Inserts --rows courses and --rows sessions (removed again at the end) and
+renders each set as a list response two ways:
+
+  orm   select(Model) -> ORM instances in the identity map -> render_json
+  rows  select_rows(Model, Schema) -> plain rows -> row_dicts -> render_json
+
+Reports fetch (query + hydration) and render time, rows/sec and peak Python
+memory (tracemalloc) per path. Run against the database in DATABASE_URL.
+
+Usage:
+    python -m scripts.bench_read_path --rows 10000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+import uuid
+from datetime import date, time as clock
+from typing import List
+from sqlalchemy import delete, insert, select
+from app.core.database import AsyncSessionLocal
+from app.core.enums import Audience, CourseCategory
+from app.core.rows import row_dicts, select_rows
+from app.core.serialization import render_json
+from app.models import Course, Session
+from app.schemas import CourseResponse, SessionResponse
+
+TAG = "bench-read-path"
+
+
+async def seed(rows: int) -> uuid.UUID:
+    course_id = uuid.uuid4()
+    courses = [{
+        "id": course_id if i == 0 else uuid.uuid4(),
+        "title": f"{TAG} {i}",
+        "category": CourseCategory.ROBOTICS,
+        "audience": Audience.KIDS,
+        "description": "Hands-on robotics course covering sensors, actuators and control loops. " * 4,
+        "duration_weeks": 8,
+        "price": 4500,
+        "syllabus": [f"Week {week}" for week in range(1, 9)],
+        "is_published": False,
+        "is_active": True,
+    } for i in range(rows)]
+    sessions = [{
+        "id": uuid.uuid4(),
+        "course_id": course_id,
+        "date": date(2030, 1, 1),
+        "start_time": clock(9),
+        "location": TAG,
+        "capacity": 30,
+        "seats_booked": 12,
+        "seats_held": 3,
+    } for _ in range(rows)]
+    async with AsyncSessionLocal() as db:
+        for start in range(0, rows, 2000):
+            await db.execute(insert(Course), courses[start:start + 2000])
+        for start in range(0, rows, 2000):
+            await db.execute(insert(Session), sessions[start:start + 2000])
+        await db.commit()
+    return course_id
+
+
+async def cleanup(course_id: uuid.UUID):
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Session).where(Session.course_id == course_id))
+        await db.execute(delete(Course).where(Course.title.like(f"{TAG} %")))
+        await db.commit()
+
+
+async def orm_path(model, schema, criteria) -> tuple:
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        items = (await db.execute(select(model).where(criteria))).scalars().all()
+        fetched = time.perf_counter()
+        body = render_json(List[schema], items)
+        return len(items), fetched - started, time.perf_counter() - fetched, len(body)
+
+
+async def rows_path(model, schema, criteria) -> tuple:
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        rows = (await db.execute(select_rows(model, schema).where(criteria))).all()
+        fetched = time.perf_counter()
+        body = render_json(List[schema], row_dicts(rows))
+        return len(rows), fetched - started, time.perf_counter() - fetched, len(body)
+
+
+async def measure(path, model, schema, criteria, repeat: int) -> dict:
+    await path(model, schema, criteria)  # warm-up: pool, compiled statement, validators
+    timings = []
+    for _ in range(repeat):
+        timings.append(await path(model, schema, criteria))
+    tracemalloc.start()
+    await path(model, schema, criteria)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = timings[0][0]
+    fetch = statistics.median(t[1] for t in timings)
+    render = statistics.median(t[2] for t in timings)
+    return {"count": count, "fetch": fetch, "render": render, "peak": peak, "bytes": timings[0][3]}
+
+
+async def main(rows: int, repeat: int):
+    course_id = await seed(rows)
+    try:
+        print(f"{rows}-row list queries, median of {repeat} runs")
+        print(f"{'query':<10} {'path':<5} {'fetch ms':>9} {'render ms':>10} {'rows/s':>9} {'peak MiB':>9}")
+        for label, model, schema, criteria in (
+            ("courses", Course, CourseResponse, Course.title.like(f"{TAG} %")),
+            ("sessions", Session, SessionResponse, Session.course_id == course_id),
+        ):
+            for name, path in (("orm", orm_path), ("rows", rows_path)):
+                result = await measure(path, model, schema, criteria, repeat)
+                total = result["fetch"] + result["render"]
+                print(f"{label:<10} {name:<5} {result['fetch'] * 1000:9.1f} {result['render'] * 1000:10.1f} "
+                      f"{result['count'] / total:9.0f} {result['peak'] / 2 ** 20:9.1f}")
+    finally:
+        await cleanup(course_id)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
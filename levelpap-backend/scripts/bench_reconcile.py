@@ -0,0 +1,180 @@
+"""
+Reconciliation benchmark - batched bulk UPDATEs vs one transaction per payment
+
+Seeds --payments stale PROCESSING payments (half M-Pesa, half Flutterwave)
+with pending bookings holding seats, starts scripts/stub_providers.py
+in-process with its result mix and --latency-ms per call, and runs
+reconcile_payments() over them. Then seeds --per-row more and applies the
+same provider results one payment per transaction (load payment and booking,
+update, complete_booking_payment, commit) for comparison. Checks afterwards
+that every session's seat counters still match its bookings, and removes the
+seeded rows.
+
+Usage:
+    python -m scripts.bench_reconcile --payments 20000 --per-row 2000
+"""
+import argparse
+import asyncio
+import secrets
+import time
+import uuid
+from datetime import date, datetime, timedelta, time as clock, timezone
+from decimal import Decimal
+import uvicorn
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import joinedload
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, async_engine
+from app.core.enums import Audience, CourseCategory, PaymentProvider, PaymentStatus, PaymentTransactionStatus
+from app.core.query_stats import track_queries
+from app.models import Booking, Course, Payment, Session, User
+from app.services.payments import close_clients, flutterwave_client, mpesa_client
+from app.services.reconciliation import ReconcileReport, query_provider, reconcile_payments, stale_payments
+from app.services.seats import complete_booking_payment, recompute_seat_counters
+from scripts.stub_providers import build_app
+
+TAG = "bench-reconcile"
+PORT = 9072
+SESSIONS = 200
+
+
+async def seed(payments: int) -> uuid.UUID:
+    """Insert a course, SESSIONS sessions and `payments` held bookings with open payments; returns the course id"""
+    course_id = uuid.uuid4()
+    # One booking per user and session, so a user per round of SESSIONS bookings
+    user_ids = [uuid.uuid4() for _ in range(payments // SESSIONS + 1)]
+    session_ids = [uuid.uuid4() for _ in range(SESSIONS)]
+    initiated = datetime.now(timezone.utc) - timedelta(hours=1)
+    bookings, rows = [], []
+    for i in range(payments):
+        booking_id = uuid.uuid4()
+        mpesa = i % 2 == 0
+        bookings.append({
+            "id": booking_id, "user_id": user_ids[i // SESSIONS], "session_id": session_ids[i % SESSIONS], "seats": 1,
+            "payment_status": PaymentStatus.PENDING, "total_amount": Decimal("4500"),
+            "hold_expires_at": datetime.now(timezone.utc) + timedelta(hours=1),
+        })
+        rows.append({
+            "id": uuid.uuid4(), "booking_id": booking_id, "amount": Decimal("4500"), "currency": "KES",
+            "provider": PaymentProvider.MPESA if mpesa else PaymentProvider.FLUTTERWAVE,
+            "payment_reference": f"{'MPESA' if mpesa else 'FLW'}_{secrets.token_hex(8).upper()}",
+            "provider_transaction_id": f"ws_CO_{secrets.token_hex(8)}" if mpesa else None,
+            "status": PaymentTransactionStatus.PROCESSING, "initiated_at": initiated,
+        })
+    held = len(user_ids)
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(User), [
+            {"id": user_id, "email": f"{TAG}-{user_id}@example.com", "password_hash": "x", "name": TAG} for user_id in user_ids
+        ])
+        await db.execute(insert(Course), [{
+            "id": course_id, "title": TAG, "category": CourseCategory.AI, "audience": Audience.ADULTS,
+            "description": TAG, "syllabus": [], "is_published": False, "is_active": True,
+        }])
+        await db.execute(insert(Session), [{
+            "id": session_id, "course_id": course_id, "date": date(2030, 1, 1), "start_time": clock(9),
+            "location": TAG, "capacity": 10 * held, "seats_booked": 0,
+            "seats_held": sum(1 for b in bookings if b["session_id"] == session_id),
+        } for session_id in session_ids])
+        for start in range(0, payments, 2000):
+            await db.execute(insert(Booking), bookings[start:start + 2000])
+            await db.execute(insert(Payment), rows[start:start + 2000])
+        await db.commit()
+    return course_id
+
+
+async def cleanup(course_ids):
+    async with AsyncSessionLocal() as db:
+        sessions = select(Session.id).where(Session.course_id.in_(course_ids))
+        bookings = select(Booking.id).where(Booking.session_id.in_(sessions))
+        await db.execute(delete(Payment).where(Payment.booking_id.in_(bookings)))
+        await db.execute(delete(Booking).where(Booking.session_id.in_(sessions)))
+        await db.execute(delete(Session).where(Session.course_id.in_(course_ids)))
+        await db.execute(delete(Course).where(Course.id.in_(course_ids)))
+        await db.execute(delete(User).where(User.email.like(f"{TAG}-%")))
+        await db.commit()
+
+
+async def per_row(count: int, concurrency: int):
+    """The same work with one transaction per payment"""
+    cutoff = datetime.now(timezone.utc)
+    async with AsyncSessionLocal() as db:
+        payments = await stale_payments(db, cutoff, None, count)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check(payment):
+        async with semaphore:
+            return await query_provider(payment)
+
+    started = time.perf_counter()
+    results = [r for r in await asyncio.gather(*(check(p) for p in payments)) if r is not None]
+    queried = time.perf_counter()
+    with track_queries() as stats:
+        for result in results:
+            async with AsyncSessionLocal() as db:
+                payment = (await db.execute(
+                    select(Payment).options(joinedload(Payment.booking)).where(Payment.id == result.payment_id)
+                )).scalars().one()
+                payment.status = result.status
+                payment.completed_at = datetime.now(timezone.utc)
+                payment.failure_reason = result.failure_reason
+                payment.provider_response = result.provider_response
+                await complete_booking_payment(db, payment.booking, result.status == PaymentTransactionStatus.COMPLETED)
+                await db.commit()
+    applied = time.perf_counter()
+    print(f"  per-row  {len(payments):6d} checked  provider {queried - started:6.1f}s  apply {applied - queried:6.2f}s "
+          f"({len(results) / (applied - queried):6.0f} payments/s, {len(results)} transactions, {stats.count} statements)")
+
+
+async def main(payments: int, per_row_count: int, concurrency: int, batch_size: int, latency_ms: float):
+    settings.MPESA_CONSUMER_KEY = settings.MPESA_CONSUMER_KEY or "bench-key"
+    settings.MPESA_CONSUMER_SECRET = settings.MPESA_CONSUMER_SECRET or "bench-secret"
+    mpesa_client.base_url = flutterwave_client.base_url = f"http://127.0.0.1:{PORT}"
+    server = uvicorn.Server(uvicorn.Config(
+        build_app(latency_ms / 1000, result_mix=True), host="127.0.0.1", port=PORT, log_level="warning"
+    ))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    course_ids = []
+    try:
+        print(f"{payments} stale payments, batches of {batch_size}, {concurrency} provider calls in flight, "
+              f"stub latency {latency_ms:.0f} ms")
+        course_ids.append(await seed(payments))
+        with track_queries() as stats:
+            report: ReconcileReport = await reconcile_payments(
+                older_than=timedelta(minutes=1), expire_after=timedelta(days=1),
+                batch_size=batch_size, concurrency=concurrency,
+            )
+        print(report.summary())
+        applied = sum(report.apply_seconds)
+        settled = sum(count for name, count in report.outcomes.items() if name in ("completed", "failed", "cancelled"))
+        print(f"  bulk     apply {applied:.2f}s ({settled / applied:.0f} payments/s, "
+              f"{len(report.apply_seconds)} transactions, {stats.count} statements in total)")
+
+        if per_row_count:
+            await cleanup(course_ids)
+            course_ids = [await seed(per_row_count)]
+            await per_row(per_row_count, concurrency)
+
+        async with AsyncSessionLocal() as db:
+            corrected = await recompute_seat_counters(db)
+            await db.rollback()
+        print(f"  seat counters out of line with bookings: {corrected}")
+    finally:
+        await cleanup(course_ids)
+        await close_clients()
+        server.should_exit = True
+        await serving
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--payments", type=int, default=20000)
+    parser.add_argument("--per-row", type=int, default=2000, help="payments for the per-row comparison (0 to skip)")
+    parser.add_argument("--concurrency", type=int, default=settings.PAYMENT_RECONCILE_CONCURRENCY)
+    parser.add_argument("--batch-size", type=int, default=settings.PAYMENT_RECONCILE_BATCH_SIZE)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.payments, args.per_row, args.concurrency, args.batch_size, args.latency_ms))
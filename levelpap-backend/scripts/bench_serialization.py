@@ -0,0 +1,134 @@
+"""
+Serialization microbenchmark - 100-item list responses, requests/sec per core
+
+Serves the same 100 in-memory ORM rows (courses with syllabus arrays, sessions,
+trainers) through three response paths on one core and reports requests/sec:
+
+  response_model  return ORM objects and let FastAPI validate, serialize to
+                  Python objects and encode with the stdlib json module
+  respond         app.core.serialization.respond(): validate once from the ORM
+                  attributes and encode to bytes in pydantic-core
+  orjson          validate once to Python objects, encode with orjson
+                  (only when orjson is installed)
+
+Requests go straight into the ASGI app (no sockets), so the numbers are the
+framework + serialization cost per request. No database is needed.
+
+Usage:
+    python -m scripts.bench_serialization --seconds 3 --items 100
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import date, datetime, time as clock, timezone
+from decimal import Decimal
+from typing import List
+from fastapi import FastAPI
+from app.core.enums import Audience, CourseCategory, SessionStatus
+from app.core.serialization import get_adapter, respond
+from app.models import Course, Session, Trainer
+from app.schemas import CourseResponse, SessionResponse, TrainerResponse
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+except ImportError:
+    orjson = None
+
+
+def make_rows(items: int) -> dict:
+    now = datetime.now(timezone.utc)
+    courses = [Course(
+        id=uuid.uuid4(), title=f"Applied Robotics {i}", category=CourseCategory.ROBOTICS, audience=Audience.KIDS,
+        description="Hands-on robotics course covering sensors, actuators and control loops. " * 4,
+        duration_weeks=8, price=Decimal("4500.00"), image="https://cdn.example.com/courses/robotics.png",
+        syllabus=[f"Week {week}: {topic}" for week, topic in enumerate(
+            ["Foundations", "Sensors", "Motors", "Control", "Vision", "Planning", "Integration", "Showcase"], 1)],
+        trainer_id=uuid.uuid4(), is_published=True, is_active=True, created_at=now, updated_at=now,
+    ) for i in range(items)]
+    sessions = [Session(
+        id=uuid.uuid4(), course_id=uuid.uuid4(), date=date.today(), start_time=clock(9), end_time=clock(12),
+        location="Nairobi Innovation Hub", capacity=30, seats_booked=12, seats_held=3, trainer_id=uuid.uuid4(),
+        status=SessionStatus.SCHEDULED, notes="Bring a laptop", created_at=now, updated_at=now,
+    ) for _ in range(items)]
+    trainers = [Trainer(
+        id=uuid.uuid4(), name=f"Trainer {i}", bio="Robotics engineer and educator. " * 5,
+        photo="https://cdn.example.com/trainers/photo.png", specializations=["Robotics", "Python", "AI"],
+        years_of_experience=7, certifications=["PMP", "AWS"], rating=Decimal("4.80"), total_courses_taught=12,
+        is_active=True, created_at=now, updated_at=now,
+    ) for i in range(items)]
+    return {"courses": (CourseResponse, courses), "sessions": (SessionResponse, sessions), "trainers": (TrainerResponse, trainers)}
+
+
+def build_app(rows: dict) -> FastAPI:
+    app = FastAPI()
+    for name, (schema, data) in rows.items():
+        def make_routes(schema=schema, data=data):
+            @app.get(f"/response_model/{name}", response_model=List[schema])
+            async def via_response_model():
+                return data
+
+            @app.get(f"/respond/{name}", response_model=List[schema])
+            async def via_respond():
+                return respond(List[schema], data)
+
+            if orjson is not None:
+                @app.get(f"/orjson/{name}", response_model=List[schema])
+                async def via_orjson():
+                    adapter = get_adapter(List[schema])
+                    return ORJSONResponse(adapter.dump_python(adapter.validate_python(data, from_attributes=True), mode="json"))
+
+        make_routes()
+    return app
+
+
+async def call(app: FastAPI, path: str) -> int:
+    """One GET through the ASGI app; returns the body size"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return sum(len(chunk) for chunk in body)
+
+
+async def run(seconds: float, items: int):
+    rows = make_rows(items)
+    app = build_app(rows)
+    variants = ["response_model", "respond"] + (["orjson"] if orjson is not None else [])
+    print(f"{items}-item lists, {seconds:.0f}s per run, one core\n")
+    print(f"{'endpoint':<10} {'path':<16} {'req/s':>8} {'ms/req':>8} {'bytes':>8}")
+    for name in rows:
+        baseline = None
+        for variant in variants:
+            path = f"/{variant}/{name}"
+            size = await call(app, path)  # warm-up: builds validators
+            count = 0
+            started = time.perf_counter()
+            while time.perf_counter() - started < seconds:
+                await call(app, path)
+                count += 1
+            elapsed = time.perf_counter() - started
+            rate = count / elapsed
+            baseline = baseline or rate
+            print(f"{name:<10} {variant:<16} {rate:8.0f} {elapsed / count * 1000:8.2f} {size:8d}  x{rate / baseline:.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--items", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.seconds, args.items))
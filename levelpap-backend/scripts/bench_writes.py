@@ -0,0 +1,90 @@
+"""
+Write-path benchmark - commit + refresh vs RETURNING-based save()
+
+Creates and then updates --rows trainers one request at a time. The "refresh"
+run uses the old handler pattern (load, commit on an expire-on-commit session,
+then refresh). The "returning" run creates with save() and updates with
+update_returning(), so server-generated columns come back in the
+INSERT/UPDATE ... RETURNING. Reports statements and mean latency per write.
+
+Usage:
+    python -m scripts.bench_writes --rows 200
+"""
+import argparse
+import asyncio
+import time
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.core.database import AsyncSessionLocal, async_engine, save, update_returning
+from app.core.query_stats import track_queries
+from app.models.trainer import Trainer
+
+ExpiringSession = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False)
+
+
+async def create_with_refresh(name: str) -> Trainer:
+    async with ExpiringSession() as db:
+        trainer = Trainer(name=name)
+        db.add(trainer)
+        await db.commit()
+        await db.refresh(trainer)
+        return trainer
+
+
+async def update_with_refresh(trainer: Trainer):
+    async with ExpiringSession() as db:
+        trainer = await db.get(Trainer, trainer.id)
+        trainer.bio = "updated"
+        await db.commit()
+        await db.refresh(trainer)
+
+
+async def create_with_save(name: str) -> Trainer:
+    async with AsyncSessionLocal() as db:
+        trainer = Trainer(name=name)
+        await save(db, trainer)
+        return trainer
+
+
+async def update_with_returning(trainer: Trainer):
+    async with AsyncSessionLocal() as db:
+        await update_returning(db, Trainer, trainer.id, {"bio": "updated"})
+        await db.commit()
+
+
+async def measure(label: str, write, items) -> list:
+    results = []
+    with track_queries() as stats:
+        start = time.perf_counter()
+        for item in items:
+            results.append(await write(item))
+        elapsed = time.perf_counter() - start
+    n = len(items)
+    print(f"  {label:<16} {stats.count / n:5.1f} statements  {elapsed / n * 1000:7.2f} ms/write")
+    return results
+
+
+async def main(rows: int):
+    names = [f"bench-writes-{i}" for i in range(rows)]
+    # Warm the pool so connection setup is not measured
+    await create_with_save("bench-writes-warmup")
+
+    print(f"{rows} sequential writes per case")
+    for label, create, update in (
+        ("refresh (before)", create_with_refresh, update_with_refresh),
+        ("returning (after)", create_with_save, update_with_returning),
+    ):
+        trainers = await measure(f"create {label.split()[0]}", create, names)
+        await measure(f"update {label.split()[0]}", update, trainers)
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Trainer).where(Trainer.name.like("bench-writes-%")))
+        await db.commit()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows))
@@ -0,0 +1,472 @@
+"""
+Index advisor - EXPLAIN the SQL every endpoint emits and propose indexes
+
+Drives representative requests for the API endpoints (plus the background hold
+sweeper and revocation refresh) in-process against the database in
+DATABASE_URL, captures each distinct statement with its parameters and runs
+EXPLAIN (ANALYZE, BUFFERS) on it inside a rolled-back transaction. Sequential
+scans that filter rows out and sorts fed by a table scan are reported together
+with the composite (or partial) index that would serve them; with --write the
+proposals become an Alembic migration in alembic/versions.
+
+Run it against a scratch database: --seed loads synthetic data first (plans on
+near-empty tables are always sequential scans).
+
+Usage:
+    python -m scripts.index_advisor --seed 20000
+    python -m scripts.index_advisor --write
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import httpx
+from sqlalchemy import event, inspect, select, text, update
+from app.core.cache import catalog_cache
+from app.core.database import AsyncSessionLocal, async_engine, engine
+from app.core.dependencies import principal_cache
+from app.core.enums import (
+    Audience, CorporateRequestStatus, CourseCategory, PaymentProvider, PaymentStatus,
+    PaymentTransactionStatus, UserRole,
+)
+from app.core.revocation import revocation_list
+from app.core.security import create_access_token, get_password_hash, token_claims
+from app.main import app
+from app.models import Booking, CorporateRequest, Course, Payment, Session, Trainer, User
+from app.services.search import course_search_vector
+from app.services.seats import expire_seat_holds
+
+# Ignore plans on tables smaller than this; Postgres rightly seq-scans them
+MIN_SCANNED_ROWS = 1000
+
+_COMPARISON = re.compile(r"\b(\w+)\s*(= ANY|=|<>|>=|<=|>|<|~~\*?|IS NOT NULL|IS NULL)", re.IGNORECASE)
+# A boolean column tested on its own; "::date" style casts are not columns
+_BARE_BOOLEAN = re.compile(r"(?<![\w'.:])(NOT\s+)?(\w+)(?=\s*(?:\)|AND\b|OR\b|$))", re.IGNORECASE)
+
+
+class Statement(NamedTuple):
+    endpoint: str
+    sql: str
+    params: object
+
+
+class Proposal(NamedTuple):
+    table: str
+    columns: Tuple[str, ...]
+    where: Optional[str]
+
+    @property
+    def name(self) -> str:
+        name = f"ix_{self.table}_{'_'.join(self.columns)}" + ("_partial" if self.where else "")
+        return name[:63]
+
+
+# --- seeding -----------------------------------------------------------------
+
+def seed(n: int):
+    """Load roughly n bookings worth of synthetic catalog, user, booking and payment rows"""
+    rnd = random.Random(0)
+    now = datetime.now(timezone.utc)
+    password = get_password_hash("advisor-password")
+
+    trainers = [{"id": uuid.uuid4(), "name": f"Trainer {i}", "bio": "Seeded trainer", "is_active": rnd.random() > 0.1}
+                for i in range(max(n // 100, 5))]
+    courses = [{
+        "id": uuid.uuid4(),
+        "title": f"{rnd.choice(['Intro to', 'Advanced', 'Applied'])} {rnd.choice(list(CourseCategory)).value} {i}",
+        "category": rnd.choice(list(CourseCategory)),
+        "audience": rnd.choice(list(Audience)),
+        "description": "Seeded course covering python, robotics and data pipelines",
+        "syllabus": ["Basics", "Projects", "Assessment"],
+        "price": 1000 + i % 50 * 100,
+        "trainer_id": rnd.choice(trainers)["id"],
+        "is_published": rnd.random() > 0.2,
+        "is_active": rnd.random() > 0.05,
+    } for i in range(max(n // 10, 20))]
+    sessions = [{
+        "id": uuid.uuid4(),
+        "course_id": rnd.choice(courses)["id"],
+        "date": date.today() + timedelta(days=rnd.randint(-180, 180)),
+        "start_time": time(rnd.choice([9, 13, 17])),
+        "location": "Nairobi",
+        "capacity": 1000,
+        "seats_booked": 0,
+        "seats_held": 0,
+    } for _ in range(max(n // 2, 50))]
+    users = [{
+        "id": uuid.uuid4(),
+        "email": f"advisor{i}@example.com",
+        "password_hash": password,
+        "name": f"User {i}",
+        "role": UserRole.ADMIN if i == 0 else UserRole.STUDENT,
+        "is_active": True,
+    } for i in range(max(n // 2, 50))]
+
+    bookings, payments, pairs = [], [], set()
+    while len(bookings) < n:
+        user, session = rnd.choice(users), rnd.choice(sessions)
+        if (user["id"], session["id"]) in pairs:
+            continue
+        pairs.add((user["id"], session["id"]))
+        status = rnd.choices(list(PaymentStatus), weights=[2, 6, 1, 1])[0]
+        booking = {
+            "id": uuid.uuid4(),
+            "user_id": user["id"],
+            "session_id": session["id"],
+            "seats": 1,
+            "payment_status": status,
+            "total_amount": 1000,
+            "hold_expires_at": now + timedelta(minutes=rnd.randint(-60, 60)) if status == PaymentStatus.PENDING else None,
+        }
+        bookings.append(booking)
+        if status != PaymentStatus.PENDING or rnd.random() > 0.5:
+            payments.append({
+                "id": uuid.uuid4(),
+                "booking_id": booking["id"],
+                "provider": PaymentProvider.MPESA,
+                "payment_reference": f"SEED_{uuid.uuid4().hex[:16].upper()}",
+                "amount": 1000,
+                "status": PaymentTransactionStatus.COMPLETED if status == PaymentStatus.PAID else rnd.choice(
+                    [PaymentTransactionStatus.PENDING, PaymentTransactionStatus.PROCESSING, PaymentTransactionStatus.FAILED]
+                ),
+                "initiated_at": now - timedelta(minutes=rnd.randint(0, 60 * 24 * 30)),
+            })
+    corporate = [{
+        "id": uuid.uuid4(),
+        "company_name": f"Company {i}",
+        "contact_person": "Contact",
+        "email": f"corp{i}@example.com",
+        "phone": "0700000000",
+        "topic": "Team training",
+        "status": rnd.choice(list(CorporateRequestStatus)),
+    } for i in range(max(n // 20, 10))]
+
+    with engine.begin() as conn:
+        for model, rows in ((Trainer, trainers), (Course, courses), (Session, sessions), (User, users),
+                            (Booking, bookings), (Payment, payments), (CorporateRequest, corporate)):
+            for start in range(0, len(rows), 5000):
+                conn.execute(model.__table__.insert(), rows[start:start + 5000])
+        conn.execute(update(Course).values(search_vector=course_search_vector()))
+        conn.execute(text("ANALYZE"))
+    print(f"Seeded {len(courses)} courses, {len(sessions)} sessions, {len(users)} users, "
+          f"{len(bookings)} bookings, {len(payments)} payments")
+
+
+# --- capture -----------------------------------------------------------------
+
+async def capture() -> List[Statement]:
+    """Exercise the endpoints and return every distinct statement they issued"""
+    statements: Dict[str, Statement] = {}
+    current = {"endpoint": ""}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.split(None, 1)[0].upper() in ("SELECT", "WITH", "UPDATE", "DELETE"):
+            statements.setdefault(statement, Statement(current["endpoint"], statement, parameters))
+
+    with engine.connect() as conn:
+        admin = conn.execute(select(User).where(User.role == UserRole.ADMIN).limit(1)).first()
+        student_id, = conn.execute(
+            select(Booking.user_id).group_by(Booking.user_id).order_by(text("count(*) DESC")).limit(1)
+        ).first()
+        student = conn.execute(select(User).where(User.id == student_id)).first()
+        course_id, = conn.execute(select(Session.course_id).group_by(Session.course_id).order_by(text("count(*) DESC")).limit(1)).first()
+        session_id, = conn.execute(select(Session.id).where(Session.course_id == course_id).limit(1)).first()
+        unbooked_id, = conn.execute(
+            select(Session.id).where(~Session.id.in_(select(Booking.session_id).where(Booking.user_id == student_id))).limit(1)
+        ).first()
+        trainer_id, = conn.execute(select(Trainer.id).where(Trainer.is_active == True).limit(1)).first()
+        booking_id, = conn.execute(select(Booking.id).where(Booking.user_id == student_id).limit(1)).first()
+        reference, = conn.execute(
+            select(Payment.payment_reference).join(Booking).where(Booking.user_id == student_id).limit(1)
+        ).first()
+
+    admin_auth = {"Authorization": "Bearer " + create_access_token(token_claims(admin))}
+    student_auth = {"Authorization": "Bearer " + create_access_token(token_claims(student))}
+    today = date.today().isoformat()
+
+    requests = [
+        ("GET", "/api/courses", None),
+        ("GET", "/api/courses?category=AI&audience=Adults", None),
+        ("GET", "/api/courses?fields=id,title,price", None),
+        ("GET", "/api/courses/search?q=python robotics", None),
+        ("GET", f"/api/courses/{course_id}", None),
+        ("GET", f"/api/courses/{course_id}/detail", None),
+        ("GET", "/api/trainers", None),
+        ("GET", f"/api/trainers/{trainer_id}", None),
+        ("GET", "/api/sessions", None),
+        ("GET", f"/api/sessions?course_id={course_id}&date_from={today}", None),
+        ("GET", f"/api/sessions?date_from={today}", None),
+        ("GET", f"/api/sessions/{session_id}", None),
+        ("GET", f"/api/sessions/courses/{course_id}/sessions", None),
+        ("GET", f"/api/bookings/users/{student_id}/bookings", student_auth),
+        ("GET", f"/api/bookings/{booking_id}", admin_auth),
+        ("GET", f"/api/bookings/sessions/{session_id}/bookings", admin_auth),
+        ("GET", "/api/users", admin_auth),
+        ("GET", "/api/corporate/requests", admin_auth),
+        ("GET", "/api/corporate/requests?status=pending", admin_auth),
+        ("GET", f"/api/payments/status?ref={reference}", student_auth),
+        ("POST", "/api/bookings", student_auth),
+    ]
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    catalog_cache.clear()
+    principal_cache.clear()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://advisor") as client:
+        for method, url, headers in requests:
+            current["endpoint"] = f"{method} {url.split('?')[0]}"
+            if method == "POST":
+                response = await client.post(url, json={"session_id": str(unbooked_id), "seats": 1}, headers=headers)
+            else:
+                response = await client.get(url, headers=headers)
+            if response.status_code >= 400:
+                print(f"  ! {method} {url} -> {response.status_code}")
+            next_cursor = response.headers.get("x-next-cursor")
+            if next_cursor and method == "GET" and "cursor=" not in url:
+                current["endpoint"] += " (next page)"
+                await client.get(url + ("&" if "?" in url else "?") + f"cursor={next_cursor}", headers=headers)
+            if method == "POST" and response.status_code == 201:
+                current["endpoint"] = "PUT /api/bookings/{id}/cancel"
+                await client.put(f"/api/bookings/{response.json()['id']}/cancel", headers=headers)
+
+        current["endpoint"] = "background: seat hold sweeper"
+        async with AsyncSessionLocal() as db:
+            await expire_seat_holds(db)
+            await db.rollback()
+        current["endpoint"] = "background: revocation refresh"
+        await revocation_list.refresh()
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    await async_engine.dispose()
+    return list(statements.values())
+
+
+# --- analysis ----------------------------------------------------------------
+
+def explain(statement: Statement) -> dict:
+    with engine.connect() as conn:
+        with conn.begin() as transaction:
+            result = conn.exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement.sql, statement.params or None
+            )
+            plan = result.scalar()
+            transaction.rollback()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return plan[0]
+
+
+def walk(node: dict, parent: Optional[dict] = None):
+    yield node, parent
+    for child in node.get("Plans", []):
+        yield from walk(child, node)
+
+
+def filter_columns(expression: str, columns: set) -> Tuple[List[str], List[str], List[str]]:
+    """Split a plan filter into equality (then IN-list) columns, range columns and partial-index predicates"""
+    equality, in_lists, ranges, predicates = [], [], [], []
+    for column, operator in _COMPARISON.findall(expression):
+        if column not in columns:
+            continue
+        operator = operator.upper()
+        if operator in ("IS NULL", "IS NOT NULL"):
+            predicates.append(f"{column} {operator}")
+        elif operator == "=":
+            equality.append(column)
+        elif operator == "= ANY":
+            in_lists.append(column)
+        elif operator in (">=", "<=", ">", "<"):
+            ranges.append(column)
+    for negated, column in _BARE_BOOLEAN.findall(expression):
+        if column in columns:
+            predicates.append(f"NOT {column}" if negated else column)
+    unique = lambda items: list(dict.fromkeys(items))
+    return unique(equality + in_lists), unique(ranges), unique(predicates)
+
+
+def scan_below(node: dict) -> Optional[dict]:
+    """The table scan feeding a sort, looking through limits/gathers"""
+    for child, _ in walk(node):
+        if child.get("Relation Name"):
+            return child
+    return None
+
+
+def analyse(root: dict, table_columns: Dict[str, set]) -> List[Tuple[str, Proposal]]:
+    findings = []
+    for node, parent in walk(root["Plan"]):
+        node_type = node["Node Type"]
+        if node.get("Relation Name") and node.get("Filter") and node.get("Rows Removed by Filter"):
+            scanned = node.get("Actual Rows", 0) + node["Rows Removed by Filter"]
+            # Index scans are only worth flagging when the filter throws most of their rows away
+            if scanned < MIN_SCANNED_ROWS or (node_type != "Seq Scan" and node["Rows Removed by Filter"] < node.get("Actual Rows", 0)):
+                continue
+            table = node["Relation Name"]
+            condition = " AND ".join(filter(None, (node.get("Index Cond"), node.get("Recheck Cond"), node["Filter"])))
+            equality, ranges, predicates = filter_columns(condition, table_columns[table])
+            sort_keys = []
+            if parent is not None and parent["Node Type"] in ("Sort", "Incremental Sort"):
+                sort_keys = sort_columns(parent, table_columns[table]) or []
+            columns = tuple(dict.fromkeys(equality + (sort_keys or ranges[:1])))
+            if columns:
+                detail = (f"{node_type} on {table}: {scanned} rows scanned, {node['Rows Removed by Filter']} "
+                          f"removed by {node['Filter']}")
+                findings.append((detail, Proposal(table, columns, " AND ".join(predicates) or None)))
+        elif node_type in ("Sort", "Incremental Sort"):
+            scan = scan_below(node)
+            if scan is None or scan["Node Type"] not in ("Seq Scan", "Bitmap Heap Scan"):
+                continue
+            scanned = scan.get("Actual Rows", 0) + scan.get("Rows Removed by Filter", 0)
+            table = scan["Relation Name"]
+            keys = sort_columns(node, table_columns[table])
+            if scanned < MIN_SCANNED_ROWS or not keys:
+                continue
+            equality, _, predicates = filter_columns(scan.get("Filter") or "", table_columns[table])
+            columns = tuple(dict.fromkeys(equality + keys))
+            detail = f"{node_type} on {', '.join(node['Sort Key'])} over {scan['Node Type']} of {table} ({scanned} rows)"
+            findings.append((detail, Proposal(table, columns, " AND ".join(predicates) or None)))
+    # A sort and the scan feeding it usually point at the same index
+    return list({proposal: (detail, proposal) for detail, proposal in reversed(findings)}.values())[::-1]
+
+
+def sort_columns(node: dict, columns: set) -> Optional[List[str]]:
+    """Plain column names of a sort's keys, or None when any key is an expression"""
+    keys = []
+    for key in node.get("Sort Key", []):
+        name, _, direction = key.partition(" ")
+        name = name.split(".")[-1]
+        if name not in columns or direction not in ("", "DESC"):
+            return None
+        keys.append(name)
+    return keys
+
+
+def existing_indexes() -> Dict[str, List[Tuple[Tuple[str, ...], Optional[str]]]]:
+    inspector = inspect(engine)
+    indexes = {}
+    for table in inspector.get_table_names():
+        entries = [(tuple(index["column_names"]), index.get("dialect_options", {}).get("postgresql_where"))
+                   for index in inspector.get_indexes(table)]
+        primary = inspector.get_pk_constraint(table)["constrained_columns"]
+        entries.append((tuple(primary), None))
+        for constraint in inspector.get_unique_constraints(table):
+            entries.append((tuple(constraint["column_names"]), None))
+        indexes[table] = entries
+    return indexes
+
+
+def redundant(proposal: Proposal, proposals) -> bool:
+    """Another proposal on the same rows leads with all of this one's columns"""
+    return any(
+        other != proposal and other.table == proposal.table and other.where == proposal.where
+        and other.columns[:len(proposal.columns)] == proposal.columns
+        for other in proposals
+    )
+
+
+def covered(proposal: Proposal, indexes) -> bool:
+    """An existing non-partial index already starts with the proposed columns"""
+    return any(
+        columns[:len(proposal.columns)] == proposal.columns and where is None
+        for columns, where in indexes.get(proposal.table, [])
+    )
+
+
+# --- migration ---------------------------------------------------------------
+
+def write_migration(proposals: List[Proposal]) -> str:
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    script = ScriptDirectory.from_config(Config("alembic.ini"))
+    head = script.get_current_head()
+    revision = uuid.uuid4().hex[:12]
+    path = f"{script.versions}/{revision}_index_advisor.py"
+
+    def create(p: Proposal) -> str:
+        where = f", postgresql_where=sa.text({p.where!r})" if p.where else ""
+        return (f"        op.create_index({p.name!r}, {p.table!r}, {list(p.columns)!r}, "
+                f"postgresql_concurrently=True, if_not_exists=True{where})")
+
+    def drop(p: Proposal) -> str:
+        return f"        op.drop_index({p.name!r}, table_name={p.table!r}, postgresql_concurrently=True, if_exists=True)"
+
+    body = f'''"""Indexes proposed by scripts/index_advisor.py
+
+Revision ID: {revision}
+Revises: {head}
+Create Date: {datetime.now()}
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = {revision!r}
+down_revision: Union[str, None] = {head!r}
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+{chr(10).join(create(p) for p in proposals)}
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+{chr(10).join(drop(p) for p in reversed(proposals))}
+'''
+    with open(path, "w") as f:
+        f.write(body)
+    return path
+
+
+def main(seed_rows: int, write: bool):
+    if seed_rows:
+        seed(seed_rows)
+
+    statements = asyncio.run(capture())
+    table_columns = {table: {c["name"] for c in inspect(engine).get_columns(table)}
+                     for table in inspect(engine).get_table_names()}
+    indexes = existing_indexes()
+    proposals: Dict[Proposal, List[str]] = {}
+
+    print(f"Captured {len(statements)} distinct statements\n")
+    for statement in statements:
+        plan = explain(statement)
+        buffers = plan["Plan"].get("Shared Hit Blocks", 0) + plan["Plan"].get("Shared Read Blocks", 0)
+        findings = analyse(plan, table_columns)
+        flag = "!" if findings else " "
+        print(f"{flag} {statement.endpoint:<45} {plan['Execution Time']:8.2f} ms  {buffers:6d} buffers  "
+              f"{' '.join(statement.sql.split())[:70]}")
+        for detail, proposal in findings:
+            status = "covered by an existing index" if covered(proposal, indexes) else f"propose {proposal.name}"
+            print(f"      {detail}\n        -> ({', '.join(proposal.columns)})"
+                  f"{' WHERE ' + proposal.where if proposal.where else ''}: {status}")
+            if not covered(proposal, indexes):
+                proposals.setdefault(proposal, []).append(statement.endpoint)
+
+    proposals = {proposal: endpoints for proposal, endpoints in proposals.items() if not redundant(proposal, proposals)}
+    print(f"\n{len(proposals)} index proposal(s)")
+    for proposal, endpoints in proposals.items():
+        where = f" WHERE {proposal.where}" if proposal.where else ""
+        print(f"  CREATE INDEX {proposal.name} ON {proposal.table} ({', '.join(proposal.columns)}){where}"
+              f"  -- {', '.join(sorted(set(endpoints)))}")
+    if write and proposals:
+        print(f"\nWrote {write_migration(list(proposals))}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seed", type=int, default=0, help="load this many synthetic bookings (plus related rows) first")
+    parser.add_argument("--write", action="store_true", help="write the proposals as an Alembic migration")
+    args = parser.parse_args()
+    main(args.seed, args.write)
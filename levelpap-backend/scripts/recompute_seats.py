@@ -0,0 +1,21 @@
+"""
+Repair session seat counters - recompute seats_booked and seats_held from bookings
+
+Usage:
+    python -m scripts.recompute_seats
+"""
+import asyncio
+from app.core.database import AsyncSessionLocal, async_engine
+from app.services.seats import recompute_seat_counters
+
+
+async def recompute_seats():
+    async with AsyncSessionLocal() as db:
+        corrected = await recompute_seat_counters(db)
+        await db.commit()
+    await async_engine.dispose()
+    print(f"Corrected seat counters on {corrected} session(s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(recompute_seats())
@@ -0,0 +1,47 @@
+"""
+Reconcile stale payments - settle payments whose provider callback never arrived
+
+Checks every PENDING/PROCESSING payment initiated more than --older-than
+minutes ago with its provider and applies the results to payments, bookings
+and seat counters in batches. Payments the provider still has no result for
+are failed once older than --expire-after minutes. Safe to re-run; schedule
+it (e.g. every 10 minutes) alongside the web service.
+
+Usage:
+    python -m scripts.reconcile_payments
+    python -m scripts.reconcile_payments --older-than 5 --concurrency 20 --dry-run
+"""
+import argparse
+import asyncio
+from datetime import timedelta
+from app.core.config import settings
+from app.core.database import async_engine
+from app.services.payments import close_clients
+from app.services.reconciliation import reconcile_payments
+
+
+async def main(args):
+    try:
+        report = await reconcile_payments(
+            older_than=timedelta(minutes=args.older_than),
+            expire_after=timedelta(minutes=args.expire_after),
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            limit=args.limit,
+            dry_run=args.dry_run,
+        )
+    finally:
+        await close_clients()
+        await async_engine.dispose()
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--older-than", type=float, default=settings.PAYMENT_RECONCILE_AFTER_MINUTES, help="minutes")
+    parser.add_argument("--expire-after", type=float, default=settings.PAYMENT_EXPIRE_AFTER_MINUTES, help="minutes")
+    parser.add_argument("--batch-size", type=int, default=settings.PAYMENT_RECONCILE_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=settings.PAYMENT_RECONCILE_CONCURRENCY)
+    parser.add_argument("--limit", type=int, help="check at most this many payments")
+    parser.add_argument("--dry-run", action="store_true", help="query providers but change nothing")
+    asyncio.run(main(parser.parse_args()))
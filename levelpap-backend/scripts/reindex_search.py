@@ -0,0 +1,21 @@
+"""
+Rebuild course full-text search vectors after changing weights (the migration that adds the column fills it)
+
+Usage:
+    python -m scripts.reindex_search
+"""
+import asyncio
+from app.core.database import AsyncSessionLocal, async_engine
+from app.services.search import refresh_search_vector
+
+
+async def reindex_search():
+    async with AsyncSessionLocal() as db:
+        await refresh_search_vector(db)
+        await db.commit()
+    await async_engine.dispose()
+    print("Rebuilt course search vectors")
+
+
+if __name__ == "__main__":
+    asyncio.run(reindex_search())
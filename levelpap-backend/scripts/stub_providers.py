@@ -0,0 +1,231 @@
+"""
+Stub payment providers - local stand-ins for Daraja (M-Pesa) and Flutterwave
+
+Implements the endpoints the provider clients call, with a configurable
+response latency and failure rate:
+
+  GET  /oauth/v1/generate                  M-Pesa OAuth token
+  POST /mpesa/stkpush/v1/processrequest    M-Pesa STK push
+  POST /mpesa/stkpushquery/v1/query        M-Pesa STK push status
+  POST /v3/payments                        Flutterwave hosted payment
+  GET  /v3/transactions/verify_by_reference Flutterwave transaction status
+  GET  /stats                              calls served and distinct client connections
+
+With --callback the stub also plays the customer: a moment after each STK
+push or Flutterwave payment it posts a successful result callback to the
+app's webhook endpoint, signed with FLUTTERWAVE_WEBHOOK_SECRET where needed.
+
+Status queries report every payment as paid, or with --result-mix a fixed
+per-reference mix of about 80% paid, 8% cancelled, 6% failed and 6% still
+waiting for the customer.
+
+Point the app at it with:
+    MPESA_BASE_URL=http://127.0.0.1:9000 FLUTTERWAVE_BASE_URL=http://127.0.0.1:9000
+
+Usage:
+    python -m scripts.stub_providers --port 9000 --latency-ms 50 --callback http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import random
+import secrets
+from collections import Counter
+from typing import Optional
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def build_app(
+    latency: float = 0,
+    fail_rate: float = 0,
+    token_ttl: int = 3599,
+    callback_base: Optional[str] = None,
+    callback_delay: float = 1,
+    webhook_secret: str = "",
+    result_mix: bool = False,
+) -> FastAPI:
+    app = FastAPI(title="Stub payment providers")
+    tokens = set()
+    calls = Counter()
+    connections = set()
+    background = set()
+    amounts = {}
+
+    async def simulate(request: Request, name: str) -> Optional[JSONResponse]:
+        calls[name] += 1
+        connections.add(request.client)
+        if latency:
+            await asyncio.sleep(latency)
+        if fail_rate and random.random() < fail_rate:
+            calls[f"{name}_failed"] += 1
+            return JSONResponse({"errorMessage": "Stub failure"}, status_code=503)
+        return None
+
+    def bearer_ok(request: Request) -> bool:
+        return request.headers.get("authorization", "").removeprefix("Bearer ") in tokens
+
+    async def post_callback(path: str, body: bytes, headers: dict):
+        await asyncio.sleep(callback_delay)
+        async with httpx.AsyncClient(base_url=callback_base) as client:
+            try:
+                await client.post(path, content=body, headers={"content-type": "application/json", **headers})
+                calls["callbacks"] += 1
+            except httpx.HTTPError:
+                calls["callbacks_failed"] += 1
+
+    def result_for(key: str) -> str:
+        """completed / cancelled / failed / pending for a checkout id or tx_ref"""
+        if not result_mix:
+            return "completed"
+        bucket = int(hashlib.sha256(key.encode()).hexdigest(), 16) % 100
+        return "completed" if bucket < 80 else "cancelled" if bucket < 88 else "failed" if bucket < 94 else "pending"
+
+    def schedule(coro):
+        task = asyncio.create_task(coro)
+        background.add(task)
+        task.add_done_callback(background.discard)
+
+    @app.get("/oauth/v1/generate")
+    async def oauth(request: Request):
+        failure = await simulate(request, "oauth")
+        if failure:
+            return failure
+        if not request.headers.get("authorization", "").startswith("Basic "):
+            return JSONResponse({"errorMessage": "Invalid credentials"}, status_code=400)
+        token = secrets.token_urlsafe(24)
+        tokens.add(token)
+        return {"access_token": token, "expires_in": str(token_ttl)}
+
+    @app.post("/mpesa/stkpush/v1/processrequest")
+    async def stk_push(request: Request):
+        failure = await simulate(request, "stk_push")
+        if failure:
+            return failure
+        if not bearer_ok(request):
+            return JSONResponse({"errorMessage": "Invalid Access Token"}, status_code=401)
+        payload = await request.json()
+        checkout_id = f"ws_CO_{secrets.token_hex(8)}"
+        if callback_base:
+            callback = {"Body": {"stkCallback": {
+                "MerchantRequestID": secrets.token_hex(6),
+                "CheckoutRequestID": checkout_id,
+                "ResultCode": 0,
+                "ResultDesc": "The service request is processed successfully.",
+                "CallbackMetadata": {"Item": [
+                    {"Name": "Amount", "Value": payload["Amount"]},
+                    {"Name": "MpesaReceiptNumber", "Value": secrets.token_hex(5).upper()},
+                    {"Name": "PhoneNumber", "Value": payload["PhoneNumber"]},
+                ]},
+            }}}
+            url = httpx.URL(payload["CallBackURL"])
+            schedule(post_callback(url.raw_path.decode(), json.dumps(callback).encode(), {}))
+        return {
+            "MerchantRequestID": secrets.token_hex(6),
+            "CheckoutRequestID": checkout_id,
+            "ResponseCode": "0",
+            "ResponseDescription": "Success. Request accepted for processing",
+            "CustomerMessage": "Success. Request accepted for processing",
+        }
+
+    @app.post("/mpesa/stkpushquery/v1/query")
+    async def stk_query(request: Request):
+        failure = await simulate(request, "stk_query")
+        if failure:
+            return failure
+        if not bearer_ok(request):
+            return JSONResponse({"errorMessage": "Invalid Access Token"}, status_code=401)
+        checkout_id = (await request.json())["CheckoutRequestID"]
+        result = result_for(checkout_id)
+        if result == "pending":
+            return JSONResponse(
+                {"errorCode": "500.001.1001", "errorMessage": "The transaction is being processed"}, status_code=500
+            )
+        code, description = {
+            "completed": ("0", "The service request is processed successfully."),
+            "cancelled": ("1032", "Request cancelled by user"),
+            "failed": ("1", "The balance is insufficient for the transaction"),
+        }[result]
+        return {
+            "ResponseCode": "0",
+            "ResponseDescription": "The service request has been accepted successsfully",
+            "MerchantRequestID": secrets.token_hex(6),
+            "CheckoutRequestID": checkout_id,
+            "ResultCode": code,
+            "ResultDesc": description,
+        }
+
+    @app.get("/v3/transactions/verify_by_reference")
+    async def flutterwave_verify(request: Request, tx_ref: str):
+        failure = await simulate(request, "flutterwave_verify")
+        if failure:
+            return failure
+        result = result_for(tx_ref)
+        data = {"id": random.randint(10 ** 6, 10 ** 9), "tx_ref": tx_ref, "status": {"completed": "successful"}.get(result, result)}
+        if tx_ref in amounts:
+            data.update(amounts[tx_ref])
+        return {"status": "success", "message": "Transaction fetched successfully", "data": data}
+
+    @app.post("/v3/payments")
+    async def flutterwave_payment(request: Request):
+        failure = await simulate(request, "flutterwave_payment")
+        if failure:
+            return failure
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            return JSONResponse({"status": "error", "message": "Invalid authorization key"}, status_code=401)
+        payload = await request.json()
+        amounts[payload["tx_ref"]] = {"amount": payload["amount"], "currency": payload["currency"]}
+        if callback_base:
+            body = json.dumps({"event": "charge.completed", "data": {
+                "id": random.randint(10 ** 6, 10 ** 9),
+                "tx_ref": payload["tx_ref"],
+                "amount": payload["amount"],
+                "currency": payload["currency"],
+                "status": "successful",
+            }}).encode()
+            signature = base64.b64encode(hmac.new(webhook_secret.encode(), body, hashlib.sha256).digest()).decode()
+            schedule(post_callback("/api/payments/webhooks/flutterwave", body, {"flutterwave-signature": signature}))
+        return {
+            "status": "success",
+            "message": "Hosted Link",
+            "data": {"link": f"https://checkout.stub.local/pay/{secrets.token_hex(6)}"},
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": dict(calls), "connections": len(connections), "tokens_issued": len(tokens)}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0, help="fraction of calls answered with 503")
+    parser.add_argument("--token-ttl", type=int, default=3599, help="OAuth token lifetime in seconds")
+    parser.add_argument("--callback", help="app base URL to post result callbacks to")
+    parser.add_argument("--callback-delay", type=float, default=1)
+    parser.add_argument("--webhook-secret", default="", help="FLUTTERWAVE_WEBHOOK_SECRET for signing callbacks")
+    parser.add_argument("--result-mix", action="store_true", help="status queries return a mix of outcomes")
+    args = parser.parse_args()
+    uvicorn.run(
+        build_app(
+            args.latency_ms / 1000,
+            args.fail_rate,
+            args.token_ttl,
+            args.callback,
+            args.callback_delay,
+            args.webhook_secret,
+            args.result_mix,
+        ),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+    )
@@ -9,6 +9,7 @@ alembic upgrade head
 echo "Starting application..."
 exec gunicorn app.main:app \
     --workers 2 \
+    --preload \
     --worker-class uvicorn.workers.UvicornWorker \
     --bind 0.0.0.0:$PORT \
     --timeout 120 \
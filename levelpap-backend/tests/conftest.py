@@ -0,0 +1,67 @@
+import os
+
+# Settings are read at import time; tests never open a connection to these
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/levelpap_test")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.core.database import Base, _psycopg_url
+from app.core.enums import Audience, CourseCategory, PaymentProvider, PaymentTransactionStatus
+from app.models import Booking, Course, Payment, Session, User
+
+# Tests that need PostgreSQL (the `db` fixture) are skipped unless this points at a scratch database
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    """A session on a freshly created schema in TEST_DATABASE_URL"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("needs PostgreSQL: set TEST_DATABASE_URL to a scratch database")
+    engine = create_async_engine(_psycopg_url(TEST_DATABASE_URL))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.fixture
+def open_payments(db):
+    """Factory: a session with `count` unpaid bookings holding a seat each, and their processing payments"""
+    async def create(count: int, provider: PaymentProvider = PaymentProvider.MPESA):
+        course = Course(
+            title="Python", category=CourseCategory.DATA, audience=Audience.ADULTS,
+            description="Intro", syllabus=["Basics"],
+        )
+        session = Session(
+            course=course, date=date(2026, 11, 2), start_time=time(9), location="Nairobi",
+            capacity=10, seats_held=count,
+        )
+        hold = datetime.now(timezone.utc) + timedelta(minutes=15)
+        payments = []
+        for n in range(count):
+            user = User(email=f"learner{n}@example.com", password_hash="x", name=f"Learner {n}")
+            booking = Booking(user=user, session=session, seats=1, total_amount=Decimal("100"), hold_expires_at=hold)
+            payments.append(Payment(
+                booking=booking,
+                provider=provider,
+                payment_reference=f"LP-{n}",
+                amount=Decimal("100"),
+                status=PaymentTransactionStatus.PROCESSING,
+                provider_transaction_id=f"ws_CO_{n}" if provider == PaymentProvider.MPESA else None,
+                provider_response={"CheckoutRequestID": f"ws_CO_{n}"} if provider == PaymentProvider.MPESA else None,
+            ))
+        db.add_all(payments)
+        await db.commit()
+        return session, payments
+    return create
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+import pytest
+from fastapi import Response
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+from app.core.idempotency import IdempotencyStore
+
+pytestmark = pytest.mark.anyio
+
+USER = uuid4()
+
+
+def make_store():
+    return IdempotencyStore(
+        ttl=timedelta(hours=1), wait=1, poll_interval=0.01, lock=timedelta(minutes=2), sweep_interval=60,
+    )
+
+
+async def booking_created(request):
+    """call_next stand-in: the route's response, streamed back the way middleware receives it"""
+    route_response = Response(b'{"id": "b1"}', status_code=201, media_type="application/json")
+    route_response.set_cookie("session", "abc")
+    route_response.set_cookie("primary_reads_until", "123")
+
+    async def body():
+        yield route_response.body
+
+    response = StreamingResponse(body(), status_code=route_response.status_code)
+    response.raw_headers = route_response.raw_headers
+    return response
+
+
+def cookies(response: Response):
+    return [value for name, value in response.raw_headers if name == b"set-cookie"]
+
+
+async def test_repeated_headers_are_stored_and_replayed(monkeypatch):
+    store = make_store()
+    stored = {}
+
+    async def finish(user_id, key, fingerprint, response, body):
+        stored.update(
+            status_code=response.status_code,
+            response_body=body,
+            response_headers=[[n.decode("latin-1"), v.decode("latin-1")] for n, v in response.raw_headers],
+        )
+
+    monkeypatch.setattr(store, "_finish", finish)
+    request = Request({"type": "http", "method": "POST", "path": "/api/bookings", "headers": []})
+
+    first = await store._execute(request, booking_created, USER, "key-1", "fingerprint")
+
+    assert first.status_code == 201
+    assert first.body == b'{"id": "b1"}'
+    assert len(cookies(first)) == 2
+    assert [name for name, _ in stored["response_headers"]].count("set-cookie") == 2
+
+    now = datetime.now(timezone.utc)
+    record = SimpleNamespace(fingerprint="fingerprint", created_at=now, expires_at=now + timedelta(hours=1), **stored)
+
+    async def lookup(user_id, key):
+        return record
+
+    monkeypatch.setattr(store, "_lookup", lookup)
+
+    replay = await store._replay_or_claim(USER, "key-1", "fingerprint")
+
+    assert replay.status_code == 201
+    assert replay.body == b'{"id": "b1"}'
+    assert cookies(replay) == cookies(first)
+    assert replay.headers["content-type"] == "application/json"
+    assert replay.headers["content-length"] == str(len(replay.body))
+    assert replay.headers["idempotent-replayed"] == "true"
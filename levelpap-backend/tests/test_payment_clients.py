@@ -0,0 +1,70 @@
+from decimal import Decimal
+import httpx
+import pytest
+from app.services.payments import ProviderError
+from app.services.payments.flutterwave import FlutterwaveClient
+from app.services.payments.mpesa import MpesaClient
+from scripts.stub_providers import build_app
+
+pytestmark = pytest.mark.anyio
+
+
+def stub_client(client_class, stub, **kwargs):
+    """A provider client whose pooled httpx client talks to the stub app in-process"""
+    client = client_class(base_url="http://stub", timeout=5, **kwargs)
+    client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stub), base_url="http://stub")
+    return client
+
+
+async def stub_calls(client) -> dict:
+    return (await client.client.get("/stats")).json()["calls"]
+
+
+async def test_mpesa_stk_push_and_query_reuse_one_token():
+    mpesa = stub_client(MpesaClient, build_app(), refresh_margin=300)
+
+    push = await mpesa.stk_push("0712345678", Decimal("1499.50"), "LP-ABC123DEF456XYZ")
+    result = await mpesa.stk_query(push["CheckoutRequestID"])
+    await mpesa.stk_query(push["CheckoutRequestID"])
+
+    assert push["ResponseCode"] == "0"
+    assert result["ResultCode"] == "0"
+    assert (await stub_calls(mpesa))["oauth"] == 1
+    await mpesa.close()
+
+
+async def test_mpesa_refetches_a_revoked_token_once():
+    mpesa = stub_client(MpesaClient, build_app(), refresh_margin=300)
+    await mpesa.access_token()
+    mpesa._token = "revoked"
+
+    push = await mpesa.stk_push("254712345678", Decimal("100"), "LP-REF")
+
+    assert push["CheckoutRequestID"].startswith("ws_CO_")
+    assert (await stub_calls(mpesa))["oauth"] == 2
+    await mpesa.close()
+
+
+async def test_flutterwave_create_and_verify_payment():
+    flutterwave = stub_client(FlutterwaveClient, build_app())
+
+    created = await flutterwave.create_payment("LP-REF", Decimal("2500.00"), "KES", "learner@example.com")
+    data = await flutterwave.verify("LP-REF")
+
+    assert created["data"]["link"].startswith("https://checkout.stub.local/pay/")
+    assert data["tx_ref"] == "LP-REF"
+    assert data["status"] == "successful"
+    assert data["amount"] == "2500.00"
+    await flutterwave.close()
+
+
+async def test_provider_failures_raise_provider_error():
+    mpesa = stub_client(MpesaClient, build_app(fail_rate=1), refresh_margin=300)
+    flutterwave = stub_client(FlutterwaveClient, build_app(fail_rate=1))
+
+    with pytest.raises(ProviderError, match="HTTP 503"):
+        await mpesa.stk_push("0712345678", Decimal("100"), "LP-REF")
+    with pytest.raises(ProviderError, match="HTTP 503"):
+        await flutterwave.create_payment("LP-REF", Decimal("100"), "KES", "learner@example.com")
+    await mpesa.close()
+    await flutterwave.close()
@@ -0,0 +1,55 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app.core.config import settings
+from app.core.query_stats import instrument_engine, query_budget
+from app.main import count_queries
+
+
+@pytest.fixture
+def client():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+
+    app = FastAPI()
+    app.middleware("http")(count_queries)
+
+    @app.get("/courses", dependencies=[Depends(query_budget(2))])
+    async def list_courses(queries: int):
+        with engine.connect() as conn:
+            for n in range(queries):
+                conn.execute(text(f"SELECT {n}"))
+        return {"ok": True}
+
+    yield TestClient(app)
+    engine.dispose()
+
+
+def test_request_within_budget_passes(client, monkeypatch):
+    monkeypatch.setattr(settings, "DB_STRICT_LOADING", True)
+
+    response = client.get("/courses", params={"queries": 2})
+
+    assert response.status_code == 200
+    assert response.headers["X-DB-Queries"] == "2"
+    assert response.headers["Server-Timing"].startswith("db;dur=")
+
+
+def test_request_over_budget_fails_in_strict_mode(client, monkeypatch):
+    monkeypatch.setattr(settings, "DB_STRICT_LOADING", True)
+
+    response = client.get("/courses", params={"queries": 3})
+
+    assert response.status_code == 500
+    assert response.json() == {"detail": "Query budget exceeded: 3 queries (budget 2)"}
+    assert response.headers["X-DB-Queries"] == "3"
+
+
+def test_request_over_budget_only_warns_otherwise(client, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "DB_STRICT_LOADING", False)
+
+    response = client.get("/courses", params={"queries": 3})
+
+    assert response.status_code == 200
+    assert "GET /courses: 3 queries exceeds budget of 2" in caplog.text
@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import select
+from app.core.enums import PaymentStatus, PaymentTransactionStatus
+from app.models import Booking, Payment
+from app.services.reconciliation import ReconcileReport, Result, apply_results
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_batch_without_any_provider_response(db, open_payments):
+    session, payments = await open_payments(2)
+    results = [Result(payment.id, PaymentTransactionStatus.COMPLETED) for payment in payments]
+    report = ReconcileReport()
+
+    await apply_results(db, results, report)
+    await db.commit()
+
+    rows = (await db.execute(
+        select(Payment).filter(Payment.id.in_([p.id for p in payments])).execution_options(populate_existing=True)
+    )).scalars().all()
+    assert {p.status for p in rows} == {PaymentTransactionStatus.COMPLETED}
+    # Missing values keep what the payment already had
+    assert sorted(p.provider_response["CheckoutRequestID"] for p in rows) == ["ws_CO_0", "ws_CO_1"]
+    assert sorted(p.provider_transaction_id for p in rows) == ["ws_CO_0", "ws_CO_1"]
+    assert all(p.failure_reason is None for p in rows)
+
+    bookings = (await db.execute(select(Booking.payment_status))).scalars().all()
+    assert bookings == [PaymentStatus.PAID, PaymentStatus.PAID]
+    await db.refresh(session)
+    assert (session.seats_booked, session.seats_held) == (2, 0)
+    assert report.outcomes == {"completed": 2}
+
+
+async def test_batch_mixing_responses_and_missing_values(db, open_payments):
+    _, payments = await open_payments(2)
+    results = [
+        Result(payments[0].id, PaymentTransactionStatus.FAILED, failure_reason="Expired without a result from the provider"),
+        Result(
+            payments[1].id, PaymentTransactionStatus.COMPLETED,
+            provider_transaction_id="FLW-1", provider_response={"status": "successful"},
+        ),
+    ]
+
+    await apply_results(db, results, ReconcileReport())
+    await db.commit()
+
+    failed, completed = [
+        await db.get(Payment, payment.id, populate_existing=True) for payment in payments
+    ]
+    assert failed.status == PaymentTransactionStatus.FAILED
+    assert failed.failure_reason == "Expired without a result from the provider"
+    assert failed.provider_response == {"CheckoutRequestID": "ws_CO_0"}
+    assert completed.provider_transaction_id == "FLW-1"
+    assert completed.provider_response == {"status": "successful"}
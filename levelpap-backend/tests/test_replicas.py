@@ -0,0 +1,138 @@
+from types import SimpleNamespace
+import pytest
+from fastapi import Request, Response
+from sqlalchemy import Column, Integer, String, create_engine, select, update
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import declarative_base
+from app.core.cache import ResponseCache
+from app.core.replicas import STICKY_COOKIE, ReplicaRouter, RoutingSession
+from app.core.security import create_access_token
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+
+
+@pytest.fixture
+def engines(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for engine in (primary, replica):
+        Base.metadata.create_all(engine)
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+def test_session_reads_from_replica_and_writes_to_primary(engines):
+    primary, replica = engines
+    with RoutingSession(bind=primary) as session:
+        session.info["replica"] = SimpleNamespace(sync_engine=replica)
+
+        assert session.get_bind(clause=select(Item)) is replica
+        assert session.get_bind(clause=update(Item).values(name="x")) is primary
+
+        session.add(Item(id=1, name="on primary"))
+        session.commit()
+        # The flush went to the primary; SELECTs still read the (stale) replica
+        assert session.scalars(select(Item)).all() == []
+
+    with RoutingSession(bind=primary) as session:
+        assert session.get_bind(clause=select(Item)) is primary
+        assert [item.name for item in session.scalars(select(Item))] == ["on primary"]
+
+
+def make_request(token=None, cookie=None):
+    headers = []
+    if token is not None:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    if cookie is not None:
+        headers.append((b"cookie", cookie.encode()))
+    return Request({"type": "http", "method": "GET", "path": "/api/courses", "headers": headers})
+
+
+def make_router():
+    engine = create_async_engine("postgresql+psycopg://reader@replica.invalid/levelpap")
+    router = ReplicaRouter([engine], sticky_seconds=5, check_interval=5, max_lag=10)
+    router.replicas[0].healthy = True
+    return router, engine
+
+
+def test_router_reads_from_primary_after_a_write():
+    router, replica = make_router()
+    token = create_access_token({"sub": "user-1"})
+    other = create_access_token({"sub": "user-2"})
+
+    assert router.choose(make_request(token)) is replica
+
+    response = Response()
+    router.record_write(make_request(token), response)
+
+    assert router.choose(make_request(token)) is None
+    assert router.choose(make_request(other)) is replica
+    assert router.choose(make_request()) is replica
+
+
+def test_sticky_cookie_sends_reads_to_primary_on_other_workers():
+    router, _ = make_router()
+    response = Response()
+    router.record_write(make_request(create_access_token({"sub": "user-1"})), response)
+    cookie = response.headers["set-cookie"].split(";")[0]
+    assert cookie.startswith(f"{STICKY_COOKIE}=")
+
+    other_worker, replica = make_router()
+
+    assert other_worker.choose(make_request(cookie=cookie)) is None
+    assert other_worker.choose(make_request(cookie=f"{STICKY_COOKIE}=0")) is replica
+
+
+def test_router_uses_primary_without_a_healthy_replica():
+    router, _ = make_router()
+    router.replicas[0].healthy = False
+
+    assert router.choose(make_request()) is None
+
+
+def catalog_request(path="/api/courses"):
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []})
+
+
+def test_catalog_misses_read_from_primary_after_an_invalidation():
+    cache = ResponseCache("test_catalog", maxsize=10, ttl=60, channel="test_invalidated", replica_lag=30)
+    replica = object()
+    db = SimpleNamespace(info={"replica": replica})
+
+    key = cache.key(catalog_request(), ["courses"])
+    assert cache.get_response(catalog_request(), key, db) is None
+    assert db.info["replica"] is replica
+
+    cache.invalidate("courses")
+    key = cache.key(catalog_request(), ["courses"])
+    assert cache.get_response(catalog_request(), key, db) is None
+    assert db.info["replica"] is None
+
+    trainers = catalog_request("/api/trainers")
+    db = SimpleNamespace(info={"replica": replica})
+    assert cache.get_response(trainers, cache.key(trainers, ["trainers"]), db) is None
+    assert db.info["replica"] is replica
+
+    # Invalidations announced by another worker open the same window
+    cache.apply_notification("trainers")
+    assert cache.get_response(trainers, cache.key(trainers, ["trainers"]), db) is None
+    assert db.info["replica"] is None
+
+
+def test_catalog_misses_use_the_replica_once_the_lag_window_has_passed():
+    cache = ResponseCache("test_catalog", maxsize=10, ttl=60, channel="test_invalidated", replica_lag=0)
+    replica = object()
+    db = SimpleNamespace(info={"replica": replica})
+
+    cache.invalidate("courses")
+
+    assert cache.get_response(catalog_request(), cache.key(catalog_request(), ["courses"]), db) is None
+    assert db.info["replica"] is replica
@@ -0,0 +1,69 @@
+from uuid import uuid4
+from app.services.search import InvertedIndex
+
+
+def make_index(*documents):
+    index = InvertedIndex()
+    ids = []
+    for title, syllabus, description in documents:
+        course_id = uuid4()
+        index.add(course_id, {"title": title, "syllabus": syllabus, "description": description})
+        ids.append(course_id)
+    return index, ids
+
+
+def test_title_match_outranks_syllabus_and_description():
+    index, (in_description, in_title, in_syllabus) = make_index(
+        ("Office Skills", "Spreadsheets", "Covers python basics"),
+        ("Python for Beginners", "Variables", "An introduction"),
+        ("Data Analysis", "Python and pandas", "Working with data"),
+    )
+
+    ranked = [course_id for course_id, _ in index.search("python")]
+
+    assert ranked == [in_title, in_syllabus, in_description]
+
+
+def test_every_term_must_match():
+    index, (both, title_only) = make_index(
+        ("Python Web Development", "Django", "Build web apps"),
+        ("Python Scripting", "Automation", "Scripts for the desktop"),
+    )
+
+    assert [course_id for course_id, _ in index.search("python web")] == [both]
+    assert index.search("python cobol") == []
+    assert index.search("the and") == []
+
+
+def test_title_match_on_rarer_term_ranks_higher():
+    index, ids = make_index(
+        ("Leadership", "Coaching", "Teams"),
+        ("Leadership", "Negotiation", "Teams"),
+        ("Negotiation", "Leadership", "Teams"),
+    )
+
+    scores = dict(index.search("leadership negotiation"))
+
+    # Both match one term in the title, but "leadership" is in every course
+    assert set(scores) == {ids[1], ids[2]}
+    assert scores[ids[2]] > scores[ids[1]]
+
+
+def test_remove_and_readd_replace_postings():
+    index, (course_id,) = make_index(("Excel Essentials", "Formulas", "Pivot tables"))
+
+    index.add(course_id, {"title": "Power BI", "syllabus": "Dashboards", "description": "Reports"})
+    assert index.search("excel") == []
+    assert [cid for cid, _ in index.search("dashboards")] == [course_id]
+
+    index.remove(course_id)
+    assert index.search("dashboards") == []
+    assert index.postings == {}
+
+
+def test_highlight_marks_query_terms():
+    index, (course_id,) = make_index(("Python for Beginners", "Variables", "An introduction to Python"))
+
+    assert index.highlight(course_id, "python") == (
+        "<mark>Python</mark> for Beginners Variables An introduction to <mark>Python</mark>"
+    )
@@ -0,0 +1,62 @@
+import pytest
+from app.core.enums import PaymentProvider, PaymentStatus, PaymentTransactionStatus
+from app.models import Booking, PaymentWebhook, Session
+from app.services.reconciliation import ReconcileReport, Result, apply_results
+from app.services.seats import cancel_booking_seats
+from app.services.webhooks import REFUND_REQUIRED, WebhookWorker
+
+pytestmark = pytest.mark.anyio
+
+
+async def cancel_while_checkout_open(db, open_payments, provider):
+    session, (payment,) = await open_payments(1, provider)
+    assert await cancel_booking_seats(db, payment.booking_id, PaymentStatus.PENDING, "Changed plans") is not None
+    await db.commit()
+    return session, payment
+
+
+async def assert_no_seat_given(db, session, payment):
+    booking = await db.get(Booking, payment.booking_id, populate_existing=True)
+    assert booking.cancelled_at is not None
+    assert booking.payment_status == PaymentStatus.REFUNDED
+    session = await db.get(Session, session.id, populate_existing=True)
+    assert (session.seats_booked, session.seats_held) == (0, 0)
+
+
+async def test_webhook_flags_payment_completed_after_cancel(db, open_payments):
+    session, payment = await cancel_while_checkout_open(db, open_payments, PaymentProvider.FLUTTERWAVE)
+    webhook = PaymentWebhook(
+        provider=PaymentProvider.FLUTTERWAVE,
+        event_type="charge.completed",
+        payload={"data": {"id": 1, "tx_ref": payment.payment_reference, "status": "successful", "amount": 100}},
+    )
+    db.add(webhook)
+    await db.commit()
+
+    await WebhookWorker(batch_size=10, poll_interval=1).process_batch(db)
+    await db.commit()
+
+    await db.refresh(webhook)
+    assert webhook.processing_error == REFUND_REQUIRED
+    await assert_no_seat_given(db, session, payment)
+
+
+async def test_reconciliation_flags_payment_completed_after_cancel(db, open_payments):
+    session, payment = await cancel_while_checkout_open(db, open_payments, PaymentProvider.MPESA)
+    report = ReconcileReport()
+
+    await apply_results(db, [Result(payment.id, PaymentTransactionStatus.COMPLETED)], report)
+    await db.commit()
+
+    assert report.refunds == [payment.payment_reference]
+    await assert_no_seat_given(db, session, payment)
+
+
+async def test_failed_payment_after_cancel_needs_no_refund(db, open_payments):
+    _, payment = await cancel_while_checkout_open(db, open_payments, PaymentProvider.MPESA)
+    report = ReconcileReport()
+
+    await apply_results(db, [Result(payment.id, PaymentTransactionStatus.CANCELLED)], report)
+    await db.commit()
+
+    assert report.refunds == []
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+from uuid import uuid4
+import pytest
+from app.api.v1.endpoints.users import update_user
+from app.core.revocation import revocation_list
+from app.models import User
+from app.schemas.user import UserUpdate
+
+pytestmark = pytest.mark.anyio
+
+ADMIN = SimpleNamespace(id=uuid4(), role=SimpleNamespace(value="admin"))
+
+
+async def test_reactivation_does_not_revive_old_tokens(db):
+    user = User(email="learner@example.com", password_hash="x", name="Learner")
+    db.add(user)
+    await db.commit()
+    issued_before = user.token_version
+
+    await update_user(user.id, UserUpdate(is_active=False), current_user=ADMIN, db=db)
+    user = await update_user(user.id, UserUpdate(is_active=True), current_user=ADMIN, db=db)
+
+    assert user.is_active
+    assert user.token_version == issued_before + 2
+    assert revocation_list.is_revoked(user.id, issued_before)
+    assert not revocation_list.is_deactivated(user.id)
+
+
+async def test_other_changes_keep_tokens(db):
+    user = User(email="learner@example.com", password_hash="x", name="Learner")
+    db.add(user)
+    await db.commit()
+
+    updated = await update_user(user.id, UserUpdate(name="Renamed"), current_user=ADMIN, db=db)
+
+    assert updated.name == "Renamed"
+    assert updated.token_version == user.token_version
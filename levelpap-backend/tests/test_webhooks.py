@@ -0,0 +1,114 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.enums import PaymentProvider, PaymentStatus, PaymentTransactionStatus
+from app.main import app
+from app.models import Booking, Payment, PaymentWebhook
+from app.services import webhooks as webhooks_module
+from app.services.webhooks import WebhookWorker, flutterwave_event, flutterwave_outcome, mpesa_event, mpesa_outcome
+
+MALFORMED = ["[]", '"callback"', "null", "{", '{"Body": null}', '{"Body": {"stkCallback": []}}']
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "MPESA_CALLBACK_TOKEN", "callback-token")
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("body", MALFORMED)
+def test_malformed_mpesa_callback_is_rejected(client, body):
+    response = client.post(
+        "/api/payments/webhooks/mpesa",
+        params={"token": "callback-token"},
+        content=body,
+        headers={"content-type": "application/json"},
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid webhook payload"}
+
+
+def test_event_parsers_reject_non_objects():
+    with pytest.raises(ValueError):
+        mpesa_event({"Body": {"stkCallback": "x"}})
+    with pytest.raises(ValueError):
+        flutterwave_event({"event": "charge.completed", "data": [1]})
+
+    assert mpesa_event({"Body": {"stkCallback": {"CheckoutRequestID": "ws_1"}}}).provider_transaction_id == "ws_1"
+    assert flutterwave_event({"event": "charge.completed", "data": {"id": 42}}).provider_transaction_id == "42"
+    assert flutterwave_event({"event": "ping"}).provider_transaction_id is None
+
+
+def test_mpesa_outcome_ignores_malformed_metadata():
+    outcome = mpesa_outcome({
+        "Body": {"stkCallback": {
+            "CheckoutRequestID": "ws_1",
+            "ResultCode": 0,
+            "CallbackMetadata": {"Item": ["junk", {"Name": "Amount", "Value": 500}]},
+        }}
+    })
+
+    assert outcome.status == PaymentTransactionStatus.COMPLETED
+    assert outcome.amount == 500
+    assert outcome.provider_transaction_id is None
+
+
+def test_parsers_compare_ids_as_text():
+    assert mpesa_event({"Body": {"stkCallback": {"CheckoutRequestID": 123}}}).provider_transaction_id == "123"
+    assert mpesa_outcome({"Body": {"stkCallback": {"CheckoutRequestID": 123}}}).checkout_id == "123"
+    assert flutterwave_outcome({"data": {"tx_ref": 42, "id": 7, "status": "failed"}}).payment_reference == "42"
+
+
+def flutterwave_callback(reference, status="successful"):
+    return PaymentWebhook(
+        provider=PaymentProvider.FLUTTERWAVE,
+        event_type="charge.completed",
+        payload={"event": "charge.completed", "data": {"id": 1, "tx_ref": reference, "status": status, "amount": 100}},
+    )
+
+
+@pytest.mark.anyio
+async def test_failing_row_does_not_block_the_batch(db, open_payments, monkeypatch):
+    _, (broken, healthy) = await open_payments(2, PaymentProvider.FLUTTERWAVE)
+    webhooks = [
+        flutterwave_callback(broken.payment_reference),
+        PaymentWebhook(provider=PaymentProvider.FLUTTERWAVE, event_type="charge.completed", payload={"data": {"tx_ref": 7}}),
+        PaymentWebhook(provider=PaymentProvider.MPESA, event_type="stk_callback", payload={"Body": {}}),
+        flutterwave_callback(healthy.payment_reference),
+    ]
+    db.add_all(webhooks)
+    await db.commit()
+
+    original = webhooks_module.complete_booking_payment
+
+    async def complete_booking_payment(session, booking, paid):
+        if booking.id == broken.booking_id:
+            raise RuntimeError("seat update failed")
+        return await original(session, booking, paid)
+
+    def unreadable(payload):
+        raise KeyError("ResultCode")
+
+    monkeypatch.setattr(webhooks_module, "complete_booking_payment", complete_booking_payment)
+    monkeypatch.setitem(webhooks_module.OUTCOME_PARSERS, PaymentProvider.MPESA, unreadable)
+
+    assert await WebhookWorker(batch_size=10, poll_interval=1).process_batch(db) == 4
+    await db.commit()
+
+    stored = {
+        webhook.id: webhook for webhook in
+        (await db.execute(select(PaymentWebhook).execution_options(populate_existing=True))).scalars()
+    }
+    assert all(webhook.processed for webhook in stored.values())
+    assert stored[webhooks[0].id].processing_error == "RuntimeError: seat update failed"
+    assert stored[webhooks[1].id].processing_error == "No matching payment"
+    assert stored[webhooks[2].id].processing_error == "Unreadable payload: KeyError: 'ResultCode'"
+    assert stored[webhooks[3].id].processing_error is None
+
+    broken = await db.get(Payment, broken.id, populate_existing=True)
+    healthy = await db.get(Payment, healthy.id, populate_existing=True)
+    assert broken.status == PaymentTransactionStatus.PROCESSING
+    assert healthy.status == PaymentTransactionStatus.COMPLETED
+    assert (await db.get(Booking, healthy.booking_id)).payment_status == PaymentStatus.PAID